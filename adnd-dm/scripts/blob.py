@@ -0,0 +1,110 @@
+"""
+blob.py - Byte-exact reading of roll verification blobs
+
+random.org signs the exact text of the "random" object it returns, and
+docs/api-reference.md says to pass it on exactly as received. Decoding a
+blob and encoding the object again can change that text (number
+formatting, \\u escapes, key order), so the readers here keep the bytes
+each random object was read from alongside its fields:
+
+    RandomObject  A dict of the object's fields, with .raw: the exact
+                  UTF-8 bytes it was decoded from
+    decode()      json.JSONDecoder.raw_decode() for blobs: the "random"
+                  member of a top-level object comes back as a RandomObject
+    loads()       decode() a whole string, as json.loads() does
+
+signature.py checks the signature over .raw before trying any
+re-serialisation, and randomorg.py writes .raw into verifySignature
+requests unchanged (see randomorg.encode), so a blob read here is never
+encoded again on its way to the check.
+
+The top-level members are walked one at a time and each value is decoded
+by json's C scanner, which reports where the value ends; the random
+object's span and its fields come out of the same pass.
+
+Usage:
+    from blob import RandomObject, loads
+
+    blob = loads(line)                   # {"random": RandomObject, "signature": ...}
+    blob["random"]["serialNumber"], blob["random"].raw
+
+    random_obj = RandomObject.from_text(random_json)   # just the random object
+"""
+
+import re
+import json
+from json.decoder import JSONDecodeError, scanstring
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+_decoder = json.JSONDecoder()
+
+
+class RandomObject(dict):
+    """A signed "random" object's fields, plus .raw: the bytes it was decoded from."""
+
+    __slots__ = ("raw",)
+
+    def __init__(self, fields: dict, raw: bytes):
+        super().__init__(fields)
+        self.raw = raw
+
+    @classmethod
+    def from_text(cls, text: str) -> "RandomObject":
+        """Decode a random object on its own (raises ValueError if it isn't a JSON object)."""
+        text = text.strip()
+        fields = json.loads(text)
+        if not isinstance(fields, dict):
+            raise ValueError("the random object must be a JSON object")
+        return cls(fields, text.encode("utf-8"))
+
+
+def _skip(text: str, pos: int) -> int:
+    return WHITESPACE.match(text, pos).end()
+
+
+def decode(text: str, idx: int = 0) -> tuple:
+    """
+    Decode the JSON value starting at text[idx] (after any whitespace);
+    returns (value, end). A top-level object's "random" member, if it is
+    an object, is a RandomObject. Raises JSONDecodeError like raw_decode().
+    """
+    pos = _skip(text, idx)
+    if not text.startswith("{", pos):
+        return _decoder.raw_decode(text, pos)
+
+    obj = {}
+    pos = _skip(text, pos + 1)
+    if text.startswith("}", pos):
+        return obj, pos + 1
+    while True:
+        if not text.startswith('"', pos):
+            raise JSONDecodeError("Expecting property name enclosed in double quotes", text, pos)
+        key, pos = scanstring(text, pos + 1)
+        pos = _skip(text, pos)
+        if not text.startswith(":", pos):
+            raise JSONDecodeError("Expecting ':' delimiter", text, pos)
+        start = _skip(text, pos + 1)
+        try:
+            value, pos = _decoder.scan_once(text, start)
+        except StopIteration:
+            raise JSONDecodeError("Expecting value", text, start)
+        if key == "random" and isinstance(value, dict):
+            value = RandomObject(value, text[start:pos].encode("utf-8"))
+        obj[key] = value
+
+        pos = _skip(text, pos)
+        if text.startswith("}", pos):
+            return obj, pos + 1
+        if not text.startswith(",", pos):
+            raise JSONDecodeError("Expecting ',' delimiter", text, pos)
+        pos = _skip(text, pos + 1)
+
+
+def loads(text: str):
+    """Decode a whole string (see decode()); raises JSONDecodeError on trailing data."""
+    value, end = decode(text)
+    end = _skip(text, end)
+    if end != len(text):
+        raise JSONDecodeError("Extra data", text, end)
+    return value
@@ -0,0 +1,201 @@
+"""
+fairness.py - Streaming dice fairness statistics
+
+Per player (hashedApiKey) and die size, dm-verify.py keeps a DieStats:
+how often each face came up, and the running mean and variance
+(Welford's method). Adding a roll is O(1) per die; the chi-square
+goodness-of-fit against a fair die, its p-value and the nat-20 rate are
+computed from the stored counts when asked, without replaying history.
+
+A die is named by its range: "d20" for 1..20, "0..9" for a range not
+starting at 1. Ranges wider than MAX_FACES keep mean/variance only.
+
+Usage:
+    from fairness import DieStats, dice_groups
+
+    for die, values in dice_groups(random_obj):
+        stats = DieStats.from_dict(die, store.get_stats(key).get(die))
+        stats.add(values)
+        store.put_stats(key, die, stats.to_dict())
+    print(stats.summary())
+
+    # Bulk: build from face counts in one step
+    stats = DieStats.from_counts("d20", {20: 3, 1: 2, 11: 5})
+"""
+
+import math
+
+MAX_FACES = 1000
+MIN_EXPECTED = 5      # chi-square needs about 5 expected rolls per face
+IMPLAUSIBLE_P = 0.001  # p-values below this are flagged
+
+
+def die_name(low: int, high: int) -> str:
+    return f"d{high}" if low == 1 else f"{low}..{high}"
+
+
+def die_range(die: str) -> tuple:
+    if die.startswith("d"):
+        return 1, int(die[1:])
+    low, high = die.split("..")
+    return int(low), int(high)
+
+
+def dice_groups(random_obj: dict) -> list:
+    """
+    [(die, values)] for a random object: one group for generateSignedIntegers,
+    one per sequence for generateSignedIntegerSequences (whose min/max may be
+    per-sequence lists).
+    """
+    data = random_obj.get("data", [])
+    low, high = random_obj.get("min"), random_obj.get("max")
+    if not data:
+        return []
+    if not isinstance(data[0], list):
+        data, low, high = [data], [low], [high]
+    if not isinstance(low, list):
+        low = [low] * len(data)
+    if not isinstance(high, list):
+        high = [high] * len(data)
+
+    groups = []
+    for values, lo, hi in zip(data, low, high):
+        if isinstance(lo, int) and isinstance(hi, int) and hi >= lo:
+            groups.append((die_name(lo, hi), [v for v in values if isinstance(v, int) and lo <= v <= hi]))
+    return groups
+
+
+def chi_square_p(statistic: float, dof: int) -> float:
+    """P(X >= statistic) for a chi-square distribution with dof degrees of freedom."""
+    if statistic <= 0:
+        return 1.0
+    return upper_gamma_q(dof / 2.0, statistic / 2.0)
+
+
+def upper_gamma_q(a: float, x: float) -> float:
+    """Regularized upper incomplete gamma Q(a, x) (series / continued fraction)."""
+    log_prefix = a * math.log(x) - x - math.lgamma(a)
+    if x < a + 1:
+        # Series for P(a, x)
+        term = total = 1.0 / a
+        n = a
+        for _ in range(1000):
+            n += 1
+            term *= x / n
+            total += term
+            if abs(term) < abs(total) * 1e-15:
+                break
+        return max(0.0, 1.0 - total * math.exp(log_prefix))
+    # Lentz's continued fraction for Q(a, x)
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for i in range(1, 1000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return min(1.0, math.exp(log_prefix) * h)
+
+
+class DieStats:
+    """Face counts and running moments for one player's rolls of one die."""
+
+    def __init__(self, die: str):
+        self.die = die
+        self.low, self.high = die_range(die)
+        self.faces = self.high - self.low + 1
+        self.counts = [0] * self.faces if self.faces <= MAX_FACES else None
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    @classmethod
+    def from_dict(cls, die: str, data: dict = None) -> "DieStats":
+        stats = cls(die)
+        if data:
+            stats.n = data["n"]
+            stats.mean = data["mean"]
+            stats.m2 = data["m2"]
+            if stats.counts is not None and data.get("counts"):
+                stats.counts = list(data["counts"])
+        return stats
+
+    @classmethod
+    def from_counts(cls, die: str, counts: dict) -> "DieStats":
+        """Stats for a {face: count} histogram, in one pass over the faces."""
+        stats = cls(die)
+        stats.n = sum(counts.values())
+        if stats.n:
+            stats.mean = sum(face * count for face, count in counts.items()) / stats.n
+            stats.m2 = sum(count * (face - stats.mean) ** 2 for face, count in counts.items())
+        if stats.counts is not None:
+            for face, count in counts.items():
+                stats.counts[face - stats.low] += count
+        return stats
+
+    def to_dict(self) -> dict:
+        return {"n": self.n, "mean": self.mean, "m2": self.m2, "counts": self.counts}
+
+    def add(self, values):
+        """Welford update for each rolled value."""
+        for value in values:
+            self.n += 1
+            delta = value - self.mean
+            self.mean += delta / self.n
+            self.m2 += delta * (value - self.mean)
+            if self.counts is not None:
+                self.counts[value - self.low] += 1
+
+    def variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else None
+
+    def chi_square(self):
+        """(statistic, degrees of freedom, p-value) against a fair die, or None."""
+        if self.counts is None or self.faces < 2 or not self.n:
+            return None
+        expected = self.n / self.faces
+        statistic = sum((count - expected) ** 2 for count in self.counts) / expected
+        dof = self.faces - 1
+        return statistic, dof, chi_square_p(statistic, dof)
+
+    def summary(self) -> dict:
+        variance = self.variance()
+        result = {
+            "die": self.die,
+            "rolls": self.n,
+            "mean": round(self.mean, 4),
+            "expectedMean": (self.low + self.high) / 2,
+            "variance": round(variance, 4) if variance is not None else None,
+            "expectedVariance": round((self.faces ** 2 - 1) / 12, 4),
+        }
+        if self.counts is not None:
+            result["counts"] = {str(self.low + i): count for i, count in enumerate(self.counts)}
+        if self.die == "d20" and self.n:
+            result["nat20Rate"] = round(self.counts[19] / self.n, 4)
+            result["expectedNat20Rate"] = 0.05
+
+        chi = self.chi_square()
+        if chi is not None:
+            statistic, dof, p_value = chi
+            result.update({
+                "chiSquare": round(statistic, 3),
+                "degreesOfFreedom": dof,
+                "pValue": p_value,
+                "enoughRolls": self.n >= MIN_EXPECTED * self.faces
+            })
+            if result["enoughRolls"] and p_value < IMPLAUSIBLE_P:
+                result["warning"] = (
+                    f"Rolls of {self.die} are implausible for a fair die "
+                    f"(chi-square p = {p_value:.2g} over {self.n} rolls)"
+                )
+        return result
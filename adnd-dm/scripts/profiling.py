@@ -0,0 +1,181 @@
+"""
+profiling.py - Per-phase timing breakdown for --profile
+
+roll.py, verify.py and dm-verify.py take --profile: when the script
+exits, one JSON line goes to stderr saying where the time went, so a slow
+run can be pinned on DNS, the TLS handshake, random.org itself, a large
+tracker rewrite or the output. --profile-out FILE also runs cProfile and
+writes its stats to FILE (read them with `python -m pstats FILE`), adding
+the most expensive functions to the report.
+
+    {"profile": {
+        "script": "dm-verify.py",
+        "wallMs": 412.7,
+        "phases": [{"phase": "arg_parse", "ms": 0.9, "count": 1},
+                   {"phase": "tracker_load", "ms": 35.2, "count": 1}, ...],
+        "http": [{"method": "verifySignature", "calls": 1, "newConnections": 1,
+                  "dnsMs": 2.1, "connectMs": 40.3, "tlsMs": 88.0,
+                  "serverMs": 201.5, "readMs": 0.4, "decodeMs": 0.1}],
+        "cprofile": {"path": "verify.prof", "top": [...]}}}
+
+Phases are summed over every time they ran (and over threads in batch
+modes), in the order they first ran. Some contain others: "signature"
+includes cert_load, verdict_cache, signature_offline and
+signature_online, and "api_call" and "signature_online" include the HTTP
+stages listed under "http" (dns, connect, tls, server = request sent to
+first byte, read = body, decode = JSON parsing).
+
+Profiling is off unless a script calls start(); phase() is then a no-op.
+
+Usage:
+    import profiling
+
+    profiling.start("roll.py", cprofile_path=None)   # report at exit
+    with profiling.phase("payload_build"):
+        ...
+"""
+
+import sys
+import json
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+
+TOP_FUNCTIONS = 15
+HTTP_STAGES = (("dns", "dnsMs"), ("connect", "connectMs"), ("tls", "tlsMs"),
+               ("request", "serverMs"), ("read", "readMs"), ("decode", "decodeMs"))
+
+_active = None
+_lock = threading.Lock()
+
+
+class Profile:
+    """Phase and HTTP timings for one run of a script."""
+
+    def __init__(self, script: str, cprofile_path: str = None):
+        self.script = script
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.http = {}
+        self.cprofile_path = cprofile_path
+        self.cprofile = None
+        if cprofile_path:
+            import cProfile
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def add(self, name: str, seconds: float):
+        with _lock:
+            entry = self.phases.get(name)
+            if entry is None:
+                entry = self.phases[name] = [0.0, 0]
+            entry[0] += seconds
+            entry[1] += 1
+
+    def add_http(self, method: str, timings: dict):
+        with _lock:
+            entry = self.http.get(method)
+            if entry is None:
+                entry = self.http[method] = {"method": method, "calls": 0, "newConnections": 0}
+                entry.update((field, 0.0) for _, field in HTTP_STAGES)
+            entry["calls"] += 1
+            entry["newConnections"] += 0 if timings.get("reused") else 1
+            for stage, field in HTTP_STAGES:
+                entry[field] += timings.get(stage, 0.0) * 1000
+
+    def report(self) -> dict:
+        report = {
+            "script": self.script,
+            "wallMs": round((time.perf_counter() - self.started) * 1000, 3),
+            "phases": [{"phase": name, "ms": round(seconds * 1000, 3), "count": count}
+                       for name, (seconds, count) in self.phases.items()],
+            "http": [{k: round(v, 3) if isinstance(v, float) else v for k, v in entry.items()}
+                     for entry in self.http.values()]
+        }
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(self.cprofile_path)
+            report["cprofile"] = {"path": self.cprofile_path, "top": top_functions(self.cprofile)}
+        return report
+
+
+def top_functions(profile, limit: int = TOP_FUNCTIONS) -> list:
+    """The functions with the most cumulative time in a cProfile run."""
+    import pstats
+    stats = pstats.Stats(profile).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [{
+        "function": f"{path}:{line}({name})",
+        "calls": calls,
+        "cumulativeMs": round(cumulative * 1000, 3),
+        "ownMs": round(own * 1000, 3)
+    } for (path, line, name), (_, calls, own, cumulative, _) in rows]
+
+
+def start(script: str, cprofile_path: str = None, started: float = None) -> Profile:
+    """
+    Start profiling this process; the report is printed to stderr at exit.
+    started (a time.perf_counter() value) backdates the wall clock, for
+    work timed before profiling was switched on (see record()).
+    """
+    global _active
+    if _active is None:
+        _active = Profile(script, cprofile_path)
+        if started is not None:
+            _active.started = started
+        atexit.register(finish)
+    return _active
+
+
+def finish(file=None):
+    """Print the report (once) and stop profiling."""
+    global _active
+    profile, _active = _active, None
+    if profile is not None:
+        print(json.dumps({"profile": profile.report()}), file=file or sys.stderr, flush=True)
+
+
+@contextmanager
+def phase(name: str):
+    """Time the with-block as phase name (no-op unless profiling)."""
+    if _active is None:
+        yield
+        return
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile = _active
+        if profile is not None:
+            profile.add(name, time.perf_counter() - start_time)
+
+
+def record(name: str, seconds: float):
+    """Add a phase timed by the caller (no-op unless profiling)."""
+    if _active is not None:
+        _active.add(name, seconds)
+
+
+def timed_iter(name: str, iterable):
+    """Iterate, timing each step as phase name (the iterable itself if not profiling)."""
+    if _active is None:
+        return iterable
+    return _timed_iter(name, iterable)
+
+
+def _timed_iter(name: str, iterable):
+    iterator = iter(iterable)
+    while True:
+        with phase(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def record_http(method: str, timings: dict):
+    """Add one random.org call's stage timings (see randomorg.py)."""
+    if _active is not None:
+        _active.add_http(method, timings)
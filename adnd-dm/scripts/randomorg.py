@@ -0,0 +1,476 @@
+"""
+randomorg.py - Shared random.org JSON-RPC client
+
+Used by roll.py, verify.py and dm-verify.py so every script talks to
+random.org the same way.
+
+Connections are HTTP/1.1 keep-alive and are pooled per process: the first
+call pays the TCP + TLS handshake, later calls reuse the warm socket. This
+matters for batch and long-running modes, where a handshake per roll
+costs more than the RPC itself.
+
+Usage:
+    from randomorg import get_client
+
+    client = get_client()
+    response = client.call("verifySignature", {"random": ..., "signature": ...})
+    print(client.last_timings)
+
+    # Many calls of one method, packed into JSON-RPC 2.0 batch requests
+    responses = client.call_many("verifySignature", [{"random": ..., "signature": ...}, ...])
+
+Environment:
+    RANDOM_ORG_API_URL - Override the API endpoint (e.g. a local stand-in
+                         server from tools/standin.py)
+    RANDOM_ORG_TIMINGS - If set, scripts print per-call timings to stderr
+    RANDOM_ORG_BATCH_SIZE
+                       - Most calls call_many() packs into one POST
+                         (default: 50; 1 sends every call on its own)
+
+Every request gets its own JSON-RPC id, and batch responses are matched
+back to their calls by id. If the server refuses a batch (an error object
+instead of an array, or an HTTP 4xx/500/501), call_many() sends the calls
+one at a time instead, and keeps doing so for the rest of the process.
+
+A signed random object read by blob.py keeps the exact bytes it arrived
+in, and requests carry those bytes rather than a re-encoding (see
+encode()).
+
+Every call is counted and timed in the randomorg_* metrics (see metrics.py).
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import itertools
+import threading
+import http.client
+from urllib.parse import urlsplit
+
+from metrics import counter, histogram
+from profiling import record_http
+
+API_URL = "https://api.random.org/json-rpc/4/invoke"
+DEFAULT_TIMEOUT = 30
+DEFAULT_POOL_SIZE = 4
+DEFAULT_BATCH_SIZE = 50
+
+# HTTP statuses that mean "try again later", not "batches aren't supported"
+RETRY_LATER_STATUSES = (429, 502, 503, 504)
+
+# Stands in for a raw value while the rest of a payload is encoded
+RAW_MARKER = f"raw-json-{uuid.uuid4().hex}-"
+
+# Errors that mean a pooled connection was closed by the server while idle.
+# Raised while the request is being written, it never reached random.org and
+# is retried once on a fresh connection. Raised after that (waiting for the
+# response), random.org may have acted on it, so only idempotent requests
+# are retried: re-sending a generateSigned* call would draw a second roll.
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    BrokenPipeError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+)
+
+# Methods that can safely be sent twice (no roll drawn, no serial used)
+IDEMPOTENT_METHODS = ("verifySignature", "getResult", "getUsage")
+
+CALLS = counter("randomorg_requests_total", "random.org JSON-RPC calls by method and outcome",
+                ["method", "outcome"])
+CALL_SECONDS = histogram("randomorg_request_seconds", "random.org call latency (connect to decoded response)",
+                         ["method"])
+CONNECTIONS = counter("randomorg_connections_total", "random.org calls by connection state", ["state"])
+
+
+class RandomOrgError(RuntimeError):
+    """Transport-level failure talking to random.org (HTTP or connection)."""
+
+    def __init__(self, message: str, status: int = None):
+        super().__init__(message)
+        self.status = status  # HTTP status, if the server answered at all
+
+
+def _open_socket(conn) -> tuple:
+    """
+    TCP-connect conn to its host, resolving the name first so the DNS
+    lookup is timed apart from the connect. Returns (sock, dns_s, connect_s).
+    """
+    start = time.perf_counter()
+    addresses = socket.getaddrinfo(conn.host, conn.port, 0, socket.SOCK_STREAM)
+    resolved = time.perf_counter()
+    for i, address in enumerate(addresses):
+        try:
+            sock = socket.create_connection(address[4][:2], conn.timeout, conn.source_address)
+            break
+        except OSError:
+            if i == len(addresses) - 1:
+                raise
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock, resolved - start, time.perf_counter() - resolved
+
+
+class _TimedHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection that records how long the DNS lookup and TCP connect took."""
+
+    dns_time = 0.0
+    connect_time = 0.0
+    tls_time = 0.0
+
+    def connect(self):
+        self.sock, self.dns_time, self.connect_time = _open_socket(self)
+        self.tls_time = 0.0
+        if self._tunnel_host:
+            self._tunnel()
+
+
+class _TimedHTTPSConnection(http.client.HTTPSConnection):
+    """HTTPSConnection that records DNS, TCP connect and TLS handshake separately."""
+
+    dns_time = 0.0
+    connect_time = 0.0
+    tls_time = 0.0
+
+    def connect(self):
+        sock, self.dns_time, self.connect_time = _open_socket(self)
+
+        if self._tunnel_host:
+            self.sock = sock
+            self._tunnel()
+            sock = self.sock
+
+        start = time.perf_counter()
+        server_hostname = self._tunnel_host or self.host
+        self.sock = self._context.wrap_socket(sock, server_hostname=server_hostname)
+        self.tls_time = time.perf_counter() - start
+
+
+def carries_raw(value) -> bool:
+    # Plain dicts (nearly every value) are ruled out without an attribute lookup
+    return type(value) is not dict and isinstance(value, dict) and getattr(value, "raw", None) is not None
+
+
+def encode(payload) -> bytes:
+    """
+    JSON-encode a request payload. Values that carry the bytes they were
+    read from (a .raw attribute, like blob.RandomObject) are written as
+    those bytes, so a signed object reaches random.org exactly as received.
+    They are looked for where a signed object goes: the payload's own
+    values and its "params" (or those of each call in a batch).
+    """
+    raws = []
+
+    def mark(value) -> str:
+        raws.append(value.raw)
+        return f"{RAW_MARKER}{len(raws) - 1}"
+
+    def swap(obj: dict) -> dict:
+        params = obj.get("params")
+        if isinstance(params, dict) and any(map(carries_raw, params.values())):
+            obj = dict(obj, params=swap(params))
+        if not any(map(carries_raw, obj.values())):
+            return obj
+        return {key: mark(value) if carries_raw(value) else value for key, value in obj.items()}
+
+    if isinstance(payload, list):
+        payload = [swap(call) if isinstance(call, dict) else call for call in payload]
+    elif isinstance(payload, dict):
+        payload = swap(payload)
+    body = json.dumps(payload).encode("utf-8")
+    for i, raw in enumerate(raws):
+        body = body.replace(f'"{RAW_MARKER}{i}"'.encode("ascii"), raw, 1)
+    return body
+
+
+class ConnectionPool:
+    """A small pool of keep-alive connections to one host."""
+
+    def __init__(self, url: str, size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_TIMEOUT):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported API URL scheme: {url}")
+
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = parts.path or "/"
+        if parts.query:
+            self.path += "?" + parts.query
+        self.size = size
+        self.timeout = timeout
+
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _new_connection(self):
+        cls = _TimedHTTPSConnection if self.scheme == "https" else _TimedHTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def _acquire(self, fresh: bool = False):
+        if not fresh:
+            with self._lock:
+                if self._idle:
+                    return self._idle.pop(), True
+        return self._new_connection(), False
+
+    def _release(self, conn):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def request(self, method: str, path: str = None, body: bytes = None, headers: dict = None,
+                idempotent: bool = None) -> tuple:
+        """
+        Send one request, reusing an idle connection if there is one.
+
+        If a reused connection turns out to be stale, the request is sent
+        again on a fresh one when it failed while being written, or at any
+        point if idempotent (default: True for GET, False otherwise).
+
+        Returns (status, reason, body_bytes, timings).
+        """
+        if idempotent is None:
+            idempotent = method == "GET"
+        retry = False
+        while True:
+            conn, reused = self._acquire(fresh=retry)
+            timings = {"reused": reused, "dns": 0.0, "connect": 0.0, "tls": 0.0}
+            start = time.perf_counter()
+            written = False
+            try:
+                if conn.sock is None:
+                    conn.connect()
+                    timings["dns"] = conn.dns_time
+                    timings["connect"] = conn.connect_time
+                    timings["tls"] = conn.tls_time
+
+                sent = time.perf_counter()
+                conn.request(method, path or self.path, body=body, headers=headers or {})
+                written = True
+                response = conn.getresponse()
+                first_byte = time.perf_counter()
+                data = response.read()
+                done = time.perf_counter()
+            except STALE_CONNECTION_ERRORS as e:
+                conn.close()
+                if reused and (idempotent or not written):
+                    # Idle peers are probably stale too; retry on a new socket
+                    self.close()
+                    retry = True
+                    continue
+                raise RandomOrgError(f"Connection error: {e}")
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                raise RandomOrgError(f"Connection error: {e}")
+
+            timings["request"] = first_byte - sent
+            timings["read"] = done - first_byte
+            timings["total"] = done - start
+
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+
+            return response.status, response.reason, data, timings
+
+
+class RandomOrgClient:
+    """JSON-RPC client for the random.org API over a keep-alive pool."""
+
+    def __init__(self, url: str = API_URL, pool_size: int = DEFAULT_POOL_SIZE,
+                 timeout: float = DEFAULT_TIMEOUT):
+        self.url = url
+        self.pool = ConnectionPool(url, size=pool_size, timeout=timeout)
+        self.last_timings = None
+        self.calls = 0
+        self.handshakes = 0
+        self.batching = True  # cleared once the server refuses a batch
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _next_id(self) -> int:
+        with self._lock:
+            return next(self._ids)
+
+    def post(self, payload) -> tuple:
+        """POST a JSON payload, returning (decoded_response, timings)."""
+        method = payload.get("method", "unknown") if isinstance(payload, dict) else "batch"
+        calls = payload if isinstance(payload, list) else [payload]
+        body = encode(payload)
+        try:
+            status, reason, data, timings = self.pool.request(
+                "POST",
+                body=body,
+                headers={"Content-Type": "application/json", "Connection": "keep-alive"},
+                idempotent=all(call.get("method") in IDEMPOTENT_METHODS for call in calls),
+            )
+        except RandomOrgError:
+            CALLS.inc(method=method, outcome="connection_error")
+            raise
+
+        with self._lock:
+            self.calls += 1
+            if not timings["reused"]:
+                self.handshakes += 1
+        self.last_timings = timings
+        CONNECTIONS.inc(state="reused" if timings["reused"] else "new")
+
+        if status != 200:
+            CALLS.inc(method=method, outcome="http_error")
+            raise RandomOrgError(f"HTTP error {status}: {reason}", status)
+
+        start = time.perf_counter()
+        try:
+            response = json.loads(data.decode("utf-8"))
+        except ValueError as e:
+            CALLS.inc(method=method, outcome="invalid_json")
+            raise RandomOrgError(f"Invalid JSON from API: {e}")
+        timings["decode"] = time.perf_counter() - start
+        CALL_SECONDS.observe(timings["total"] + timings["decode"], method=method)
+        record_http(method, timings)
+        CALLS.inc(method=method, outcome="error" if isinstance(response, dict) and "error" in response else "ok")
+        return response, timings
+
+    def call(self, method: str, params: dict, request_id=None) -> dict:
+        """Invoke one JSON-RPC method and return the full response object."""
+        payload = {
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": params,
+            "id": request_id if request_id is not None else self._next_id(),
+        }
+        response, _ = self.post(payload)
+        return response
+
+    def call_many(self, method: str, params_list: list, size: int = None) -> list:
+        """
+        Invoke method once per params, packing up to size calls (default:
+        batch_size()) into each JSON-RPC batch request. Returns the full
+        response objects in params_list order; raises RandomOrgError as
+        call() does.
+        """
+        size = batch_size() if size is None else max(1, size)
+        responses = []
+        for start in range(0, len(params_list), size):
+            chunk = params_list[start:start + size]
+            answered = self._call_batch(method, chunk) if len(chunk) > 1 and self.batching else None
+            if answered is None:
+                answered = [None] * len(chunk)
+            # Calls the server didn't answer in the batch are sent on their own
+            responses.extend(response if response is not None else self.call(method, params)
+                             for params, response in zip(chunk, answered))
+        return responses
+
+    def _call_batch(self, method: str, params_list: list) -> list:
+        """
+        Send one batch request; returns the responses matched to params_list
+        by id (None where missing), or None if the server refused the batch.
+        """
+        ids = [self._next_id() for _ in params_list]
+        payload = [{"jsonrpc": "2.0", "method": method, "params": params, "id": request_id}
+                   for params, request_id in zip(params_list, ids)]
+        try:
+            reply, _ = self.post(payload)
+        except RandomOrgError as e:
+            if e.status is None or e.status in RETRY_LATER_STATUSES:
+                raise
+            reply = None
+        if not isinstance(reply, list):
+            # A lone error object (usually -32600 Invalid Request): no batches here
+            self.batching = False
+            return None
+        by_id = {response.get("id"): response for response in reply if isinstance(response, dict)}
+        return [by_id.get(request_id) for request_id in ids]
+
+    def close(self):
+        self.pool.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def api_url() -> str:
+    """The endpoint to use: RANDOM_ORG_API_URL if set, else the real API."""
+    return os.environ.get("RANDOM_ORG_API_URL") or API_URL
+
+
+def batch_size() -> int:
+    """Calls per JSON-RPC batch: $RANDOM_ORG_BATCH_SIZE, else DEFAULT_BATCH_SIZE."""
+    try:
+        return max(1, int(os.environ.get("RANDOM_ORG_BATCH_SIZE") or DEFAULT_BATCH_SIZE))
+    except ValueError:
+        return DEFAULT_BATCH_SIZE
+
+
+def get_client(url: str = None) -> RandomOrgClient:
+    """Return the process-wide client for url, creating it on first use."""
+    url = url or api_url()
+    with _clients_lock:
+        client = _clients.get(url)
+        if client is None:
+            client = _clients[url] = RandomOrgClient(url)
+        return client
+
+
+def flatten_data(data: list) -> list:
+    """
+    Flatten the signed "data" field to a list of die values.
+
+    generateSignedIntegers returns a flat list; generateSignedIntegerSequences
+    (used for mixed-dice expressions) returns one list per dice group.
+    """
+    values = []
+    for item in data or []:
+        if isinstance(item, list):
+            values.extend(item)
+        else:
+            values.append(item)
+    return values
+
+
+def describe_dice(random_obj: dict) -> str:
+    """Dice notation for a signed object, e.g. '2d6' or '1d20+2d6'."""
+    maxes = random_obj.get("max", "?")
+    if isinstance(maxes, list):
+        lengths = random_obj.get("length")
+        if not isinstance(lengths, list):
+            lengths = [lengths] * len(maxes)
+        return "+".join(f"{n}d{m}" for n, m in zip(lengths, maxes))
+    if random_obj.get("method") == "generateSignedIntegerSequences":
+        return f"{random_obj.get('length', '?')}d{maxes} x{random_obj.get('n', '?')}"
+    data = random_obj.get("data", [])
+    return f"{random_obj.get('n', len(data))}d{maxes}"
+
+
+def format_timings(timings: dict) -> str:
+    """One-line human-readable summary of a call's timings."""
+    if not timings:
+        return "no calls made"
+    ms = lambda key: f"{timings.get(key, 0.0) * 1000:.1f}ms"
+    state = "reused" if timings.get("reused") else "new"
+    return (
+        f"connection={state} dns={ms('dns')} connect={ms('connect')} tls={ms('tls')} "
+        f"response={ms('request')} read={ms('read')} total={ms('total')}"
+    )
+
+
+def report_timings(client: RandomOrgClient, file=None):
+    """Print the last call's timings to stderr if RANDOM_ORG_TIMINGS is set."""
+    if not os.environ.get("RANDOM_ORG_TIMINGS"):
+        return
+    print(f"[random.org] {format_timings(client.last_timings)}", file=file or sys.stderr)
@@ -0,0 +1,264 @@
+"""
+rules.py - Declarative suspicion rules for dm-verify.py
+
+Which verified rolls are flagged "suspicious" is decided by rules read
+from a JSON file (--rules FILE or DM_VERIFY_RULES) instead of thresholds
+in code. Rules are compiled once per process and evaluated over a batch
+of rolls at a time; the first rule that matches a roll fires, and its
+name is reported as "suspicionRule".
+
+Config:
+    {"rules": [
+        {"name": "gap-before-high-roll",
+         "when": [{"metric": "gap", "op": ">", "value": 1},
+                  {"metric": "highest", "op": ">=", "value": "0.9*max"}],
+         "reason": "Gap of {gap} serials before high roll ({roll})"},
+        {"name": "large-gap",
+         "when": [{"metric": "gap", "op": ">", "value": 5}],
+         "reason": "Large gap of {gap} serials"}
+    ]}
+
+    (These two are the defaults.) A rule matches when all of its "when"
+    conditions hold. Conditions on dice are checked per dice group (each
+    sequence of a generateSignedIntegerSequences roll), and the rule
+    matches if any group satisfies all of them; "sides": [20] limits a
+    rule to groups of those die sizes.
+
+    op is one of > >= < <= == !=. value is a number, or an expression
+    relative to the group's fields in the signed random object:
+    "0.9*max", "n", "n*max", "max-1", "0.5*n*max+2".
+
+Metrics:
+    Roll:   gap, totalMissing, serial, dice (number of dice in the roll)
+    Group:  n, min, max, sides, highest, lowest, total, maxed (dice
+            showing max). When userData's notation keeps or drops dice
+            ("2d20kl1", "4d6dl1", "2d20k1", "4d6d1"; parsed by dice.py,
+            as roll.py does), highest/lowest/total/maxed count only the
+            kept dice, so a disadvantage roll is judged by the die that
+            counts.
+
+    Rolls that are replays, or posted out of order, are not judged (the
+    gap around them was judged when the later serial arrived).
+
+Reason templates can use any metric, plus {roll} (all dice), {die}
+("d20") and {rule}.
+"""
+
+import os
+import re
+import json
+import operator
+
+from dice import keep_dice, parse_expression
+
+RULES_ENV = "DM_VERIFY_RULES"
+
+DEFAULT_RULES = {"rules": [
+    {
+        "name": "gap-before-high-roll",
+        "when": [
+            {"metric": "gap", "op": ">", "value": 1},
+            {"metric": "highest", "op": ">=", "value": "0.9*max"}
+        ],
+        "reason": "Gap of {gap} serials before high roll ({roll})"
+    },
+    {
+        "name": "large-gap",
+        "when": [{"metric": "gap", "op": ">", "value": 5}],
+        "reason": "Large gap of {gap} serials"
+    }
+]}
+
+OPERATORS = {
+    ">": operator.gt, ">=": operator.ge, "<": operator.lt,
+    "<=": operator.le, "==": operator.eq, "!=": operator.ne
+}
+ROLL_METRICS = {"gap", "totalMissing", "serial", "dice"}
+GROUP_METRICS = {"n", "min", "max", "sides", "highest", "lowest", "total", "maxed"}
+FIELDS = {"n", "min", "max", "sides"}
+
+NUMBER = r"\d+(?:\.\d+)?"
+TERM = re.compile(rf"^\s*(?:({NUMBER})\s*\*\s*)?([a-z]+(?:\s*\*\s*[a-z]+)*)\s*(?:([+-])\s*({NUMBER}))?\s*$")
+
+_cache = {}
+
+
+class RuleError(ValueError):
+    """A rules file that can't be read or compiled."""
+
+
+def compile_value(value, rule_name: str):
+    """Number or "A*field*field+B" -> (coefficient, fields, constant)."""
+    if isinstance(value, (int, float)):
+        return 0.0, (), float(value)
+    match = TERM.match(str(value))
+    if not match:
+        raise RuleError(f"Rule {rule_name}: cannot parse value {value!r}")
+    coef, names, sign, const = match.groups()
+    fields = tuple(name.strip() for name in names.split("*"))
+    for field in fields:
+        if field not in FIELDS:
+            raise RuleError(f"Rule {rule_name}: unknown field {field!r} in {value!r} "
+                            f"(use {', '.join(sorted(FIELDS))})")
+    constant = float(const) * (-1 if sign == "-" else 1) if const else 0.0
+    return float(coef) if coef else 1.0, fields, constant
+
+
+class Rule:
+    """One compiled rule: its conditions as (metric, op, coefficient, fields, constant)."""
+
+    def __init__(self, spec: dict):
+        if not isinstance(spec, dict) or not spec.get("name"):
+            raise RuleError(f"Every rule needs a name: {spec!r}")
+        self.name = spec["name"]
+        self.reason = spec.get("reason", f"Rule {self.name} matched")
+        self.sides = set(spec["sides"]) if spec.get("sides") else None
+        self.conditions = []
+        self.per_group = self.sides is not None
+        for condition in spec.get("when") or []:
+            metric = condition.get("metric")
+            if metric not in ROLL_METRICS | GROUP_METRICS:
+                raise RuleError(f"Rule {self.name}: unknown metric {metric!r}")
+            op = OPERATORS.get(condition.get("op"))
+            if op is None:
+                raise RuleError(f"Rule {self.name}: unknown op {condition.get('op')!r}")
+            coef, fields, constant = compile_value(condition.get("value"), self.name)
+            self.conditions.append((metric, op, coef, fields, constant))
+            self.per_group = self.per_group or metric in GROUP_METRICS or bool(fields)
+        if not self.conditions:
+            raise RuleError(f"Rule {self.name} has no conditions")
+
+    def _holds(self, metrics: dict) -> bool:
+        for metric, op, coef, fields, constant in self.conditions:
+            threshold = constant
+            if fields:
+                product = coef
+                for field in fields:
+                    product *= metrics[field]
+                threshold += product
+            if not op(metrics[metric], threshold):
+                return False
+        return True
+
+    def match(self, facts: dict, groups: list):
+        """The metrics the rule matched with, or None."""
+        if not self.per_group:
+            return facts if self._holds(facts) else None
+        for group in groups:
+            if self.sides is not None and group["sides"] not in self.sides:
+                continue
+            metrics = dict(facts, **group)
+            if self._holds(metrics):
+                return metrics
+        return None
+
+
+class FormatDict(dict):
+    def __missing__(self, key):
+        return "?"
+
+
+def notation_keeps(random_obj: dict, groups: int) -> list:
+    """Each group's keep rule from userData's notation (all None if it doesn't fit the data)."""
+    user_data = random_obj.get("userData")
+    notation = user_data.get("notation") if isinstance(user_data, dict) else None
+    try:
+        parsed = parse_expression(notation)["groups"] if isinstance(notation, str) else []
+    except ValueError:
+        parsed = []
+    if len(parsed) != groups:
+        return [None] * groups
+    return [group["keep"] for group in parsed]
+
+
+def group_metrics(random_obj: dict) -> list:
+    """Per-group metrics for a signed random object (see module docstring)."""
+    data = random_obj.get("data", [])
+    if not data:
+        return []
+    low, high = random_obj.get("min"), random_obj.get("max")
+    if not isinstance(data[0], list):
+        data, low, high = [data], [low], [high]
+    if not isinstance(low, list):
+        low = [low] * len(data)
+    if not isinstance(high, list):
+        high = [high] * len(data)
+
+    groups = []
+    for values, lo, hi, keep in zip(data, low, high, notation_keeps(random_obj, len(data))):
+        if not isinstance(lo, int) or not isinstance(hi, int) or not values:
+            continue
+        counted = keep_dice(values, keep) or values
+        groups.append({
+            "n": len(values),
+            "min": lo,
+            "max": hi,
+            "sides": hi - lo + 1,
+            "die": f"d{hi}" if lo == 1 else f"{lo}..{hi}",
+            "highest": max(counted),
+            "lowest": min(counted),
+            "total": sum(counted),
+            "maxed": sum(1 for v in counted if v == hi)
+        })
+    return groups
+
+
+class RuleSet:
+    """Compiled rules, evaluated in order; the first match wins."""
+
+    def __init__(self, config: dict, source: str = "rules"):
+        if not isinstance(config, dict) or not isinstance(config.get("rules"), list):
+            raise RuleError(f"{source}: expected {{\"rules\": [...]}}")
+        self.source = source
+        self.rules = [Rule(spec) for spec in config["rules"]]
+
+    def evaluate_many(self, rolls: list) -> list:
+        """
+        Judge a batch of rolls, each (facts, random_obj) where facts holds
+        the serial analysis (gap, replay, outOfOrder, totalMissing, serial,
+        roll). Returns one {"suspicious", "suspicionReason",
+        "suspicionRule"} per roll.
+        """
+        verdicts = []
+        for facts, random_obj in rolls:
+            verdict = {"suspicious": False, "suspicionReason": None, "suspicionRule": None}
+            if not facts.get("replay") and not facts.get("outOfOrder"):
+                groups = group_metrics(random_obj)
+                roll_facts = {
+                    "gap": facts.get("gap", 0),
+                    "totalMissing": facts.get("totalMissing", 0),
+                    "serial": facts.get("serial") or 0,
+                    "dice": sum(g["n"] for g in groups)
+                }
+                for rule in self.rules:
+                    metrics = rule.match(roll_facts, groups)
+                    if metrics is not None:
+                        values = FormatDict(metrics, roll=facts.get("roll"), rule=rule.name)
+                        verdict = {
+                            "suspicious": True,
+                            "suspicionReason": rule.reason.format_map(values),
+                            "suspicionRule": rule.name
+                        }
+                        break
+            verdicts.append(verdict)
+        return verdicts
+
+    def evaluate(self, facts: dict, random_obj: dict) -> dict:
+        return self.evaluate_many([(facts, random_obj)])[0]
+
+
+def load_rules(path: str) -> RuleSet:
+    try:
+        with open(path) as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        raise RuleError(f"Cannot read rules file {path}: {e}")
+    return RuleSet(config, path)
+
+
+def get_rules(path: str = None) -> RuleSet:
+    """The compiled rules from path (default: $DM_VERIFY_RULES, else the defaults), cached."""
+    path = path or os.environ.get(RULES_ENV) or None
+    if path not in _cache:
+        _cache[path] = load_rules(path) if path else RuleSet(DEFAULT_RULES, "built-in rules")
+    return _cache[path]
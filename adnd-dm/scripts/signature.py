@@ -0,0 +1,572 @@
+"""
+signature.py - Offline verification of random.org signatures
+
+random.org signs every generateSigned* result with its RSA key: the
+signature is RSASSA-PKCS1-v1_5 with SHA-512 over the JSON serialisation
+of the "random" object, and the matching certificate is published at
+https://api.random.org/server.crt. With that certificate cached locally a
+signature can be checked in microseconds, without a verifySignature round
+trip (this is "Method C" in docs/gameplay-loop.md, built in). Objects read
+by blob.py are checked over the exact bytes they arrived in.
+
+The certificate is fetched once from the API host (so a local stand-in
+from tools/standin.py serves its own) and cached next to the quota state.
+
+Verdicts are cached too, keyed by a hash of the canonical random object
+and signature, so re-checking a blob (re-reading a thread, several DMs on
+one host, re-running history) costs a dictionary lookup. A cache hit also
+tells the caller the exact roll has been seen before.
+
+Usage:
+    from signature import get_verifier
+
+    verifier = get_verifier()
+    verdict = verifier.verify(random_obj, signature)   # mode: auto/offline/online
+    verdict["authenticity"], verdict["method"]
+    verdict["cached"], verdict["seen"]          # seen = times verified before
+
+    # Many at once: rolls that need random.org go out as JSON-RPC batches
+    verdicts = verifier.verify_many([(random_obj, signature), ...])
+
+Modes:
+    auto     Verify offline; if the certificate can't be loaded or the check
+             fails, ask random.org's verifySignature (default)
+    offline  Never call verifySignature (the certificate is still fetched
+             once if it isn't cached)
+    online   Always call verifySignature (the previous behaviour)
+
+Environment:
+    RANDOM_ORG_VERIFY     - Default mode (auto, offline or online)
+    RANDOM_ORG_CERT       - Use this PEM/DER certificate instead of fetching one
+    RANDOM_ORG_STATE_DIR  - Where the certificate and verdicts are cached
+                            (default: ~/.cache/agentic-dnd)
+    RANDOM_ORG_VERIFY_CACHE_SIZE
+                          - Verdicts to keep, least recently used dropped
+                            first (default: 10000, 0 disables the cache)
+"""
+
+import os
+import re
+import json
+import time
+import atexit
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from profiling import phase
+from randomorg import RandomOrgError, get_client
+
+DEFAULT_STATE_DIR = "~/.cache/agentic-dnd"
+CERT_PATH = "/server.crt"
+MODES = ("auto", "offline", "online")
+CACHE_FILE = "verify-cache.json"
+DEFAULT_CACHE_SIZE = 10_000
+
+OID_RSA_ENCRYPTION = "1.2.840.113549.1.1.1"
+
+# Whitespace after a structural character: pretty-printed rather than compact JSON
+# (a string value like "Attack, sword" matches too; its bytes are then tried last)
+SPACED_JSON = re.compile(rb"[\[{,:]\s")
+
+# DigestInfo prefix for SHA-512 (RFC 8017, section 9.2)
+SHA512_DIGEST_INFO = bytes.fromhex("3051300d060960864801650304020305000440")
+
+
+class SignatureError(ValueError):
+    """A certificate or signature could not be decoded."""
+
+
+# ── Minimal DER reader (just enough for an X.509 RSA public key) ─────────────
+
+def _der_read(data: bytes, offset: int = 0) -> tuple:
+    """Read one TLV at offset; returns (tag, content, next_offset)."""
+    try:
+        tag = data[offset]
+        length = data[offset + 1]
+        offset += 2
+        if length & 0x80:
+            size = length & 0x7F
+            if not 0 < size <= 4:
+                raise SignatureError("Unsupported DER length")
+            length = int.from_bytes(data[offset:offset + size], "big")
+            offset += size
+    except IndexError:
+        raise SignatureError("Truncated DER")
+    end = offset + length
+    if end > len(data):
+        raise SignatureError("Truncated DER")
+    return tag, data[offset:end], end
+
+
+def _der_children(content: bytes) -> list:
+    """The (tag, content) pairs inside a constructed value."""
+    children = []
+    offset = 0
+    while offset < len(content):
+        tag, value, offset = _der_read(content, offset)
+        children.append((tag, value))
+    return children
+
+
+def _der_oid(content: bytes) -> str:
+    parts = [content[0] // 40, content[0] % 40]
+    value = 0
+    for byte in content[1:]:
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            parts.append(value)
+            value = 0
+    return ".".join(str(p) for p in parts)
+
+
+def certificate_der(data: bytes) -> bytes:
+    """DER bytes of a certificate given as PEM or DER."""
+    if data.lstrip().startswith(b"-----BEGIN"):
+        match = re.search(rb"-----BEGIN CERTIFICATE-----(.+?)-----END CERTIFICATE-----", data, re.S)
+        if not match:
+            raise SignatureError("No CERTIFICATE block in PEM data")
+        try:
+            return base64.b64decode(b"".join(match.group(1).split()), validate=True)
+        except ValueError as e:
+            raise SignatureError(f"Invalid PEM: {e}")
+    return data
+
+
+def public_key_from_certificate(data: bytes) -> tuple:
+    """Extract the RSA public key (n, e) from an X.509 certificate (PEM or DER)."""
+    tag, certificate, _ = _der_read(certificate_der(data))
+    if tag != 0x30:
+        raise SignatureError("Certificate is not a DER SEQUENCE")
+    tbs_tag, tbs = _der_children(certificate)[0]
+    fields = _der_children(tbs)
+    if fields and fields[0][0] == 0xA0:
+        fields = fields[1:]  # explicit version
+    if len(fields) < 6:
+        raise SignatureError("Certificate has no SubjectPublicKeyInfo")
+
+    algorithm, public_key = _der_children(fields[5][1])
+    oid = _der_oid(_der_children(algorithm[1])[0][1])
+    if oid != OID_RSA_ENCRYPTION:
+        raise SignatureError(f"Certificate key is not RSA ({oid})")
+
+    # BIT STRING: first byte is the number of unused bits (always 0 here)
+    (n_tag, n), (e_tag, e) = _der_children(_der_read(public_key[1][1:])[1])
+    return int.from_bytes(n, "big"), int.from_bytes(e, "big")
+
+
+# ── RSASSA-PKCS1-v1_5 / SHA-512 ──────────────────────────────────────────────
+
+def serializations(random_obj: dict) -> list:
+    """
+    Candidate byte strings random.org may have signed for this object.
+
+    The signature covers the compact JSON text of the object in the key
+    order it was returned. Non-ASCII text (e.g. a character name in
+    userData) can be written raw or as \\u escapes, so both are tried.
+    """
+    raw = json.dumps(random_obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    escaped = json.dumps(random_obj, separators=(",", ":")).encode("utf-8")
+    return [raw] if raw == escaped else [raw, escaped]
+
+
+def rsa_verify(public_key: tuple, message: bytes, signature: bytes) -> bool:
+    """Check an RSASSA-PKCS1-v1_5 SHA-512 signature over message."""
+    n, e = public_key
+    k = (n.bit_length() + 7) // 8
+    if len(signature) != k:
+        return False
+    s = int.from_bytes(signature, "big")
+    if s >= n:
+        return False
+    t = SHA512_DIGEST_INFO + hashlib.sha512(message).digest()
+    if k < len(t) + 11:
+        return False
+    expected = b"\x00\x01" + b"\xff" * (k - len(t) - 3) + b"\x00" + t
+    return pow(s, e, n).to_bytes(k, "big") == expected
+
+
+def verify_offline(public_key: tuple, random_obj: dict, signature: str) -> bool:
+    """
+    True if signature (base64) is random.org's signature of random_obj.
+    If the object carries the bytes it was read from (.raw, see blob.py)
+    and they are compact JSON, as random.org sends it, they are checked
+    first and the object isn't re-serialised; otherwise they are tried
+    after the re-serialisations.
+    """
+    try:
+        decoded = base64.b64decode(signature, validate=True)
+    except (ValueError, TypeError):
+        return False
+    raw = getattr(random_obj, "raw", None)
+    tried = set()
+    if raw is not None and not SPACED_JSON.search(raw):
+        if rsa_verify(public_key, raw, decoded):
+            return True
+        tried.add(raw)
+    for message in serializations(random_obj) + ([raw] if raw is not None else []):
+        if message not in tried:
+            tried.add(message)
+            if rsa_verify(public_key, message, decoded):
+                return True
+    return False
+
+
+# ── Certificate loading and the verifier ────────────────────────────────────
+
+def cert_url(api_url: str) -> str:
+    """Where the API at api_url publishes its signing certificate."""
+    parts = urlsplit(api_url)
+    return f"{parts.scheme}://{parts.netloc}{CERT_PATH}"
+
+
+def cert_cache_path(api_url: str, state_dir: str = None) -> Path:
+    """Cache file for the certificate of the API at api_url (one per host)."""
+    state_dir = state_dir or os.environ.get("RANDOM_ORG_STATE_DIR") or DEFAULT_STATE_DIR
+    host = re.sub(r"[^A-Za-z0-9.-]", "_", urlsplit(api_url).netloc)
+    return Path(state_dir).expanduser() / "certs" / f"{host}.crt"
+
+
+def default_mode() -> str:
+    mode = os.environ.get("RANDOM_ORG_VERIFY", "auto").lower()
+    if mode not in MODES:
+        raise ValueError(f"RANDOM_ORG_VERIFY must be one of {', '.join(MODES)}, not {mode!r}")
+    return mode
+
+
+def cache_key(api_url: str, random_obj: dict, signature: str) -> str:
+    """Content address of a verification: API host + canonical object + signature."""
+    canonical = json.dumps(random_obj, separators=(",", ":"), sort_keys=True, ensure_ascii=False)
+    material = "\n".join([urlsplit(api_url).netloc, canonical, signature])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class VerificationCache:
+    """
+    Persistent, size-bounded LRU of authentic signature verdicts.
+
+    Entries are {"authenticity", "method", "verifiedAt", "lastSeen", "seen"}.
+    The file is loaded on first use and written back (merged with whatever
+    other processes wrote meanwhile) by flush(), which also runs at exit.
+    """
+
+    def __init__(self, state_dir: str = None, size: int = None):
+        state_dir = state_dir or os.environ.get("RANDOM_ORG_STATE_DIR") or DEFAULT_STATE_DIR
+        self.path = Path(state_dir).expanduser() / CACHE_FILE
+        if size is None:
+            size = int(os.environ.get("RANDOM_ORG_VERIFY_CACHE_SIZE", DEFAULT_CACHE_SIZE))
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = None
+        self._dirty = set()
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path) as f:
+                data = json.load(f, object_pairs_hook=OrderedDict)
+        except (IOError, ValueError):
+            return {"entries": OrderedDict(), "stats": {"hits": 0, "misses": 0}}
+        data.setdefault("entries", OrderedDict())
+        data.setdefault("stats", {"hits": 0, "misses": 0})
+        return data
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = self._read()["entries"]
+
+    def get(self, key: str) -> dict:
+        """The cached verdict for key (marking it seen once more), or None."""
+        if self.size <= 0:
+            return None
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            previous = dict(entry)
+            entry["seen"] = entry.get("seen", 1) + 1
+            entry["lastSeen"] = time.time()
+            self._entries.move_to_end(key)
+            self._dirty.add(key)
+            return previous
+
+    def put(self, key: str, verdict: dict):
+        """Remember a fresh verdict."""
+        if self.size <= 0:
+            return
+        now = time.time()
+        with self._lock:
+            self._load()
+            self._entries[key] = {
+                "authenticity": verdict["authenticity"],
+                "method": verdict["method"],
+                "verifiedAt": now,
+                "lastSeen": now,
+                "seen": 1
+            }
+            self._entries.move_to_end(key)
+            self._dirty.add(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Hit/miss counts for this process and in total, plus the entry count."""
+        with self._lock:
+            self._load()
+            totals = self._read()["stats"]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "totalHits": totals.get("hits", 0) + self.hits,
+                "totalMisses": totals.get("misses", 0) + self.misses,
+                "entries": len(self._entries),
+                "size": self.size
+            }
+
+    def flush(self):
+        """Write new and touched entries back to the cache file."""
+        with self._lock:
+            if not self._dirty and not (self.hits or self.misses):
+                return
+            data = self._read()
+            entries = data["entries"]
+            for key in [k for k in self._entries if k in self._dirty]:
+                entries.pop(key, None)
+                entries[key] = self._entries[key]
+            while len(entries) > self.size:
+                entries.popitem(last=False)
+            data["stats"]["hits"] = data["stats"].get("hits", 0) + self.hits
+            data["stats"]["misses"] = data["stats"].get("misses", 0) + self.misses
+
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f"{CACHE_FILE}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp, "w") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+
+            self._entries = entries
+            self._dirty.clear()
+            self.hits = self.misses = 0
+
+
+class Verifier:
+    """Verifies signatures against the API's certificate, falling back to the API."""
+
+    def __init__(self, client=None, cert_file: str = None, state_dir: str = None,
+                 cache: VerificationCache = None):
+        self.client = client or get_client()
+        self.cert_file = cert_file or os.environ.get("RANDOM_ORG_CERT")
+        self.state_dir = state_dir
+        self.cache = cache if cache is not None else VerificationCache(state_dir)
+        self._public_key = None
+        self._lock = threading.Lock()
+
+    def _fetch_certificate(self) -> bytes:
+        cache = cert_cache_path(self.client.url, self.state_dir)
+        if cache.exists():
+            return cache.read_bytes()
+
+        status, reason, body, _ = self.client.pool.request("GET", CERT_PATH)
+        if status != 200:
+            raise RandomOrgError(f"Could not fetch {cert_url(self.client.url)}: HTTP {status} {reason}")
+        public_key_from_certificate(body)  # don't cache something unusable
+
+        cache.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache.with_name(f"{cache.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(body)
+        os.replace(tmp, cache)
+        return body
+
+    def public_key(self) -> tuple:
+        """The API's RSA public key, loaded once per process."""
+        with self._lock:
+            if self._public_key is None:
+                with phase("cert_load"):
+                    if self.cert_file:
+                        data = Path(self.cert_file).expanduser().read_bytes()
+                    else:
+                        data = self._fetch_certificate()
+                    self._public_key = public_key_from_certificate(data)
+            return self._public_key
+
+    def verify_online(self, random_obj: dict, signature: str) -> bool:
+        """Ask random.org's verifySignature (raises RandomOrgError on failure)."""
+        with phase("signature_online"):
+            response = self.client.call("verifySignature", {
+                "random": random_obj,
+                "signature": signature
+            })
+        return authenticity(response)
+
+    def verify_online_many(self, pairs: list) -> list:
+        """
+        verify_online() for many (random_obj, signature) pairs, in JSON-RPC
+        batches (see RandomOrgClient.call_many). Returns a bool per pair, or
+        the RandomOrgError random.org answered it with; raises RandomOrgError
+        if the API is unreachable.
+        """
+        with phase("signature_online"):
+            responses = self.client.call_many("verifySignature", [
+                {"random": random_obj, "signature": signature} for random_obj, signature in pairs
+            ])
+        answers = []
+        for response in responses:
+            try:
+                answers.append(authenticity(response))
+            except RandomOrgError as e:
+                answers.append(e)
+        return answers
+
+    def verify(self, random_obj: dict, signature: str, mode: str = None, use_cache: bool = True) -> dict:
+        """
+        Verify a roll's signature, answering from the verdict cache if possible.
+
+        Returns {"authenticity": bool, "method": "offline"|"online",
+        "cached": bool, "seen": int, "verifiedAt": float}; "seen" is how many
+        times this exact roll was verified before (0 on a cache miss), and
+        "method"/"verifiedAt" describe the original check. Raises
+        RandomOrgError if the API is needed but unreachable, and
+        SignatureError/OSError in offline mode if no certificate is usable.
+        """
+        mode = mode or default_mode()
+        if not use_cache:
+            verdict = self._verify(random_obj, signature, mode)
+            verdict.update(cached=False, seen=0, verifiedAt=time.time())
+            return verdict
+
+        with phase("verdict_cache"):
+            key = cache_key(self.client.url, random_obj, signature)
+            entry = self.cache.get(key)
+        if entry is not None:
+            return cached_verdict(entry)
+
+        verdict = self._verify(random_obj, signature, mode)
+        if verdict["authenticity"]:
+            # Failures aren't cached: the key ignores field order, so a
+            # reordered copy must not poison the verdict for the real blob
+            self.cache.put(key, verdict)
+        verdict.update(cached=False, seen=0, verifiedAt=time.time())
+        return verdict
+
+    def verify_many(self, pairs: list, mode: str = None, use_cache: bool = True) -> list:
+        """
+        verify() for many (random_obj, signature) pairs. Cached verdicts and
+        offline checks are answered first; whatever still needs random.org
+        is sent as JSON-RPC batches instead of one request per roll.
+
+        Returns a verdict per pair, in order, or the exception verify()
+        would have raised for that pair.
+        """
+        mode = mode or default_mode()
+        verdicts = [None] * len(pairs)
+        keys = [None] * len(pairs)
+        online = []
+        first = {}
+        repeats = []
+        for i, (random_obj, signature) in enumerate(pairs):
+            if use_cache:
+                with phase("verdict_cache"):
+                    keys[i] = key = cache_key(self.client.url, random_obj, signature)
+                    if key in first:
+                        # Answered once the first copy is, as a later verify() would be
+                        repeats.append(i)
+                        continue
+                    first[key] = i
+                    entry = self.cache.get(key)
+                if entry is not None:
+                    verdicts[i] = cached_verdict(entry)
+                    continue
+            try:
+                verdicts[i] = self._verify_offline(random_obj, signature, mode)
+            except (SignatureError, RandomOrgError, OSError) as e:
+                verdicts[i] = e
+                continue
+            if verdicts[i] is None:
+                online.append(i)
+
+        if online:
+            try:
+                answers = self.verify_online_many([pairs[i] for i in online])
+            except RandomOrgError as e:
+                answers = [e] * len(online)
+            for i, answer in zip(online, answers):
+                verdicts[i] = answer if isinstance(answer, Exception) else {
+                    "authenticity": answer, "method": "online"}
+
+        for key, verdict in zip(keys, verdicts):
+            if verdict is None or isinstance(verdict, Exception) or verdict.get("cached"):
+                continue  # a repeat, a failure or a cache hit
+            if use_cache and verdict["authenticity"]:
+                self.cache.put(key, verdict)  # only authentic verdicts, as in verify()
+            verdict.update(cached=False, seen=0, verifiedAt=time.time())
+
+        for i in repeats:
+            verdict = verdicts[first[keys[i]]]
+            entry = None if isinstance(verdict, Exception) else self.cache.get(keys[i])
+            verdicts[i] = cached_verdict(entry) if entry is not None else (
+                verdict if isinstance(verdict, Exception) else dict(verdict))
+        return verdicts
+
+    def _verify_offline(self, random_obj: dict, signature: str, mode: str) -> dict:
+        """The offline verdict, or None if random.org has to be asked."""
+        if mode != "online":
+            try:
+                public_key = self.public_key()
+                with phase("signature_offline"):
+                    authentic = verify_offline(public_key, random_obj, signature)
+                if authentic:
+                    return {"authenticity": True, "method": "offline"}
+                if mode == "offline":
+                    return {"authenticity": False, "method": "offline"}
+            except (SignatureError, RandomOrgError, OSError):
+                if mode == "offline":
+                    raise
+        return None
+
+    def _verify(self, random_obj: dict, signature: str, mode: str) -> dict:
+        verdict = self._verify_offline(random_obj, signature, mode)
+        if verdict is None:
+            verdict = {"authenticity": self.verify_online(random_obj, signature), "method": "online"}
+        return verdict
+
+
+def cached_verdict(entry: dict) -> dict:
+    """The verdict verify() returns for a verdict cache entry."""
+    return {
+        "authenticity": entry["authenticity"],
+        "method": entry["method"],
+        "cached": True,
+        "seen": entry.get("seen", 1),
+        "verifiedAt": entry.get("verifiedAt")
+    }
+
+
+def authenticity(response: dict) -> bool:
+    """A verifySignature response's verdict (raises RandomOrgError if it is an error)."""
+    if "error" in response:
+        error = response["error"]
+        raise RandomOrgError(error.get("message", str(error)) if isinstance(error, dict) else str(error))
+    return bool(response.get("result", {}).get("authenticity", False))
+
+
+_verifiers = {}
+_verifiers_lock = threading.Lock()
+
+
+def get_verifier(client=None) -> Verifier:
+    """Return the process-wide verifier for client's API (default client if None)."""
+    client = client or get_client()
+    with _verifiers_lock:
+        verifier = _verifiers.get(client.url)
+        if verifier is None:
+            verifier = _verifiers[client.url] = Verifier(client)
+        return verifier
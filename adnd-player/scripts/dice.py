@@ -0,0 +1,170 @@
+"""
+dice.py - Dice expressions: parsing and evaluation against signed data
+
+roll.py rolls an expression ("2d20kh1+5", "1d20+2d6+1d4") in one signed
+call and writes its notation into the signed userData; dm-verify.py
+parses that notation again with the same code to work out the total the
+player should have posted, keep/drop rules and modifiers included.
+
+    parse_expression()     "2d20kh1+5" -> {"notation", "groups", "modifier"}
+    evaluate_expression()  Apply an expression to random.org's data:
+                           per-group rolls, kept dice, subtotals and total
+    describe_roll()        One-line breakdown of an evaluation
+    is_plain(), keep_dice()
+
+Usage:
+    from dice import evaluate_expression, parse_expression
+
+    expression = parse_expression("2d20kh1+5")
+    evaluate_expression(expression, [13, 7])["total"]   # 18
+"""
+
+import re
+
+MAX_DICE = 100
+MAX_SIDES = 1_000_000_000
+MAX_GROUPS = 20
+
+DICE_TERM = re.compile(r"^(\d*)d(\d+)(?:(kh|kl|k|dh|dl|d)(\d+))?$")
+MODIFIER_TERM = re.compile(r"^\d+$")
+
+
+def parse_expression(expression: str) -> dict:
+    """
+    Parse a dice expression like "1d20+2d6+1d4" or "2d20kh1+5".
+    
+    Returns {"notation": str, "groups": [...], "modifier": int} where each
+    group is {"notation", "sign", "count", "sides", "keep"}. "keep" is None
+    or a ("highest"|"lowest", k) tuple; drop-N is normalised to keep-(count-N).
+    """
+    notation = re.sub(r"\s+", "", expression).lower()
+    if not notation:
+        raise ValueError("Empty dice expression")
+    
+    terms = re.findall(r"[+-]?[^+-]+", notation)
+    if "".join(terms) != notation:
+        raise ValueError(f"Invalid dice expression: {expression}")
+    
+    groups = []
+    modifier = 0
+    
+    for term in terms:
+        sign = -1 if term[0] == "-" else 1
+        body = term.lstrip("+-")
+        
+        if MODIFIER_TERM.match(body):
+            modifier += sign * int(body)
+            continue
+        
+        match = DICE_TERM.match(body)
+        if not match:
+            raise ValueError(f"Invalid dice term: {term}")
+        
+        count = int(match.group(1)) if match.group(1) else 1
+        sides = int(match.group(2))
+        
+        if not (1 <= count <= MAX_DICE):
+            raise ValueError(f"count must be between 1 and {MAX_DICE} ({body})")
+        if not (2 <= sides <= MAX_SIDES):
+            raise ValueError(f"sides must be between 2 and {MAX_SIDES} ({body})")
+        
+        keep = None
+        if match.group(3):
+            op, k = match.group(3), int(match.group(4))
+            if op in ("d", "dl", "dh"):
+                if not (0 < k < count):
+                    raise ValueError(f"Cannot drop {k} of {count} dice ({body})")
+                keep = ("lowest" if op == "dh" else "highest", count - k)
+            else:
+                if not (0 < k <= count):
+                    raise ValueError(f"Cannot keep {k} of {count} dice ({body})")
+                keep = ("lowest" if op == "kl" else "highest", k)
+        
+        groups.append({
+            "notation": body,
+            "sign": sign,
+            "count": count,
+            "sides": sides,
+            "keep": keep
+        })
+    
+    if not groups:
+        raise ValueError(f"Dice expression has no dice: {expression}")
+    if len(groups) > MAX_GROUPS:
+        raise ValueError(f"Too many dice groups (max {MAX_GROUPS})")
+    
+    return {"notation": notation, "groups": groups, "modifier": modifier}
+
+
+def is_plain(expression: dict) -> bool:
+    """True for a bare NdM roll, which keeps the classic output format."""
+    groups = expression["groups"]
+    return (
+        len(groups) == 1
+        and groups[0]["sign"] == 1
+        and groups[0]["keep"] is None
+        and expression["modifier"] == 0
+    )
+
+
+def keep_dice(rolls: list, keep) -> list:
+    """Apply a keep-highest/lowest rule, preserving the original roll order."""
+    if keep is None:
+        return list(rolls)
+    
+    which, k = keep
+    order = sorted(range(len(rolls)), key=lambda i: rolls[i], reverse=(which == "highest"))
+    chosen = set(order[:k])
+    return [r for i, r in enumerate(rolls) if i in chosen]
+
+
+def evaluate_expression(expression: dict, data: list) -> dict:
+    """
+    Evaluate an expression against the signed data from random.org.
+    
+    data is the flat list from generateSignedIntegers (one group) or the
+    list of sequences from generateSignedIntegerSequences (one per group).
+    """
+    groups = expression["groups"]
+    sequences = [data] if len(groups) == 1 else data
+    
+    if len(sequences) != len(groups):
+        raise ValueError(
+            f"Signed data has {len(sequences)} sequences, expression has {len(groups)} groups"
+        )
+    
+    results = []
+    for group, rolls in zip(groups, sequences):
+        kept = keep_dice(rolls, group["keep"])
+        results.append({
+            "notation": group["notation"],
+            "sign": group["sign"],
+            "rolls": rolls,
+            "kept": kept,
+            "subtotal": group["sign"] * sum(kept)
+        })
+    
+    return {
+        "groups": results,
+        "modifier": expression["modifier"],
+        "total": sum(g["subtotal"] for g in results) + expression["modifier"]
+    }
+
+
+def describe_roll(evaluation: dict) -> str:
+    """One-line breakdown, e.g. '1d20 [17] + 2d6 [4, 6] + 3'."""
+    parts = []
+    for i, group in enumerate(evaluation["groups"]):
+        text = f"{group['notation']} {group['rolls']}"
+        if group["kept"] != group["rolls"]:
+            text += f" keep {group['kept']}"
+        if i == 0:
+            parts.append(text if group["sign"] > 0 else f"-{text}")
+        else:
+            parts.append(f"{'+' if group['sign'] > 0 else '-'} {text}")
+    
+    modifier = evaluation["modifier"]
+    if modifier:
+        parts.append(f"{'+' if modifier > 0 else '-'} {abs(modifier)}")
+    
+    return " ".join(parts)
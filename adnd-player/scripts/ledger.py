@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+ledger.py - Quota ledger and run-out forecast for random.org API keys
+
+The scheduler (see scheduler.py) appends one line to a ledger in the quota
+state directory for every successful signed roll: when it happened,
+bitsUsed, bitsLeft and requestsLeft from random.org's response, and the
+character and purpose from the roll's userData. Lines are compact JSON
+arrays, about 100 bytes per roll:
+
+    [1792310775.295, "3f2a9c0e1b7d4a66", 5, 999812, 991, "Theron", "Attack roll"]
+     time            key id (scheduler)  used bitsLeft reqsLeft character purpose
+
+This script reads the ledger and forecasts, per key, when today's quota
+runs out at the current burn rate (bits used over the last --window
+minutes), and whether that happens before the midnight UTC reset. It
+breaks today's usage down by character and purpose, so the busiest
+callers can be spread out or staggered before random.org refuses them.
+
+Usage:
+    # Forecast for every key used today
+    python ledger.py
+
+    # One key (id from the ledger or `python ledger.py --key-id`), 15 minute burn rate
+    python ledger.py --key 3f2a9c0e1b7d4a66 --window 15
+
+    # Drop entries older than 7 days
+    python ledger.py --prune 7
+
+Options:
+    --key ID       Only this key id (default: every key with rolls today)
+    --key-id       Print the id of $RANDOM_ORG_API_KEY and exit
+    --window MIN   Minutes of history the burn rate is measured over (default: 60)
+    --prune DAYS   Rewrite the ledger keeping only the last DAYS days
+
+Environment:
+    RANDOM_ORG_STATE_DIR - Where the ledger lives, next to the quota state
+                           (default: ~/.cache/agentic-dnd)
+    RANDOM_ORG_API_KEY   - Key for --key-id
+
+Output:
+    JSON: {key id: {"bitsLeft", "requestsLeft", "asOf", "resetAt",
+    "burn": {"windowMinutes", "bitsPerHour", "requestsPerHour"},
+    "forecast": {"bitsRunOutAt", "requestsRunOutAt", "runsOutAt", "limit"
+    ("bits" or "requests"), "beforeReset"}, "today": {"rolls", "bitsUsed"}, "byCharacter": [...]}}.
+    Times are ISO-8601 UTC; run-out times are null when fewer than 2 rolls
+    fell in the window. The rate is measured over at least 5 minutes.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, timezone
+from pathlib import Path
+
+LEDGER_FILE = "quota-ledger.jsonl"
+DEFAULT_STATE_DIR = "~/.cache/agentic-dnd"
+DEFAULT_WINDOW_MINUTES = 60
+MIN_WINDOW_SECONDS = 300   # so a quick burst of rolls doesn't read as a day-long rate
+MIN_SAMPLES = 2            # rolls in the window needed for a forecast
+FIELDS = ("t", "key", "bitsUsed", "bitsLeft", "requestsLeft", "character", "purpose")
+READ_BLOCK = 1 << 16       # bytes read per step when seeking back from the end of the ledger
+APPEND_SKEW = 300          # seconds concurrent writers' entries may be out of order by
+
+
+def iso(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def day_start(now: float) -> float:
+    """Epoch seconds of the most recent midnight UTC (when quotas reset)."""
+    today = datetime.fromtimestamp(now, timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return today.timestamp()
+
+
+class Ledger:
+    """Append-only quota ledger for one state directory."""
+
+    def __init__(self, state_dir: str = None):
+        state_dir = state_dir or os.environ.get("RANDOM_ORG_STATE_DIR") or DEFAULT_STATE_DIR
+        self.path = Path(state_dir).expanduser() / LEDGER_FILE
+
+    def append(self, kid: str, response: dict, user_data=None, ts: float = None):
+        """Record a successful response's quota fields (error responses are skipped)."""
+        result = response.get("result")
+        if not isinstance(result, dict):
+            return
+        user_data = user_data if isinstance(user_data, dict) else {}
+        entry = [round(ts if ts is not None else time.time(), 3), kid, result.get("bitsUsed"),
+                 result.get("bitsLeft"), result.get("requestsLeft"),
+                 user_data.get("character"), user_data.get("purpose")]
+        line = (json.dumps(entry, separators=(",", ":"), ensure_ascii=False) + "\n").encode("utf-8")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # O_APPEND: concurrent roll.py processes never interleave a line
+        fd = os.open(str(self.path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def entries(self, kid: str = None, since: float = None) -> list:
+        """
+        Ledger entries as dicts, oldest first (unreadable lines are skipped).
+        With since, only the end of the file from about that time on is read
+        (see start_offset), so today's forecast doesn't grow with the ledger.
+        """
+        entries = []
+        try:
+            f = open(self.path, "rb")
+        except OSError:
+            return entries
+        with f:
+            if since is not None:
+                f.seek(start_offset(f, since - APPEND_SKEW))
+            for line in f:
+                try:
+                    values = json.loads(line.decode("utf-8"))
+                except ValueError:
+                    continue
+                if not isinstance(values, list) or len(values) != len(FIELDS):
+                    continue
+                entry = dict(zip(FIELDS, values))
+                if kid is not None and entry["key"] != kid:
+                    continue
+                if since is not None and entry["t"] < since:
+                    continue
+                entries.append(entry)
+        entries.sort(key=lambda e: e["t"])
+        return entries
+
+    def prune(self, keep_days: float, now: float = None) -> int:
+        """
+        Drop entries older than keep_days; returns how many were kept. A roll
+        logged by another process while the file is rewritten may be lost.
+        """
+        now = now if now is not None else time.time()
+        kept = self.entries(since=now - keep_days * 86400)
+        tmp = self.path.with_name(f"{LEDGER_FILE}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for entry in kept:
+                f.write(json.dumps([entry[field] for field in FIELDS], separators=(",", ":"),
+                                   ensure_ascii=False) + "\n")
+        os.replace(tmp, self.path)
+        return len(kept)
+
+    def forecast(self, kid: str, now: float = None, window_minutes: float = DEFAULT_WINDOW_MINUTES):
+        """Quota left, burn rate and run-out forecast for one key today (None if no rolls today)."""
+        now = now if now is not None else time.time()
+        start = day_start(now)
+        today = self.entries(kid, since=start)
+        if not today:
+            return None
+        return forecast(today, now, start, window_minutes)
+
+
+def line_time(line: bytes):
+    """A ledger line's timestamp, or None if it isn't an entry."""
+    try:
+        values = json.loads(line.decode("utf-8"))
+    except ValueError:
+        return None
+    if not isinstance(values, list) or len(values) != len(FIELDS) or not isinstance(values[0], (int, float)):
+        return None
+    return values[0]
+
+
+def start_offset(f, since: float) -> int:
+    """
+    Offset of a line logged before since, found by reading a binary file
+    back from the end one READ_BLOCK at a time (0 if there is none). Lines
+    are appended in time order, give or take APPEND_SKEW.
+    """
+    pos = f.seek(0, os.SEEK_END)
+    while pos > READ_BLOCK:
+        pos -= READ_BLOCK
+        f.seek(pos)
+        lines = f.read(READ_BLOCK).split(b"\n")
+        # The first line may have started in the block before; the last runs into the next
+        offset = pos + len(lines[0]) + 1
+        for line in lines[1:-1]:
+            t = line_time(line)
+            if t is not None:
+                if t < since:
+                    return offset
+                break
+            offset += len(line) + 1
+    return 0
+
+
+def run_out(left, per_second: float, now: float):
+    if left is None or not per_second:
+        return None
+    return now + left / per_second
+
+
+def forecast(today: list, now: float, start: float, window_minutes: float) -> dict:
+    """Forecast from one key's entries since the last reset (see Ledger.forecast)."""
+    last = today[-1]
+    reset = start + 86400
+    # Measure over the window, but not before the first roll logged today
+    window_start = max(now - window_minutes * 60, today[0]["t"])
+    span = max(now - window_start, MIN_WINDOW_SECONDS)
+    recent = [e for e in today if e["t"] >= window_start]
+    if len(recent) >= MIN_SAMPLES:
+        bits_rate = sum(e["bitsUsed"] or 0 for e in recent) / span
+        requests_rate = len(recent) / span
+    else:
+        bits_rate = requests_rate = 0.0
+
+    bits_out = run_out(last["bitsLeft"], bits_rate, now)
+    requests_out = run_out(last["requestsLeft"], requests_rate, now)
+    outs = [(t, limit) for t, limit in ((bits_out, "bits"), (requests_out, "requests")) if t is not None]
+    runs_out, limit = min(outs) if outs else (None, None)
+
+    total_bits = sum(e["bitsUsed"] or 0 for e in today)
+    characters = {}
+    for entry in today:
+        name = entry["character"] or "Unknown"
+        character = characters.setdefault(name, {"character": name, "rolls": 0, "bitsUsed": 0,
+                                                 "share": 0.0, "recentBits": 0, "purposes": {}})
+        bits = entry["bitsUsed"] or 0
+        character["rolls"] += 1
+        character["bitsUsed"] += bits
+        if entry["t"] >= window_start:
+            character["recentBits"] += bits
+        purpose = character["purposes"].setdefault(entry["purpose"] or "Generic roll",
+                                                   {"rolls": 0, "bitsUsed": 0})
+        purpose["rolls"] += 1
+        purpose["bitsUsed"] += bits
+
+    by_character = []
+    for character in sorted(characters.values(), key=lambda c: c["bitsUsed"], reverse=True):
+        if total_bits:
+            character["share"] = round(character["bitsUsed"] / total_bits, 3)
+        character["purposes"] = [dict(purpose=name, **stats) for name, stats in
+                                 sorted(character["purposes"].items(),
+                                        key=lambda item: item[1]["bitsUsed"], reverse=True)]
+        by_character.append(character)
+
+    return {
+        "bitsLeft": last["bitsLeft"],
+        "requestsLeft": last["requestsLeft"],
+        "asOf": iso(last["t"]),
+        "resetAt": iso(reset),
+        "burn": {
+            "windowMinutes": round(span / 60, 1),
+            "bitsPerHour": round(bits_rate * 3600),
+            "requestsPerHour": round(requests_rate * 3600, 1)
+        },
+        "forecast": {
+            "bitsRunOutAt": iso(bits_out) if bits_out is not None else None,
+            "requestsRunOutAt": iso(requests_out) if requests_out is not None else None,
+            "runsOutAt": iso(runs_out) if runs_out is not None else None,
+            "limit": limit,
+            "beforeReset": runs_out is not None and runs_out < reset
+        },
+        "today": {"rolls": len(today), "bitsUsed": total_bits},
+        "byCharacter": by_character
+    }
+
+
+def report(ledger: Ledger, kid: str = None, now: float = None,
+           window_minutes: float = DEFAULT_WINDOW_MINUTES) -> dict:
+    """{key id: forecast} for kid, or for every key with rolls today."""
+    now = now if now is not None else time.time()
+    kids = [kid] if kid else sorted({e["key"] for e in ledger.entries(since=day_start(now))})
+    forecasts = {}
+    for k in kids:
+        result = ledger.forecast(k, now, window_minutes)
+        if result is not None:
+            forecasts[k] = result
+    return forecasts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="random.org quota ledger and forecast")
+    parser.add_argument("--key", metavar="ID", help="Only this key id")
+    parser.add_argument("--key-id", action="store_true", help="Print the id of $RANDOM_ORG_API_KEY")
+    parser.add_argument("--window", type=float, default=DEFAULT_WINDOW_MINUTES, metavar="MIN",
+                        help=f"Burn rate window in minutes (default: {DEFAULT_WINDOW_MINUTES})")
+    parser.add_argument("--prune", type=float, metavar="DAYS", help="Keep only the last DAYS days")
+    args = parser.parse_args()
+
+    if args.key_id:
+        api_key = os.environ.get("RANDOM_ORG_API_KEY")
+        if not api_key:
+            print(json.dumps({"error": "RANDOM_ORG_API_KEY environment variable not set"}))
+            sys.exit(1)
+        from scheduler import key_id
+        print(key_id(api_key))
+        return
+
+    ledger = Ledger()
+    if args.prune is not None:
+        try:
+            kept = ledger.prune(args.prune)
+        except OSError as e:
+            print(json.dumps({"error": f"Cannot prune {ledger.path}: {e}"}))
+            sys.exit(1)
+        print(json.dumps({"message": f"Kept {kept} entries from the last {args.prune:g} days"}))
+        return
+
+    print(json.dumps(report(ledger, args.key, window_minutes=args.window), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""
+metrics.py - Prometheus metrics for the roll and verification hot paths
+
+Counters, gauges and latency histograms kept in memory by every script
+(random.org calls, quota, serial analysis, tracker I/O, verdicts) and
+exported in the Prometheus text format, either to a file when the script
+exits or from a local HTTP endpoint while it runs.
+
+roll.py and dm-verify.py are usually short-lived, so the file export
+accumulates: counters and histograms from earlier runs are added to this
+run's, gauges keep their latest value. Point node_exporter's textfile
+collector (or anything that reads the format) at the file. The HTTP
+endpoint serves the current process only; use it for long runs such as
+roll-daemon.py or a large --batch / --ingest.
+
+Usage:
+    from metrics import counter, histogram, start_export
+
+    ROLLS = counter("roll_rolls_total", "Rolls made", ["outcome"])
+    LATENCY = histogram("roll_seconds", "Time to make a roll")
+
+    start_export()                 # in main(): honour the environment
+    with LATENCY.time():
+        ...
+    ROLLS.inc(outcome="ok")
+
+Environment:
+    RANDOM_ORG_METRICS_FILE - Write metrics to this file on exit (accumulating
+                              across runs, see above)
+    RANDOM_ORG_METRICS_PORT - Serve them at http://127.0.0.1:PORT/metrics
+                              while the script runs
+"""
+
+import os
+import re
+import time
+import atexit
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent writers may then lose a run
+    fcntl = None
+
+METRICS_FILE_ENV = "RANDOM_ORG_METRICS_FILE"
+METRICS_PORT_ENV = "RANDOM_ORG_METRICS_PORT"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers an in-memory lookup up to a slow random.org call
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+SAMPLE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{.*\})?\s+(\S+)$")
+
+_families = {}
+_lock = threading.Lock()
+_exporting = set()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    """One metric family: a value per label combination."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"{self.name} takes labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.label_names)
+
+    def samples(self) -> list:
+        """[(sample name, label string, value)] in exposition order."""
+        return [(self.name, _labels(self.label_names, key), value)
+                for key, value in sorted(self.values.items())]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with _lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> list:
+        samples = []
+        names = self.label_names + ("le",)
+        for key, (counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                samples.append((f"{self.name}_bucket", _labels(names, key + (_number(bound),)), cumulative))
+            samples.append((f"{self.name}_sum", _labels(self.label_names, key), total))
+            samples.append((f"{self.name}_count", _labels(self.label_names, key), count))
+        return samples
+
+
+def _register(cls, name: str, help_text: str, labels, **kwargs):
+    with _lock:
+        metric = _families.get(name)
+        if metric is None:
+            metric = _families[name] = cls(name, help_text, labels, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+        return metric
+
+
+def counter(name: str, help_text: str, labels=()) -> Counter:
+    """The process-wide counter called name, created on first use."""
+    return _register(Counter, name, help_text, labels)
+
+
+def gauge(name: str, help_text: str, labels=()) -> Gauge:
+    return _register(Gauge, name, help_text, labels)
+
+
+def histogram(name: str, help_text: str, labels=(), buckets=LATENCY_BUCKETS) -> Histogram:
+    return _register(Histogram, name, help_text, labels, buckets=buckets)
+
+
+def snapshot() -> dict:
+    """{family: {"type", "help", "samples": {(sample name, labels): value}}} of this process."""
+    with _lock:
+        return {
+            name: {
+                "type": metric.kind,
+                "help": metric.help,
+                "samples": {(s, l): v for s, l, v in metric.samples()}
+            }
+            for name, metric in _families.items() if metric.values
+        }
+
+
+def parse(text: str) -> dict:
+    """A snapshot from Prometheus text written by render() (other lines are ignored)."""
+    families = {}
+    family = None
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            name, _, help_text = line[7:].partition(" ")
+            family = families.setdefault(name, {"type": "untyped", "help": "", "samples": {}})
+            family["help"] = help_text.replace("\\n", "\n").replace("\\\\", "\\")
+        elif line.startswith("# TYPE "):
+            name, _, kind = line[7:].partition(" ")
+            family = families.setdefault(name, {"type": "untyped", "help": "", "samples": {}})
+            family["type"] = kind.strip()
+        elif family is not None:
+            match = SAMPLE.match(line)
+            if match:
+                try:
+                    value = float(match.group(3))
+                except ValueError:
+                    continue
+                family["samples"][(match.group(1), match.group(2) or "")] = value
+    return families
+
+
+def merge(previous: dict, current: dict) -> dict:
+    """
+    current on top of previous: counter and histogram samples are added,
+    gauges and anything else take the current value.
+    """
+    merged = {name: dict(family, samples=dict(family["samples"])) for name, family in previous.items()}
+    for name, family in current.items():
+        base = merged.get(name)
+        if base is None or base["type"] != family["type"]:
+            merged[name] = dict(family, samples=dict(family["samples"]))
+            continue
+        base["help"] = family["help"]
+        for sample, value in family["samples"].items():
+            if family["type"] in ("counter", "histogram"):
+                base["samples"][sample] = base["samples"].get(sample, 0) + value
+            else:
+                base["samples"][sample] = value
+    return merged
+
+
+def render(families: dict = None) -> str:
+    """Prometheus text exposition of a snapshot (default: this process)."""
+    families = snapshot() if families is None else families
+    lines = []
+    for name in sorted(families):
+        family = families[name]
+        help_text = family["help"].replace("\\", "\\\\").replace("\n", "\\n")
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for (sample, labels), value in family["samples"].items():
+            lines.append(f"{sample}{labels} {_number(value)}")
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def write_file(path: str):
+    """Add this process's metrics to the file at path (atomically replaced)."""
+    current = snapshot()
+    if not current:
+        return
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path + ".lock", "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with open(path) as f:
+                previous = parse(f.read())
+        except OSError:
+            previous = {}
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(render(merge(previous, current)))
+        os.replace(tmp, path)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port: int, host: str = "127.0.0.1") -> HTTPServer:
+    """Serve /metrics from a daemon thread; returns the server."""
+    server = HTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_export():
+    """
+    Export as the environment asks (RANDOM_ORG_METRICS_FILE on exit,
+    RANDOM_ORG_METRICS_PORT while running). Call once from main().
+    """
+    path = os.environ.get(METRICS_FILE_ENV)
+    if path and path not in _exporting:
+        _exporting.add(path)
+        atexit.register(write_file, path)
+    port = os.environ.get(METRICS_PORT_ENV)
+    if port and port not in _exporting:
+        _exporting.add(port)
+        serve(int(port))
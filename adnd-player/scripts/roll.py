@@ -3,177 +3,644 @@
 roll.py - Cryptographically signed dice roller using random.org
 
 Usage:
-    python roll.py <count> <sides> <character> <purpose>
+    python roll.py [--jsonl] <count> <sides> <character> <purpose>
+    python roll.py [--jsonl] <expression> <character> <purpose>
+    python roll.py --batch [--concurrency N] < rolls.jsonl
+    python roll.py --profile [--profile-out FILE] 1d20 "Theron" "Attack roll"
+    python roll.py --campaign "Goblin Ambush" 1d20 "Theron" "Initiative"
     
 Examples:
     python roll.py 1 20 "Theron" "Attack roll"
     python roll.py 2 6 "Theron" "Damage (2d6)"
     python roll.py 2 20 "Lyralei" "Attack with advantage"
+    python roll.py 1d20+2d6+1d4 "Theron" "Full attack"
+    python roll.py 2d20kh1+5 "Lyralei" "Attack with advantage"
+    python roll.py 4d6dl1 "Grimjaw" "Strength score"
+
+Expressions:
+    NdM       Roll N dice with M sides (N defaults to 1)
+    NdMkhK    Keep the highest K dice (also: kK)
+    NdMklK    Keep the lowest K dice
+    NdMdlK    Drop the lowest K dice (also: dK)
+    NdMdhK    Drop the highest K dice
+    +X / -X   Add or subtract a modifier or another dice group
+
+    An expression with several dice groups is rolled in ONE signed
+    generateSignedIntegerSequences call (one sequence per group), so the
+    whole roll has one serial number and one verification blob.
+
+Batch mode:
+    --batch reads one roll spec per line from stdin and prints one --jsonl
+    record per roll, tagged with its 0-based input "index", as rolls finish:
+    
+        {"count": 1, "sides": 20, "character": "Theron", "purpose": "Initiative"}
+        {"expression": "1d20+2", "character": "Lyralei", "purpose": "Initiative"}
+    
+    Specs may also carry "apiKey" and "campaign". Up to --concurrency rolls (default 4)
+    run at once on shared connections; rolls for the same API key run in
+    input order, so their serial numbers follow the input. Exits 1 if any
+    roll failed.
+
+Profiling:
+    --profile prints a per-phase timing breakdown to stderr as one JSON
+    line when the script exits (arg_parse, payload_build, quota_check,
+    api_call with its DNS/connect/TLS/server/read/decode stages,
+    quota_save, evaluate, output; see profiling.py). --profile-out FILE
+    also writes cProfile stats to FILE.
+
+Tracing:
+    With RANDOM_ORG_TRACE_FILE set, every signed roll appends a trace
+    event (request and response spans, keyed by hashedApiKey and serial)
+    that rolltrace.py joins with the DM's verification. --campaign NAME
+    (default $DND_CAMPAIGN) is signed into userData as "campaign", so
+    the DM's side is tagged with it too.
 
 Environment:
     RANDOM_ORG_API_KEY - Your random.org API key (required)
+    RANDOM_ORG_API_URL - Override the API endpoint (e.g. tools/standin.py)
+    RANDOM_ORG_TIMINGS - If set, print connect/TLS/response timings to stderr
+    RANDOM_ORG_RESERVE_BITS, RANDOM_ORG_MAX_WAIT, RANDOM_ORG_STATE_DIR
+                       - Quota scheduling (see scheduler.py)
+    ROLL_DAEMON_SOCKET - If set, send the roll to a running roll-daemon.py
+                         on this Unix socket instead of calling random.org
+    ROLL_DAEMON_COALESCE - If set, let the daemon share one signed request
+                         (one serial and blob) with this character's other
+                         rolls arriving at the same moment (see roll-daemon.py)
+    RANDOM_ORG_METRICS_FILE, RANDOM_ORG_METRICS_PORT
+                       - Export Prometheus metrics (roll and API latency,
+                         outcomes, bitsLeft/requestsLeft; see metrics.py)
+    RANDOM_ORG_TRACE_FILE, DND_CAMPAIGN
+                       - Roll tracing (see above and rolltrace.py)
+
+Rolls are scheduled per API key: roll.py waits out random.org's
+advisoryDelay from the previous roll, and refuses a roll up front if the
+estimated bit cost exceeds the bitsLeft/requestsLeft from the last response.
+Every response is also logged to a quota ledger; when the key's burn rate
+would exhaust it before the midnight UTC reset, roll.py warns on stderr
+(`python ledger.py` shows the forecast and who is using the bits).
 
 Output:
-    Human-readable results + verification JSON blob for posting
+    Human-readable results + verification JSON blob for posting.
+    
+    With --jsonl, one JSON object per roll instead (errors as {"error": ...}):
+    character, purpose, notation, rolls, groups, modifier, total, serial,
+    completionTime, hashedApiKey, blob {random, signature}, bitsUsed,
+    bitsLeft, requestsLeft, advisoryDelay.
+
+Library use:
+    from roll import make_roll, render_output
+    result = make_roll("1d20+5", "Theron", "Attack roll")   # no printing, no sys.exit
 """
 
 import os
 import sys
 import json
 import time
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError, URLError
 
-API_URL = "https://api.random.org/json-rpc/4/invoke"
+import profiling
+from dice import MAX_DICE, MAX_GROUPS, MAX_SIDES, describe_roll, evaluate_expression, is_plain, parse_expression
+from metrics import counter, histogram, start_export
+from profiling import phase
+from randomorg import get_client, report_timings
+from rolltrace import CAMPAIGN_ENV, get_trace_log
+from scheduler import QuotaExceeded, get_scheduler, key_id
 
+DAEMON_TIMEOUT = 120
+USER_DATA_LIMIT = 1000  # characters of serialised userData random.org accepts
+DEFAULT_BATCH_CONCURRENCY = 4
 
-def roll_dice(count: int, sides: int, character: str, purpose: str) -> dict:
-    """Roll dice using random.org Signed API."""
+ROLLS = counter("roll_requests_total", "Signed roll requests by outcome", ["outcome"])
+ROLL_SECONDS = histogram("roll_request_seconds", "Signed roll latency, including waiting for quota")
+
+
+def user_data(character: str, purpose: str, notation: str, campaign: str = None) -> dict:
+    """The userData signed with a roll: who rolled, why, the notation and when."""
+    data = {
+        "character": character,
+        "purpose": purpose,
+        "notation": notation,
+        "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    }
+    campaign = campaign or os.environ.get(CAMPAIGN_ENV)
+    if campaign:
+        data["campaign"] = campaign
+    return data
+
+
+def _signed_request(method: str, params: dict, character: str, purpose: str, notation: str,
+                    api_key: str = None, campaign: str = None) -> dict:
+    """Send a signed generation request with the API key and roll context."""
     
-    api_key = os.environ.get("RANDOM_ORG_API_KEY")
+    requested = time.time()
+    api_key = api_key or os.environ.get("RANDOM_ORG_API_KEY")
     if not api_key:
         raise ValueError(
             "RANDOM_ORG_API_KEY environment variable not set.\n"
             "Get a free key at: https://api.random.org/api-keys"
         )
     
-    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    with phase("payload_build"):
+        params = dict(params)
+        params["apiKey"] = api_key
+        params["userData"] = user_data(character, purpose, notation, campaign)
+        campaign = params["userData"].get("campaign")
     
-    payload = {
-        "jsonrpc": "2.0",
-        "method": "generateSignedIntegers",
-        "params": {
-            "apiKey": api_key,
-            "n": count,
-            "min": 1,
-            "max": sides,
-            "replacement": True,
-            "userData": {
-                "character": character,
-                "purpose": purpose,
-                "notation": f"{count}d{sides}",
-                "timestamp": timestamp
-            }
-        },
-        "id": int(time.time())
-    }
+    client = get_client()
+    outcome = "failed"
+    start = time.perf_counter()
+    sent = []
     
-    req = Request(
-        API_URL,
-        data=json.dumps(payload).encode("utf-8"),
-        headers={"Content-Type": "application/json"}
-    )
+    def send():
+        sent.append(time.time())
+        return client.call(method, params, request_id=int(sent[-1]))
     
     try:
-        with urlopen(req, timeout=30) as response:
-            return json.loads(response.read().decode("utf-8"))
-    except HTTPError as e:
-        raise RuntimeError(f"HTTP error {e.code}: {e.reason}")
-    except URLError as e:
-        raise RuntimeError(f"Connection error: {e.reason}")
+        response = get_scheduler().submit(api_key, method, params, send)
+        outcome = "error" if "error" in response else "ok"
+    except QuotaExceeded:
+        outcome = "rejected"
+        raise
+    finally:
+        ROLL_SECONDS.observe(time.perf_counter() - start)
+        ROLLS.inc(outcome=outcome)
+    report_timings(client)
+    
+    log = get_trace_log()
+    if log is not None and outcome == "ok":
+        log.roll(response["result"]["random"], requested, sent[-1], time.time(), campaign)
+    return response
+
+
+def roll_dice(count: int, sides: int, character: str, purpose: str) -> dict:
+    """Roll dice using random.org Signed API."""
+    
+    return _signed_request("generateSignedIntegers", {
+        "n": count,
+        "min": 1,
+        "max": sides,
+        "replacement": True
+    }, character, purpose, f"{count}d{sides}")
 
 
-def format_output(response: dict, character: str, purpose: str, count: int, sides: int):
-    """Format the response for posting to Moltbook."""
+def roll_expression(expression: dict, character: str, purpose: str, api_key: str = None,
+                    campaign: str = None) -> dict:
+    """
+    Roll a parsed dice expression in a single signed API call.
     
+    One group uses generateSignedIntegers (same blob as a plain roll);
+    several groups use generateSignedIntegerSequences with one sequence
+    per group, so the DM verifies a single serial for the whole expression.
+    """
+    groups = expression["groups"]
+    
+    if len(groups) == 1:
+        return _signed_request("generateSignedIntegers", {
+            "n": groups[0]["count"],
+            "min": 1,
+            "max": groups[0]["sides"],
+            "replacement": True
+        }, character, purpose, expression["notation"], api_key, campaign)
+    
+    return _signed_request("generateSignedIntegerSequences", {
+        "n": len(groups),
+        "length": [g["count"] for g in groups],
+        "min": [1] * len(groups),
+        "max": [g["sides"] for g in groups],
+        "replacement": True
+    }, character, purpose, expression["notation"], api_key, campaign)
+
+
+class RollError(RuntimeError):
+    """random.org answered a roll request with a JSON-RPC error."""
+    
+    def __init__(self, message: str, code: int = None):
+        super().__init__(message)
+        self.code = code
+
+
+def build_result(response: dict, character: str, purpose: str, expression: dict,
+                 data: list = None) -> dict:
+    """
+    Turn a random.org response into a structured roll result.
+    
+    data overrides the signed data the expression is evaluated against (the
+    daemon uses it for each caller's slice of a coalesced roll). Raises
+    RollError if random.org returned an error.
+    """
     if "error" in response:
-        print(f"Error: {response['error'].get('message', response['error'])}", file=sys.stderr)
-        sys.exit(1)
+        error = response["error"]
+        if isinstance(error, dict):
+            raise RollError(error.get("message", str(error)), error.get("code"))
+        raise RollError(str(error))
     
     result = response["result"]
     random_obj = result["random"]
-    signature = result["signature"]
-    rolls = random_obj["data"]
-    total = sum(rolls)
-    serial = random_obj["serialNumber"]
-    
-    # Build the verification blob (for DM to verify)
-    verification_blob = {
-        "random": random_obj,
-        "signature": signature
+    with phase("evaluate"):
+        evaluation = evaluate_expression(expression, random_obj["data"] if data is None else data)
+    
+    return {
+        "character": character,
+        "purpose": purpose,
+        "notation": expression["notation"],
+        "plain": is_plain(expression),
+        "rolls": [r for g in evaluation["groups"] for r in g["rolls"]],
+        "groups": evaluation["groups"],
+        "modifier": evaluation["modifier"],
+        "total": evaluation["total"],
+        "serial": random_obj["serialNumber"],
+        "completionTime": random_obj.get("completionTime"),
+        "hashedApiKey": random_obj.get("hashedApiKey"),
+        "blob": {
+            "random": random_obj,
+            "signature": result["signature"]
+        },
+        "bitsUsed": result.get("bitsUsed"),
+        "bitsLeft": result.get("bitsLeft"),
+        "requestsLeft": result.get("requestsLeft"),
+        "advisoryDelay": result.get("advisoryDelay")
     }
+
+
+def make_roll(notation: str, character: str = "Unknown", purpose: str = "Generic roll",
+              api_key: str = None, campaign: str = None) -> dict:
+    """
+    Roll a dice expression and return the structured result.
     
-    # Human-readable output
-    print("═" * 60)
-    print("🎲 DICE ROLL RESULT")
-    print("═" * 60)
-    print()
-    print(f"Character:  {character}")
-    print(f"Purpose:    {purpose}")
-    print(f"Notation:   {count}d{sides}")
-    print()
-    print(f"Results:    {rolls}")
-    print(f"Total:      {total}")
-    print(f"Serial:     #{serial}")
-    print()
-    
-    # Post template
-    print("─" * 60)
-    print("📋 COPY THIS INTO YOUR POST:")
-    print("─" * 60)
-    print()
-    
-    # Format the roll display
-    if count == 1:
+    This is the in-process entry point for orchestrators:
+    
+        from roll import make_roll
+        result = make_roll("1d20+5", "Theron", "Attack roll")
+        result["total"], result["serial"], result["blob"]
+    
+    Raises ValueError for a bad expression or missing API key, RollError
+    for random.org errors, and RuntimeError for connection failures.
+    """
+    expression = parse_expression(notation)
+    response = roll_expression(expression, character, purpose, api_key, campaign)
+    return build_result(response, character, purpose, expression)
+
+
+def post_text(result: dict) -> str:
+    """The 'copy this into your post' block for a roll result."""
+    character = result["character"]
+    purpose = result["purpose"]
+    rolls = result["groups"][0]["rolls"]
+    total = result["total"]
+    blob = json.dumps(result["blob"], separators=(',', ':'))
+    
+    if result["plain"] and len(rolls) == 1:
         nat = rolls[0]
         nat_label = " (NAT 20! 🎉)" if nat == 20 else " (nat 1...)" if nat == 1 else ""
-        print(f"**{character}'s Roll:** {purpose} — **{nat}**{nat_label}")
+        headline = f"**{character}'s Roll:** {purpose} — **{nat}**{nat_label}"
+    elif result["plain"]:
+        headline = f"**{character}'s Roll:** {purpose} — {rolls} = **{total}**"
+    else:
+        headline = f"**{character}'s Roll:** {purpose} — {describe_roll(result)} = **{total}**"
+    
+    return "\n".join([
+        headline,
+        f"Serial: #{result['serial']}",
+        "",
+        "<details>",
+        "<summary>🔐 Verification</summary>",
+        "",
+        "```json",
+        blob,
+        "```",
+        "</details>",
+    ]) + "\n"
+
+
+def render_output(result: dict) -> str:
+    """Full human-readable output for a roll result (what roll.py prints)."""
+    lines = [
+        "═" * 60,
+        "🎲 DICE ROLL RESULT",
+        "═" * 60,
+        "",
+        f"Character:  {result['character']}",
+        f"Purpose:    {result['purpose']}",
+        f"Notation:   {result['notation']}",
+        "",
+    ]
+    
+    if result["plain"]:
+        lines.append(f"Results:    {result['groups'][0]['rolls']}")
+    else:
+        for group in result["groups"]:
+            kept = f" (kept {group['kept']})" if group["kept"] != group["rolls"] else ""
+            lines.append(f"Results:    {group['notation']:<10} {group['rolls']}{kept}")
+        if result["modifier"]:
+            lines.append(f"Modifier:   {result['modifier']:+d}")
+    
+    lines += [
+        f"Total:      {result['total']}",
+        f"Serial:     #{result['serial']}",
+        "",
+        # Post template
+        "─" * 60,
+        "📋 COPY THIS INTO YOUR POST:",
+        "─" * 60,
+        "",
+        post_text(result),
+        # Also output raw JSON for programmatic use
+        "─" * 60,
+        "📦 RAW VERIFICATION BLOB (for DM tools):",
+        "─" * 60,
+        "",
+        json.dumps(result["blob"], separators=(',', ':')),
+        "",
+        "═" * 60,
+    ]
+    
+    if result["bitsLeft"] is not None:
+        lines.append(f"Bits remaining: {result['bitsLeft']:,}")
+    if result["requestsLeft"] is not None:
+        lines.append(f"Requests remaining: {result['requestsLeft']:,}")
+    if result["advisoryDelay"]:
+        lines.append(f"Next roll allowed in: {result['advisoryDelay'] / 1000:.1f}s")
+    lines.append("═" * 60)
+    
+    return "\n".join(lines) + "\n"
+
+
+def jsonl_line(result: dict) -> str:
+    """One JSON Lines record for a roll result (--jsonl output)."""
+    return json.dumps(result, separators=(',', ':'), ensure_ascii=False)
+
+
+def format_output(response: dict, character: str, purpose: str, expression: dict,
+                  data: list = None, out=None):
+    """Format the response for posting to Moltbook (writes to out, default stdout)."""
+    
+    result = build_result(response, character, purpose, expression, data)
+    (out or sys.stdout).write(render_output(result))
+
+
+def roll_via_daemon(socket_path: str, expression: dict, character: str, purpose: str,
+                    campaign: str = None) -> dict:
+    """
+    Ask a running roll-daemon.py to make the roll, signing campaign (default
+    $DND_CAMPAIGN) into its userData as roll_expression() does.
+    
+    Returns the daemon's reply: {"output": "...", "result": {...}} with the
+    text format_output() prints and the structured result, or {"error": "..."}.
+    """
+    request = {
+        "expression": expression["notation"],
+        "character": character,
+        "purpose": purpose
+    }
+    api_key = os.environ.get("RANDOM_ORG_API_KEY")
+    if api_key:
+        request["apiKey"] = api_key
+    campaign = campaign or os.environ.get(CAMPAIGN_ENV)
+    if campaign:
+        request["campaign"] = campaign
+    if os.environ.get("ROLL_DAEMON_COALESCE"):
+        request["coalesce"] = True
+    
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(DAEMON_TIMEOUT)
+        try:
+            sock.connect(socket_path)
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            reply = sock.makefile("rb").readline()
+        except OSError as e:
+            raise RuntimeError(f"Roll daemon unavailable at {socket_path}: {e}")
+    
+    if not reply:
+        raise RuntimeError("Roll daemon closed the connection without replying")
+    return json.loads(reply.decode("utf-8"))
+
+
+def classic_expression(count, sides) -> dict:
+    """Validate a classic count/sides pair and return it as a parsed expression."""
+    try:
+        count = int(count)
+        sides = int(sides)
+    except (TypeError, ValueError):
+        raise ValueError("count and sides must be integers")
+    
+    if not (1 <= count <= MAX_DICE):
+        raise ValueError(f"count must be between 1 and {MAX_DICE}")
+    if not (2 <= sides <= MAX_SIDES):
+        raise ValueError(f"sides must be between 2 and {MAX_SIDES}")
+    
+    return parse_expression(f"{count}d{sides}")
+
+
+def parse_args(argv: list) -> tuple:
+    """Parse '<count> <sides> ...' or '<expression> ...' into (expression, character, purpose)."""
+    
+    if argv[0].lstrip("+-").isdigit():
+        # Classic form: <count> <sides> <character> <purpose>
+        if len(argv) < 2:
+            raise ValueError("count and sides must be integers")
+        expression = classic_expression(argv[0], argv[1])
+        rest = argv[2:]
+    else:
+        expression = parse_expression(argv[0])
+        rest = argv[1:]
+    
+    character = rest[0] if len(rest) > 0 else "Unknown"
+    purpose = rest[1] if len(rest) > 1 else "Generic roll"
+    return expression, character, purpose
+
+
+def parse_spec(spec: dict) -> tuple:
+    """
+    Parse one --batch input line into (expression, character, purpose, api_key, campaign).
+    
+    A spec is {"count": 1, "sides": 20, ...} or {"expression": "1d20+5", ...},
+    with optional "character", "purpose", "apiKey" and "campaign".
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("Roll spec must be a JSON object")
+    
+    if "expression" in spec:
+        expression = parse_expression(str(spec["expression"]))
+    elif "count" in spec and "sides" in spec:
+        expression = classic_expression(spec["count"], spec["sides"])
     else:
-        print(f"**{character}'s Roll:** {purpose} — {rolls} = **{total}**")
-    
-    print(f"Serial: #{serial}")
-    print()
-    print("<details>")
-    print("<summary>🔐 Verification</summary>")
-    print()
-    print("```json")
-    print(json.dumps(verification_blob, separators=(',', ':')))
-    print("```")
-    print("</details>")
-    print()
-    
-    # Also output raw JSON for programmatic use
-    print("─" * 60)
-    print("📦 RAW VERIFICATION BLOB (for DM tools):")
-    print("─" * 60)
-    print()
-    print(json.dumps(verification_blob, separators=(',', ':')))
-    print()
-    print("═" * 60)
-    print(f"Bits remaining: {result['bitsLeft']:,}")
-    print("═" * 60)
+        raise ValueError("Roll spec needs \"expression\" or \"count\" and \"sides\"")
+    
+    character = str(spec.get("character") or "Unknown")
+    purpose = str(spec.get("purpose") or "Generic roll")
+    api_key = spec.get("apiKey") or os.environ.get("RANDOM_ORG_API_KEY")
+    campaign = str(spec["campaign"]) if spec.get("campaign") else None
+    return expression, character, purpose, api_key, campaign
+
+
+def run_batch(lines, concurrency: int = DEFAULT_BATCH_CONCURRENCY, emit=None,
+              campaign: str = None) -> int:
+    """
+    Roll every spec in `lines` (JSON Lines) and emit one record per roll.
+    
+    Records are {"index": n, ...result} or {"index": n, "error": "..."}, where
+    n is the 0-based input line, and are emitted as rolls complete. Rolls for
+    different API keys run concurrently (at most `concurrency` at a time) on
+    the shared connection pool; rolls for the same key run in input order,
+    so their serial numbers follow the input. A spec's "campaign" overrides
+    campaign. Returns the number of errors.
+    """
+    emit = emit or (lambda record: print(jsonl_line(record), flush=True))
+    emit_lock = threading.Lock()
+    errors = [0]
+    
+    def report(index, result=None, error=None):
+        record = {"index": index}
+        if error is not None:
+            record["error"] = error
+        else:
+            record.update(result)
+        with emit_lock:
+            if error is not None:
+                errors[0] += 1
+            emit(record)
+    
+    # Queue rolls per API key, in input order
+    queues = {}
+    order = []
+    for index, line in enumerate(lines):
+        if not line.strip():
+            continue
+        try:
+            try:
+                spec = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"Invalid JSON: {e}")
+            expression, character, purpose, api_key, spec_campaign = parse_spec(spec)
+        except ValueError as e:
+            report(index, error=str(e))
+            continue
+        if not api_key:
+            report(index, error="RANDOM_ORG_API_KEY environment variable not set")
+            continue
+        
+        kid = key_id(api_key)
+        if kid not in queues:
+            queues[kid] = []
+            order.append(kid)
+        queues[kid].append((index, expression, character, purpose, api_key,
+                            spec_campaign or campaign))
+    
+    def roll_queue(queue):
+        for index, expression, character, purpose, api_key, roll_campaign in queue:
+            try:
+                response = roll_expression(expression, character, purpose, api_key, roll_campaign)
+                report(index, build_result(response, character, purpose, expression))
+            except Exception as e:
+                report(index, error=str(e))
+    
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        for future in [executor.submit(roll_queue, queues[kid]) for kid in order]:
+            future.result()
+    
+    return errors[0]
+
+
+def pop_flag(argv: list, flag: str) -> bool:
+    """Remove a --flag from argv, returning whether it was present."""
+    if flag in argv:
+        argv.remove(flag)
+        return True
+    return False
+
+
+def pop_option(argv: list, option: str, default=None):
+    """Remove '--option VALUE' from argv, returning VALUE (or default)."""
+    if option in argv:
+        i = argv.index(option)
+        if i + 1 >= len(argv):
+            raise ValueError(f"{option} needs a value")
+        value = argv[i + 1]
+        del argv[i:i + 2]
+        return value
+    return default
+
+
+def quota_warning(api_key: str):
+    """A warning if the key's ledger forecast runs out before the reset, else None."""
+    forecast = get_scheduler().ledger.forecast(key_id(api_key))
+    if not forecast or not forecast["forecast"]["beforeReset"]:
+        return None
+    burn, outlook = forecast["burn"], forecast["forecast"]
+    rate = (f"{burn['bitsPerHour']:,} bits/hour" if outlook["limit"] == "bits"
+            else f"{burn['requestsPerHour']:g} requests/hour")
+    return (f"Warning: at {rate} this API key runs out of random.org {outlook['limit']} "
+            f"around {outlook['runsOutAt']}, before the reset at {forecast['resetAt']} (see ledger.py)")
+
+
+def fail(message: str, jsonl: bool):
+    """Report an error the way the selected output mode expects, and exit."""
+    if jsonl:
+        print(json.dumps({"error": message}))
+    else:
+        print(f"Error: {message}", file=sys.stderr)
+    sys.exit(1)
 
 
 def main():
-    if len(sys.argv) < 3:
-        print(__doc__)
-        sys.exit(1)
+    argv = sys.argv[1:]
+    start_export()
+    jsonl = pop_flag(argv, "--jsonl")
+    batch = pop_flag(argv, "--batch")
     
     try:
-        count = int(sys.argv[1])
-        sides = int(sys.argv[2])
-    except ValueError:
-        print("Error: count and sides must be integers", file=sys.stderr)
-        sys.exit(1)
+        profile_out = pop_option(argv, "--profile-out")
+        if pop_flag(argv, "--profile") or profile_out:
+            profiling.start("roll.py", profile_out)
+        concurrency = int(pop_option(argv, "--concurrency", DEFAULT_BATCH_CONCURRENCY))
+        campaign = pop_option(argv, "--campaign")
+    except ValueError as e:
+        fail(str(e), jsonl or batch)
     
-    if not (1 <= count <= 100):
-        print("Error: count must be between 1 and 100", file=sys.stderr)
-        sys.exit(1)
+    if batch:
+        errors = run_batch(sys.stdin, concurrency, campaign=campaign)
+        sys.exit(1 if errors else 0)
     
-    if not (2 <= sides <= 1_000_000_000):
-        print("Error: sides must be between 2 and 1000000000", file=sys.stderr)
+    if len(argv) < 1:
+        print(__doc__)
         sys.exit(1)
     
-    character = sys.argv[3] if len(sys.argv) > 3 else "Unknown"
-    purpose = sys.argv[4] if len(sys.argv) > 4 else "Generic roll"
+    try:
+        with phase("arg_parse"):
+            expression, character, purpose = parse_args(argv)
+    except ValueError as e:
+        fail(str(e), jsonl)
     
     try:
-        response = roll_dice(count, sides, character, purpose)
-        format_output(response, character, purpose, count, sides)
+        socket_path = os.environ.get("ROLL_DAEMON_SOCKET")
+        if socket_path:
+            reply = roll_via_daemon(socket_path, expression, character, purpose, campaign)
+            if "error" in reply:
+                fail(reply["error"], jsonl)
+            if jsonl:
+                print(jsonl_line(reply["result"]))
+            else:
+                sys.stdout.write(reply["output"])
+            return
+        
+        response = roll_expression(expression, character, purpose, campaign=campaign)
+        result = build_result(response, character, purpose, expression)
     except Exception as e:
-        print(f"Error: {e}", file=sys.stderr)
-        sys.exit(1)
+        fail(str(e), jsonl)
+    
+    with phase("output"):
+        if jsonl:
+            print(jsonl_line(result))
+        else:
+            sys.stdout.write(render_output(result))
+    
+    with phase("quota_forecast"):
+        warning = quota_warning(os.environ["RANDOM_ORG_API_KEY"])
+    if warning:
+        print(warning, file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+dm-verify-service.py - Long-running verification service for many DM agents
+
+Every dm-verify.py run starts Python, loads the serial tracker and opens
+its own connection to random.org. This service does that once: trackers
+and the verdict cache stay in memory, signature checks from all clients
+share one connection pool, and dm-verify.py becomes a thin client.
+
+Usage:
+    python dm-verify-service.py [--socket PATH] [--tracker serial-tracker.json]
+
+    # Then point dm-verify.py at it (same arguments, same output):
+    export DM_VERIFY_SERVICE=/tmp/agentic-dnd-verify.sock
+    python dm-verify.py --player Grognar < blob.json
+    python dm-verify.py --campaign "Goblin Ambush" --ingest threads/goblin-ambush.md
+
+Options:
+    --socket PATH     Unix socket to listen on (default:
+                      /tmp/agentic-dnd-verify.sock), readable and writable
+                      by this user only
+    --tracker PATH    Tracker for requests without a campaign (default:
+                      ./serial-tracker.json). A .db/.sqlite path selects the
+                      SQLite backend for every campaign
+    --flush-interval SECONDS
+                      How often JSON trackers and the verdict cache are
+                      written to disk (default: 5)
+    --concurrency N   Signature checks at once (default: 8)
+    --rules FILE      Suspicion rules (see rules.py; default $DM_VERIFY_RULES)
+    --verify-mode     Default signature check: auto, offline or online
+    --ingest-root DIR Directory /ingest may read from (repeatable; default:
+                      the directory the service was started in). Paths
+                      outside every root are refused with HTTP 403
+
+Campaigns:
+    Each request may name a "campaign". Every campaign has its own tracker
+    (serial-tracker-goblin-ambush.json next to --tracker, for campaign
+    "Goblin Ambush"), opened on first use and kept open on a thread of its
+    own, so campaigns never see or block each other's serials. Requests
+    for one campaign are recorded one at a time, in arrival order, as
+    separate dm-verify.py runs would be. Names that differ only in case or
+    punctuation ("goblin-ambush") are the same campaign.
+
+Durability:
+    JSON trackers are kept in memory and written every --flush-interval
+    seconds and on shutdown (SIGTERM or Ctrl-C); a crash loses at most
+    that much. SQLite trackers commit every request as usual. The service
+    owns its trackers: don't run a local dm-verify.py against them while
+    it is up.
+
+API (HTTP over the Unix socket; JSON in, JSON out; errors are
+{"error": ...} with HTTP 400/403/404/500):
+    POST /verify      {"random", "signature", "player", "campaign",
+                       "verifyMode", "postedAt"} -> dm-verify.py's result
+    POST /batch       {"lines": [JSON Lines as --batch reads them], "player",
+                       "campaign", "verifyMode"} -> {"results": [...], "counts"}
+    POST /ingest      {"path": file or directory under an --ingest-root, "player",
+                       "campaign", "fullAudit", "verifyMode"}
+                       -> {"reports": [...], "counts"}
+    GET  /history?player=NAME&campaign=...
+    GET  /stats?player=NAME&campaign=...     (player optional)
+    GET  /aliases?campaign=...
+    POST /clear       {"campaign"}
+    GET  /cache-stats
+    GET  /health      -> open campaigns, their trackers and last flush
+
+Environment:
+    As dm-verify.py (RANDOM_ORG_API_URL, RANDOM_ORG_VERIFY, DM_VERIFY_RULES,
+    RANDOM_ORG_TRACE_FILE, ...). RANDOM_ORG_METRICS_PORT serves Prometheus
+    metrics, including dm_verify_service_requests_total and
+    dm_verify_service_request_seconds (see metrics.py).
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import signal
+import asyncio
+import argparse
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+from blob import loads as load_blob
+from metrics import counter, histogram, start_export
+from rules import RuleError, get_rules
+from signature import MODES, get_verifier
+from tracker import ANONYMOUS, open_tracker
+
+
+def load_dm_verify():
+    """Import dm-verify.py from this directory (its name has a hyphen)."""
+    spec = importlib.util.spec_from_file_location("dm_verify", str(Path(__file__).with_name("dm-verify.py")))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+dm = load_dm_verify()
+
+DEFAULT_SOCKET = "/tmp/agentic-dnd-verify.sock"
+DEFAULT_FLUSH_INTERVAL = 5.0
+DEFAULT_CONCURRENCY = 8
+MAX_BODY = 64 * 1024 * 1024
+STATUS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+          413: "Payload Too Large", 500: "Internal Server Error"}
+
+REQUESTS = counter("dm_verify_service_requests_total", "Service requests by endpoint and status",
+                   ["endpoint", "status"])
+REQUEST_SECONDS = histogram("dm_verify_service_request_seconds", "Service request latency", ["endpoint"])
+
+
+class ServiceError(Exception):
+    """A request the service refuses, with the HTTP status to answer."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def campaign_tracker(base: str, campaign: str) -> str:
+    """The tracker path for a campaign: serial-tracker-<slug>.json next to base."""
+    if not campaign:
+        return base
+    slug = re.sub(r"[^a-z0-9]+", "-", campaign.lower()).strip("-") or "campaign"
+    path = Path(base)
+    return str(path.with_name(f"{path.stem}-{slug}{path.suffix}"))
+
+
+class Campaign:
+    """One campaign's tracker, open on a thread of its own (SQLite needs that)."""
+
+    def __init__(self, name: str, tracker_path: str):
+        self.name = name
+        self.tracker_path = tracker_path
+        self.thread = ThreadPoolExecutor(max_workers=1)
+        self.store = None
+        self.last_flush = None
+
+    def _call(self, fn, *args):
+        if self.store is None:
+            self.store = open_tracker(self.tracker_path, autocommit=False)
+        return fn(self.store, *args)
+
+    async def run(self, fn, *args):
+        """fn(store, *args) on the campaign's thread."""
+        return await asyncio.get_event_loop().run_in_executor(self.thread, self._call, fn, *args)
+
+    def flush(self):
+        if self.store is not None:
+            self.store.commit()
+            self.last_flush = time.time()
+
+    def close(self):
+        if self.store is not None:
+            self.flush()
+            self.store.close()
+            self.store = None
+
+
+def track_one(store, random_obj: dict, verdict: dict, player: str, rules) -> dict:
+    with store.transaction():
+        result, _ = dm.track_roll(store, random_obj, verdict, player, rules)
+    return result
+
+
+class VerifyService:
+    """The HTTP/JSON API over dm-verify.py's functions, one Campaign per campaign."""
+
+    def __init__(self, tracker: str, rules, mode: str = None, concurrency: int = DEFAULT_CONCURRENCY,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, ingest_roots: list = None):
+        self.tracker = tracker
+        self.ingest_roots = [os.path.realpath(root) for root in (ingest_roots or [os.getcwd()])]
+        self.rules = rules
+        self.mode = mode
+        self.concurrency = concurrency
+        self.flush_interval = flush_interval
+        self.pool = ThreadPoolExecutor(max_workers=max(1, concurrency))
+        self.campaigns = {}
+        self.started = time.time()
+        self.routes = {
+            ("POST", "/verify"): self.verify,
+            ("POST", "/batch"): self.batch,
+            ("POST", "/ingest"): self.ingest,
+            ("GET", "/history"): self.history,
+            ("GET", "/stats"): self.stats,
+            ("GET", "/aliases"): self.aliases,
+            ("POST", "/clear"): self.clear,
+            ("GET", "/cache-stats"): self.cache_stats,
+            ("GET", "/health"): self.health,
+        }
+
+    def campaign(self, request: dict) -> Campaign:
+        # Keyed by tracker path: names that slug alike ("Goblin Ambush",
+        # "goblin-ambush") share one file, so they must share one store.
+        name = str(request.get("campaign") or "")
+        tracker_path = campaign_tracker(self.tracker, name)
+        campaign = self.campaigns.get(tracker_path)
+        if campaign is None:
+            campaign = self.campaigns[tracker_path] = Campaign(name, tracker_path)
+        return campaign
+
+    def mode_for(self, request: dict):
+        mode = request.get("verifyMode") or self.mode
+        if mode is not None and mode not in MODES:
+            raise ServiceError(400, f"verifyMode must be one of {', '.join(MODES)}")
+        return mode
+
+    # Endpoints
+
+    async def verify(self, request: dict) -> dict:
+        random_obj, signature = request.get("random"), request.get("signature")
+        if not isinstance(random_obj, dict) or not isinstance(signature, str):
+            raise ServiceError(400, "Missing random object or signature")
+        player = request.get("player") or ANONYMOUS
+        campaign = self.campaign(request)
+        started = time.time()
+        verdict, failure = await asyncio.get_event_loop().run_in_executor(
+            self.pool, dm.check_roll, random_obj, signature, player, self.mode_for(request)
+        )
+        result = failure or await campaign.run(track_one, random_obj, verdict, player, self.rules)
+        dm.trace_result(random_obj, result, started, request.get("postedAt"), campaign.name or None)
+        return result
+
+    async def batch(self, request: dict) -> dict:
+        lines = request.get("lines")
+        if not isinstance(lines, list):
+            raise ServiceError(400, "Expected {\"lines\": [...]}")
+        campaign = self.campaign(request)
+        results = []
+        counts = await campaign.run(
+            lambda store: dm.verify_batch(lines, store, request.get("player") or ANONYMOUS,
+                                          self.mode_for(request), self.concurrency, results.append,
+                                          self.rules, campaign.name or None)
+        )
+        return {"results": results, "counts": counts}
+
+    async def ingest(self, request: dict) -> dict:
+        path = request.get("path")
+        if not isinstance(path, str) or path == "-":
+            raise ServiceError(400, "Expected {\"path\": file or directory}")
+        if not self.may_ingest(path):
+            raise ServiceError(403, f"{path} is outside the service's ingest roots")
+        campaign = self.campaign(request)
+        reports = []
+        try:
+            counts = await campaign.run(
+                lambda store: dm.ingest_thread(path, store, request.get("player") or ANONYMOUS,
+                                               self.mode_for(request), self.concurrency,
+                                               emit=reports.append, full=bool(request.get("fullAudit")),
+                                               rules=self.rules, campaign=campaign.name or None)
+            )
+        except (OSError, ValueError) as e:
+            raise ServiceError(400, f"Cannot read thread: {e}")
+        return {"reports": reports, "counts": counts}
+
+    def may_ingest(self, path: str) -> bool:
+        """True if path (symlinks resolved) lies under one of the ingest roots."""
+        real = os.path.realpath(path)
+        return os.path.isabs(path) and any(
+            os.path.commonpath([real, root]) == root for root in self.ingest_roots
+        )
+
+    async def history(self, request: dict) -> dict:
+        player = request.get("player") or ANONYMOUS
+        return await self.campaign(request).run(lambda store: dm.show_history(player, store))
+
+    async def stats(self, request: dict) -> dict:
+        player = request.get("player") or ANONYMOUS
+        return await self.campaign(request).run(lambda store: dm.show_stats(player, store))
+
+    async def aliases(self, request: dict) -> dict:
+        return await self.campaign(request).run(dm.show_aliases)
+
+    async def clear(self, request: dict) -> dict:
+        campaign = self.campaign(request)
+        reply = await campaign.run(dm.clear_tracker)
+        await asyncio.get_event_loop().run_in_executor(campaign.thread, campaign.flush)
+        return reply
+
+    async def cache_stats(self, request: dict) -> dict:
+        return await asyncio.get_event_loop().run_in_executor(self.pool, lambda: get_verifier().cache.stats())
+
+    async def health(self, request: dict) -> dict:
+        return {
+            "uptime": round(time.time() - self.started, 1),
+            "campaigns": [{
+                "campaign": campaign.name or None,
+                "tracker": campaign.tracker_path,
+                "open": campaign.store is not None,
+                "lastFlush": campaign.last_flush
+            } for campaign in self.campaigns.values()]
+        }
+
+    # HTTP
+
+    async def dispatch(self, method: str, target: str, body: bytes) -> tuple:
+        """(status, reply) for one request."""
+        url = urlsplit(target)
+        handler = self.routes.get((method, url.path.rstrip("/") or "/"))
+        if handler is None:
+            known = any(path == url.path.rstrip("/") for _, path in self.routes)
+            return (405, {"error": f"{method} not allowed on {url.path}"}) if known else \
+                (404, {"error": f"No such endpoint: {url.path}"})
+        try:
+            request = dict(parse_qsl(url.query))
+            if body:
+                payload = load_blob(body.decode("utf-8"))  # keeps a blob's random bytes
+                if not isinstance(payload, dict):
+                    raise ServiceError(400, "Request body must be a JSON object")
+                request.update(payload)
+            return 200, await handler(request)
+        except ServiceError as e:
+            return e.status, {"error": str(e)}
+        except ValueError as e:
+            return 400, {"error": f"Invalid request: {e}"}
+        except Exception as e:
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+
+    async def handle(self, reader, writer):
+        """Serve one connection (HTTP/1.1 keep-alive, one request at a time)."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                parts = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length") or 0)
+
+                start = time.perf_counter()
+                if len(parts) != 3:
+                    status, reply, endpoint = 400, {"error": "Malformed request line"}, "invalid"
+                elif length > MAX_BODY:
+                    status, reply, endpoint = 413, {"error": "Request body too large"}, "invalid"
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, reply = await self.dispatch(parts[0], parts[1], body)
+                    endpoint = urlsplit(parts[1]).path if status != 404 else "unknown"
+                REQUESTS.inc(endpoint=endpoint, status=status)
+                REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+
+                data = json.dumps(reply, ensure_ascii=False).encode("utf-8")
+                keep_alive = (len(parts) == 3 and parts[2] == "HTTP/1.1" and status != 413
+                              and headers.get("connection", "").lower() != "close")
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS.get(status, '')}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    # Flushing
+
+    async def flush(self):
+        """Write every open JSON tracker and the verdict cache."""
+        loop = asyncio.get_event_loop()
+        for campaign in list(self.campaigns.values()):
+            await loop.run_in_executor(campaign.thread, campaign.flush)
+        await loop.run_in_executor(self.pool, get_verifier().cache.flush)
+
+    async def flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except OSError as e:
+                print(json.dumps({"error": f"Flush failed: {e}"}), file=sys.stderr)
+
+    async def close(self):
+        loop = asyncio.get_event_loop()
+        for campaign in list(self.campaigns.values()):
+            await loop.run_in_executor(campaign.thread, campaign.close)
+            campaign.thread.shutdown()
+        await loop.run_in_executor(self.pool, get_verifier().cache.flush)
+        self.pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DM verification service")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket path")
+    parser.add_argument("--tracker", default=dm.DEFAULT_TRACKER, help="Tracker for requests without a campaign")
+    parser.add_argument("--flush-interval", type=float, default=DEFAULT_FLUSH_INTERVAL,
+                        help="Seconds between writes of JSON trackers and the verdict cache")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Signature checks at once")
+    parser.add_argument("--rules", metavar="FILE", help="Suspicion rules (JSON, see rules.py)")
+    parser.add_argument("--verify-mode", choices=MODES, help="Default signature check")
+    parser.add_argument("--ingest-root", metavar="DIR", action="append",
+                        help="Directory /ingest may read from (repeatable; default: current directory)")
+    args = parser.parse_args()
+    start_export()
+
+    try:
+        rules = get_rules(args.rules)
+    except RuleError as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
+
+    service = VerifyService(args.tracker, rules, args.verify_mode, args.concurrency, args.flush_interval,
+                            args.ingest_root)
+    loop = asyncio.get_event_loop()
+    if os.path.exists(args.socket):
+        os.unlink(args.socket)
+
+    old_umask = os.umask(0o177)  # socket for this user only: it can clear trackers and read files
+    try:
+        server = loop.run_until_complete(asyncio.start_unix_server(service.handle, args.socket))
+    finally:
+        os.umask(old_umask)
+    flusher = asyncio.ensure_future(service.flush_periodically())
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, loop.stop)
+    print(json.dumps({"message": f"Verification service listening on {args.socket}"}), file=sys.stderr)
+
+    try:
+        loop.run_forever()
+    finally:
+        flusher.cancel()
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        loop.run_until_complete(service.close())
+        loop.close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
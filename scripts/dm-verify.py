@@ -12,16 +12,142 @@ Usage:
     # View serial history for a player
     python dm-verify.py --history --player 'Grognar'
     
+    # API keys posting under several names, and names used by several keys
+    python dm-verify.py --aliases
+    
+    # Dice fairness statistics for a player (or everyone, without --player)
+    python dm-verify.py --stats --player 'Grognar'
+    
+    # Recompute them from an archive of threads / blobs
+    python dm-verify.py --rebuild-stats archive/
+    
+    # Verify a whole thread at once: one blob per line, results as JSON Lines
+    python dm-verify.py --batch < blobs.jsonl
+    
+    # Or let it find every blob in a saved thread (Markdown/JSON export or a
+    # directory of posts), one report per post
+    python dm-verify.py --ingest thread.md
+    
+    # Re-check a thread from the top, ignoring checkpoints and cached verdicts
+    python dm-verify.py --ingest thread.md --full-audit
+    
+    # Where did the time go? Per-phase breakdown on stderr, plus cProfile stats
+    python dm-verify.py --profile --profile-out verify.prof < blob.json
+    
+    # Use a SQLite tracker, migrating the JSON one first
+    python dm-verify.py --tracker serial-tracker.db --import-tracker serial-tracker.json
+    
     # Clear serial history (new campaign)
     python dm-verify.py --clear
+    
+    # Go through a running dm-verify-service.py (same output, no cold start)
+    DM_VERIFY_SERVICE=/tmp/agentic-dnd-verify.sock python dm-verify.py --player 'Grognar' < blob.json
 
 Options:
     --random     The "random" object returned by random.org (JSON string)
     --signature  The signature string returned by random.org
     --player     Player/character name (for serial tracking)
-    --history    Show serial history for player
+    --history    Show serial history for player (every API key that has
+                 posted under that name)
+    --aliases    Report API keys seen under several character names and
+                 character names seen from several API keys
+    --stats      Dice fairness statistics per API key and die for --player
+                 (every player if --player is not given)
+    --rebuild-stats PATH
+                 Recompute all dice statistics from an archive in any
+                 --ingest format (authentic blobs with recorded serials only)
     --clear      Clear all serial tracking data
-    --tracker    Path to serial tracker file (default: ./serial-tracker.json)
+    --tracker    Path to serial tracker file (default: ./serial-tracker.json).
+                 A .db/.sqlite path uses the SQLite (WAL) tracker instead:
+                 per-roll row writes, safe for several DMs at once
+    --import-tracker JSON
+                 Copy an existing JSON tracker into --tracker (migration):
+                 serials, names, dice statistics and ingest checkpoints
+    --batch      Read {"random", "signature", "player"} records as JSON Lines
+                 from stdin; signatures are checked concurrently
+                 (--concurrency, default 4), serials are analysed in serial
+                 order per player, the tracker is written once, and results
+                 stream out as JSON Lines tagged with the input "index"
+    --ingest PATH
+                 Scan a saved thread (Markdown or JSON export, a directory
+                 of post files, or - for stdin) for verification blobs in
+                 one pass, pair each with its post's author, verify them as
+                 --batch does, and print one JSON Lines report per post
+                 that carries a roll (summary on stderr). Each file's
+                 checkpoint is kept in the tracker, so running it again (e.g.
+                 every heartbeat) only reads and verifies new posts
+    --full-audit With --ingest: ignore checkpoints and the verdict cache
+                 and re-check every blob in the thread. Rolls already in
+                 the tracker are audited (serials judged among the thread's
+                 audited rolls only, not recorded again; "audit": true) and
+                 summed up separately from new rolls
+    --cache-stats
+                 Show verification cache hits, misses and size
+    --profile    When done, print a per-phase timing breakdown to stderr as
+                 one JSON line: arg_parse, rules_load, input, signature
+                 (cert_load, verdict_cache, signature_offline/online),
+                 tracker_load/lock/save, analyze, identity, fairness,
+                 rules, scan, output, and the DNS/connect/TLS/server/read/
+                 decode stages of random.org calls (see profiling.py)
+    --profile-out FILE
+                 Also run cProfile and write its stats to FILE
+    --campaign NAME
+                 Campaign to tag trace events with (default: the roll's
+                 userData campaign, else $DND_CAMPAIGN; see rolltrace.py).
+                 Through the service it also picks the campaign's tracker
+    --service SOCKET
+                 Send the request to the dm-verify-service.py listening on
+                 this Unix socket (default: $DM_VERIFY_SERVICE) instead of verifying locally. The
+                 service's tracker, rules and cache are used; --tracker and
+                 --rules are ignored, and --import-tracker, --rebuild-stats
+                 and --ingest - are refused
+    --rules FILE Suspicion rules (JSON; see rules.py). Default:
+                 $DM_VERIFY_RULES, else the built-in rules: a gap before a
+                 roll in the top 10% of its die, or a gap of more than 5
+    --verify-mode
+                 auto (default): check the signature offline against
+                 random.org's cached server.crt, asking the API only if
+                 that fails; offline: never ask the API; online: always ask.
+                 Authentic verdicts are cached (see signature.py), so
+                 re-checking a blob is a lookup
+
+Serial tracking:
+    The tracker keeps every serial a player has rolled (as runs of
+    consecutive serials), so a serial that was already recorded is reported
+    as "replay" instead of counted again, and an older serial that fills a
+    gap is reported as "outOfOrder" instead of "went backwards".
+
+Identity tracking:
+    Each hashedApiKey's character names are indexed, and each name's keys.
+    A verified roll lists the key's "otherNames" and the name's "otherKeys"
+    (set when a player switches keys or a key plays several characters),
+    with a note in "identityWarning". Rolls with the default --player
+    (Unknown) aren't indexed by name.
+
+Fairness statistics:
+    Every newly recorded roll updates its player's per-die statistics
+    (see fairness.py): face counts, running mean/variance, chi-square
+    against a fair die and the nat-20 rate. A die whose rolls become
+    implausible (p < 0.001 with at least 5 rolls per face) adds a
+    "fairnessWarning" to the result.
+
+Environment:
+    RANDOM_ORG_API_URL - Override the API endpoint (e.g. tools/standin.py)
+    RANDOM_ORG_VERIFY, RANDOM_ORG_CERT, RANDOM_ORG_VERIFY_CACHE_SIZE
+                       - Default --verify-mode, pinned certificate and
+                         verdict cache size (see signature.py)
+    RANDOM_ORG_BATCH_SIZE
+                       - verifySignature calls sent per JSON-RPC batch by
+                         --batch and --ingest (default: 50; see randomorg.py)
+    DM_VERIFY_RULES    - Default --rules file
+    RANDOM_ORG_METRICS_FILE, RANDOM_ORG_METRICS_PORT
+                       - Export Prometheus metrics (signature checks, serial
+                         analysis, tracker I/O, verdicts; see metrics.py)
+    RANDOM_ORG_TRACE_FILE
+                       - Append a trace event per verified roll, keyed by
+                         hashedApiKey and serial, so `rolltrace.py --show`
+                         can follow it back to roll.py (see rolltrace.py)
+    DM_VERIFY_SERVICE  - Default --service socket
 
 Output:
     JSON with verification result, serial analysis, and any warnings
@@ -30,221 +156,1049 @@ Note:
     The "random" object is named by random.org's API - it contains the roll
     data, serial number, timestamp, and other metadata. The signature is
     random.org's cryptographic proof that they generated this exact data.
+    Blobs are read byte-exact (see blob.py): the random object is checked
+    and sent to random.org as the text it arrived in, never re-encoded.
 """
 
 import os
 import sys
 import json
+import time
 import argparse
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError, URLError
-from pathlib import Path
+import socket
+import http.client
+from collections import Counter
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlencode
+
+from randomorg import RandomOrgError, batch_size, encode, flatten_data, get_client, report_timings
+from blob import RandomObject, loads as load_blob
+from dice import evaluate_expression, parse_expression
+from fairness import DieStats, dice_groups
+from ingest import SourceScan, checkpoint_key, iter_sources, post_time
+import profiling
+from metrics import counter, histogram, start_export
+from profiling import phase, timed_iter
+from rolltrace import get_trace_log
+from rules import RuleError, get_rules
+from signature import MODES, SignatureError, get_verifier
+from tracker import ANONYMOUS, JSONTracker, import_tracker_data, load_json, open_tracker
 
-API_URL = "https://api.random.org/json-rpc/4/invoke"
 DEFAULT_TRACKER = "./serial-tracker.json"
+SERVICE_ENV = "DM_VERIFY_SERVICE"
+SERVICE_TIMEOUT = 300
+DEFAULT_CONCURRENCY = 4
+INGEST_WINDOW = 256  # blobs verified per round while ingesting a thread
 
+SIGNATURE_SECONDS = histogram("dm_verify_signature_seconds",
+                              "Signature check latency by how it was answered", ["source"])
+ANALYZE_SECONDS = histogram("dm_verify_analyze_serial_seconds", "Recording and placing one serial")
+RULES_SECONDS = histogram("dm_verify_rules_seconds", "Judging a batch of rolls with the suspicion rules")
+ROLLS = counter("dm_verify_rolls_total", "Rolls checked by outcome", ["outcome"])
+SUSPICIOUS = counter("dm_verify_suspicious_total", "Suspicious rolls by the rule that fired", ["rule"])
 
-def verify_signature(random_obj: dict, signature: str) -> dict:
-    """Verify a signature using random.org API."""
-    
-    payload = {
-        "jsonrpc": "2.0",
-        "method": "verifySignature",
-        "params": {
-            "random": random_obj,
-            "signature": signature
-        },
-        "id": 1
-    }
-    
-    req = Request(
-        API_URL,
-        data=json.dumps(payload).encode("utf-8"),
-        headers={"Content-Type": "application/json"}
-    )
+
+def verify_signature(random_obj: dict, signature: str, mode: str = None,
+                     use_cache: bool = True) -> dict:
+    """Verify a signature offline against random.org's certificate, or via the API."""
+    return verify_signatures([(random_obj, signature)], mode, use_cache)[0]
+
+
+def verify_signatures(pairs: list, mode: str = None, use_cache: bool = True) -> list:
+    """
+    verify_signature() for many (random_obj, signature) pairs; the ones
+    random.org has to answer go out as JSON-RPC batches (see signature.py).
+    """
     
+    client = get_client()
+    start = time.perf_counter()
     try:
-        with urlopen(req, timeout=30) as response:
-            return json.loads(response.read().decode("utf-8"))
-    except HTTPError as e:
-        return {"error": f"HTTP error {e.code}: {e.reason}"}
-    except URLError as e:
-        return {"error": f"Connection error: {e.reason}"}
-
-
-def load_tracker(tracker_path: str) -> dict:
-    """Load serial tracker data."""
-    path = Path(tracker_path)
-    if path.exists():
-        try:
-            with open(path) as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            return {"players": {}}
-    return {"players": {}}
+        with phase("signature"):
+            verdicts = get_verifier(client).verify_many(pairs, mode, use_cache)
+    except ValueError as e:  # bad RANDOM_ORG_VERIFY
+        verdicts = [e] * len(pairs)
+    # Checks answered together share the time they took
+    seconds = (time.perf_counter() - start) / max(1, len(pairs))
+    responses = []
+    for verdict in verdicts:
+        if isinstance(verdict, (RandomOrgError, SignatureError, OSError, ValueError)):
+            SIGNATURE_SECONDS.observe(seconds, source="error")
+            responses.append({"error": str(verdict)})
+            continue
+        SIGNATURE_SECONDS.observe(seconds, source="cache" if verdict.get("seen") else verdict["method"])
+        responses.append({"result": verdict})
+    if any(r.get("result", {}).get("method") == "online" and not r["result"]["cached"] for r in responses):
+        report_timings(client)
+    return responses
+
+
+def load_tracker(tracker_path: str):
+    """Open the serial tracker (SQLite for .db/.sqlite paths, else JSON)."""
+    return open_tracker(tracker_path)
 
 
-def save_tracker(tracker_path: str, data: dict):
-    """Save serial tracker data."""
-    path = Path(tracker_path)
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, 'w') as f:
-        json.dump(data, f, indent=2)
+@contextmanager
+def tracker_store(tracker):
+    """
+    The tracker for a with-block: a path is opened and closed around it; an
+    already open store (dm-verify-service.py keeps one per campaign) is
+    used as it is and left open.
+    """
+    if not isinstance(tracker, str):
+        yield tracker
+        return
+    store = load_tracker(tracker)
+    try:
+        yield store
+    finally:
+        store.close()
+
 
+def player_key_for(hashed_key: str) -> str:
+    """Tracker key for a hashedApiKey (its first 16 characters)."""
+    return hashed_key[:16]
 
-def analyze_serial(tracker: dict, player: str, hashed_key: str, serial: int, roll: list) -> dict:
-    """Analyze serial number for suspicious gaps."""
+
+def record_serial(tracker, player: str, hashed_key: str, serial: int, roll: list,
+                  completion_time: str = None) -> dict:
+    """
+    Record a serial and describe where it falls in the player's history.
     
-    # Use hashedApiKey as the true player identifier
-    player_key = hashed_key[:16]  # First 16 chars for brevity
+    The tracker knows every serial the player has rolled, so a serial seen
+    before is a replay (not recorded again), and one older than the newest
+    fills an earlier gap (posted out of order) rather than going backwards.
+    The gap is measured to the nearest earlier serial either way.
+    """
     
-    if player_key not in tracker["players"]:
-        tracker["players"][player_key] = {
-            "name": player,
-            "serials": []
-        }
+    # Use hashedApiKey as the true player identifier
+    player_key = player_key_for(hashed_key)
+    seen = tracker.serial_set(player_key)
     
-    player_data = tracker["players"][player_key]
-    serials = player_data["serials"]
+    replay = serial in seen
+    newest = seen.max()
+    out_of_order = not replay and newest is not None and serial < newest
     
     # Find previous serial
-    previous_serial = serials[-1] if serials else None
-    gap = serial - previous_serial if previous_serial else 0
+    previous_serial = seen.predecessor(serial)
+    gap = serial - previous_serial if previous_serial is not None and not replay else 0
     
-    # Add this serial
-    serials.append(serial)
-    
-    # Keep last 50 serials max
-    if len(serials) > 50:
-        tracker["players"][player_key]["serials"] = serials[-50:]
-    
-    # Determine if suspicious
-    suspicious = False
-    suspicion_reason = None
-    
-    # Check for gap before a high roll
-    is_high_roll = any(r >= 18 for r in roll) if roll else False
-    
-    if gap > 1 and is_high_roll:
-        suspicious = True
-        suspicion_reason = f"Gap of {gap} serials before high roll ({roll})"
-    elif gap > 5:
-        suspicious = True
-        suspicion_reason = f"Large gap of {gap} serials"
-    elif gap < 0:
-        suspicious = True
-        suspicion_reason = f"Serial went backwards ({previous_serial} -> {serial})"
+    # Add this serial (a replay can still be posted under a new name)
+    if not replay:
+        tracker.add_serial(player_key, player, serial, roll, completion_time)
+    else:
+        tracker.note_name(player_key, player)
     
     return {
+        "serial": serial,
+        "roll": roll,
         "previousSerial": previous_serial,
         "gap": gap,
-        "suspicious": suspicious,
-        "suspicionReason": suspicion_reason,
-        "serialHistory": serials[-10:]  # Last 10 for context
+        "replay": replay,
+        "outOfOrder": out_of_order,
+        "totalMissing": seen.total_missing(),
+        "serialHistory": tracker.recent_serials(player_key, 10)  # Last 10 for context
     }
 
 
-def verify_roll(random_obj: dict, signature: str, player: str, tracker_path: str) -> dict:
-    """Full verification with serial tracking."""
+def analyze_serial(tracker, player: str, hashed_key: str, serial: int, roll: list,
+                   completion_time: str = None, random_obj: dict = None, rules=None) -> dict:
+    """
+    Analyze serial number for suspicious gaps.
     
-    # Extract roll info
-    roll = random_obj.get("data", [])
-    serial = random_obj.get("serialNumber")
-    hashed_key = random_obj.get("hashedApiKey", "")
-    user_data = random_obj.get("userData", {})
-    completion_time = random_obj.get("completionTime")
+    Records the serial (see record_serial) and judges it with the
+    suspicion rules (rules.py; default: get_rules()). Without the signed
+    random_obj, the roll is judged as d20s.
+    """
+    with ANALYZE_SECONDS.time(), phase("analyze"):
+        analysis = record_serial(tracker, player, hashed_key, serial, roll, completion_time)
+    random_obj = random_obj or {"data": roll or [], "min": 1, "max": 20}
+    with RULES_SECONDS.time(), phase("rules"):
+        analysis.update((rules or get_rules()).evaluate(analysis, random_obj))
+    return analysis
+
+
+def analyze_identity(tracker, player: str, hashed_key: str) -> dict:
+    """
+    Other names this API key has posted under, and other keys that have
+    posted as this player (call after the roll is recorded).
+    """
+    player_key = player_key_for(hashed_key)
+    other_names = [n for n in tracker.names_for_key(player_key) if n.lower() != player.lower()]
+    other_keys = [] if player == ANONYMOUS else [
+        k + "..." for k in tracker.keys_for_name(player) if k != player_key
+    ]
     
-    # Verify signature with random.org
-    api_response = verify_signature(random_obj, signature)
+    warnings = []
+    if other_names:
+        warnings.append(f"This API key has also posted as {', '.join(other_names)}")
+    if other_keys:
+        warnings.append(f"{player} has also posted from {len(other_keys)} other API key(s)")
     
-    if "error" in api_response:
-        return {
-            "verified": False,
-            "error": api_response["error"],
-            "player": player,
-            "roll": roll,
-            "serial": serial
-        }
+    return {
+        "otherNames": other_names,
+        "otherKeys": other_keys,
+        "identityWarning": "; ".join(warnings) or None
+    }
+
+
+def roll_histograms(random_obj: dict) -> dict:
+    """{die: Counter of faces} for a roll (groups of the same die combined)."""
+    histograms = {}
+    for die, values in dice_groups(random_obj):
+        histograms.setdefault(die, Counter()).update(values)
+    return histograms
+
+
+def update_fairness(tracker, hashed_key: str, random_obj: dict) -> list:
+    """
+    Add a newly recorded roll to the player's per-die statistics (O(1) per
+    die). Returns a warning for each die whose rolls are now implausible.
+    """
+    player_key = player_key_for(hashed_key)
+    stored = tracker.get_stats(player_key)
+    warnings = []
+    for die, values in dice_groups(random_obj):
+        stats = DieStats.from_dict(die, stored.get(die))
+        stats.add(values)
+        stored[die] = stats.to_dict()
+        tracker.put_stats(player_key, die, stored[die])
+        warning = stats.summary().get("warning")
+        if warning and warning not in warnings:
+            warnings.append(warning)
+    return warnings
+
+
+def check_roll(random_obj: dict, signature: str, player: str, mode: str = None,
+               use_cache: bool = True) -> tuple:
+    """
+    Verify a roll's signature.
     
-    is_authentic = api_response.get("result", {}).get("authenticity", False)
+    Returns (verdict, None) if authentic, or (None, failure_result) if the
+    signature is bad or couldn't be checked.
+    """
+    return check_rolls([(random_obj, signature, player)], mode, use_cache)[0]
+
+
+def check_rolls(items: list, mode: str = None, use_cache: bool = True) -> list:
+    """check_roll() for many (random_obj, signature, player), batching API calls."""
+    # Verify signatures (offline against server.crt, or with random.org)
+    api_responses = verify_signatures([(random_obj, signature) for random_obj, signature, _ in items],
+                                      mode, use_cache)
     
-    if not is_authentic:
-        return {
+    checked = []
+    for (random_obj, _, player), api_response in zip(items, api_responses):
+        if "error" in api_response:
+            error = api_response["error"]
+        elif not api_response["result"]["authenticity"]:
+            error = "Signature verification failed - roll may be tampered"
+        else:
+            checked.append((api_response["result"], None))
+            continue
+        
+        ROLLS.inc(outcome="failed")
+        checked.append((None, {
             "verified": False,
-            "error": "Signature verification failed - roll may be tampered",
+            "error": error,
             "player": player,
-            "roll": roll,
-            "serial": serial
-        }
+            "roll": flatten_data(random_obj.get("data", [])),
+            "serial": random_obj.get("serialNumber")
+        }))
+    return checked
+
+
+def track_rolls(tracker, items: list, rules=None) -> list:
+    """
+    Record verified rolls in the tracker (a store from load_tracker) and
+    build their results.
     
-    # Load tracker and analyze serial
-    tracker = load_tracker(tracker_path)
-    serial_analysis = analyze_serial(tracker, player, hashed_key, serial, roll)
-    save_tracker(tracker_path, tracker)
+    items is a list of (random_obj, verdict, player), recorded in that
+    order; the suspicion rules then judge the whole batch at once.
+    Returns a (result, changed) per item, where changed says whether the
+    tracker was modified and needs saving.
+    """
+    rules = rules or get_rules()
+    recorded = []
+    for random_obj, verdict, player in items:
+        # Extract roll info (sequences from mixed-dice rolls are flattened)
+        roll = flatten_data(random_obj.get("data", []))
+        hashed_key = random_obj.get("hashedApiKey", "")
+        with ANALYZE_SECONDS.time(), phase("analyze"):
+            serial_analysis = record_serial(tracker, player, hashed_key, random_obj.get("serialNumber"),
+                                            roll, random_obj.get("completionTime"))
+        with phase("identity"):
+            identity = analyze_identity(tracker, player, hashed_key)
+        with phase("fairness"):
+            fairness = [] if serial_analysis["replay"] else update_fairness(tracker, hashed_key, random_obj)
+        recorded.append((serial_analysis, identity, fairness))
+    
+    with RULES_SECONDS.time(), phase("rules"):
+        judged = rules.evaluate_many([
+            (serial_analysis, random_obj) for (serial_analysis, _, _), (random_obj, _, _) in zip(recorded, items)
+        ])
+    return [
+        (build_result(random_obj, verdict, player, serial_analysis, identity, fairness, suspicion),
+         not serial_analysis["replay"])
+        for (random_obj, verdict, player), (serial_analysis, identity, fairness), suspicion
+        in zip(items, recorded, judged)
+    ]
+
+
+def track_roll(tracker, random_obj: dict, verdict: dict, player: str, rules=None) -> tuple:
+    """Record one verified roll (see track_rolls); returns (result, changed)."""
+    return track_rolls(tracker, [(random_obj, verdict, player)], rules)[0]
+
+
+def signed_total(random_obj: dict, roll: list) -> int:
+    """
+    The roll's total under its signed userData notation (keep/drop rules
+    and modifiers applied, as roll.py posted it), or the sum of the dice
+    when there is no notation or it doesn't describe the signed data.
+    """
+    user_data = random_obj.get("userData")
+    notation = user_data.get("notation") if isinstance(user_data, dict) else None
+    data = random_obj.get("data", [])
+    if isinstance(notation, str) and data:
+        try:
+            expression = parse_expression(notation)
+            groups = expression["groups"]
+            sequences = [data] if len(groups) == 1 else data
+            if len(sequences) == len(groups) and all(
+                isinstance(values, list) and len(values) == group["count"]
+                for group, values in zip(groups, sequences)
+            ):
+                return evaluate_expression(expression, data)["total"]
+        except (ValueError, TypeError):
+            pass
+    return sum(roll) if roll else 0
+
+
+def build_result(random_obj: dict, verdict: dict, player: str, serial_analysis: dict,
+                 identity: dict, fairness: list, suspicion: dict) -> dict:
+    """The verification result for a recorded roll."""
+    roll = serial_analysis["roll"]
+    serial = serial_analysis["serial"]
+    replay = serial_analysis["replay"]
     
     # Build result
     result = {
         "verified": True,
+        "verifiedBy": verdict["method"],
+        "seenBefore": verdict["seen"],
+        "replay": replay,
+        "outOfOrder": serial_analysis["outOfOrder"],
         "player": player,
         "roll": roll,
-        "total": sum(roll) if roll else 0,
+        "total": signed_total(random_obj, roll),
         "serial": serial,
-        "hashedApiKey": hashed_key[:16] + "...",
-        "completionTime": completion_time,
-        "userData": user_data,
+        "hashedApiKey": random_obj.get("hashedApiKey", "")[:16] + "...",
+        "completionTime": random_obj.get("completionTime"),
+        "userData": random_obj.get("userData", {}),
         "previousSerial": serial_analysis["previousSerial"],
         "gap": serial_analysis["gap"],
-        "suspicious": serial_analysis["suspicious"],
-        "suspicionReason": serial_analysis["suspicionReason"],
-        "recentSerials": serial_analysis["serialHistory"]
+        "suspicious": suspicion["suspicious"],
+        "suspicionReason": suspicion["suspicionReason"],
+        "suspicionRule": suspicion["suspicionRule"],
+        "recentSerials": serial_analysis["serialHistory"],
+        "totalMissing": serial_analysis["totalMissing"],
+        "otherNames": identity["otherNames"],
+        "otherKeys": identity["otherKeys"],
+        "identityWarning": identity["identityWarning"],
+        "fairnessWarning": "; ".join(fairness) or None
     }
     
+    if replay:
+        ROLLS.inc(outcome="replay")
+    elif suspicion["suspicious"]:
+        ROLLS.inc(outcome="suspicious")
+        SUSPICIOUS.inc(rule=suspicion["suspicionRule"])
+    else:
+        ROLLS.inc(outcome="verified")
+    
     # Build human-readable message
-    if serial_analysis["suspicious"]:
-        result["message"] = f"⚠️  VERIFIED but SUSPICIOUS: {serial_analysis['suspicionReason']}"
+    if replay:
+        result["message"] = (
+            f"🔁 Verified. Serial #{serial} was already recorded (a re-check, or an old roll "
+            "posted again); not counted again."
+        )
+    elif suspicion["suspicious"]:
+        result["message"] = f"⚠️  VERIFIED but SUSPICIOUS: {suspicion['suspicionReason']}"
+    elif serial_analysis["outOfOrder"]:
+        result["message"] = f"✅ Verified. Posted out of order (fills a gap after #{serial_analysis['previousSerial']})."
     elif serial_analysis["gap"] == 0:
         result["message"] = "✅ Verified. First roll from this player."
     elif serial_analysis["gap"] == 1:
         result["message"] = "✅ Verified. Serial sequence OK."
     else:
         result["message"] = f"✅ Verified. Gap of {serial_analysis['gap']} (within tolerance)."
+    if identity["identityWarning"]:
+        result["message"] += f" 👥 {identity['identityWarning']}."
+    if fairness:
+        result["message"] += f" 🎲 {'; '.join(fairness)}."
+    
+    return result
+
+
+def verify_roll(random_obj: dict, signature: str, player: str, tracker_path: str,
+                mode: str = None, rules=None, campaign: str = None) -> dict:
+    """Full verification with serial tracking."""
+    
+    started = time.time()
+    verdict, failure = check_roll(random_obj, signature, player, mode)
+    if failure:
+        trace_result(random_obj, failure, started, campaign=campaign)
+        return failure
     
+    # Record the serial; the read of the previous serial and the write are
+    # one transaction, so concurrent DMs on a SQLite tracker don't race
+    with tracker_store(tracker_path) as tracker, tracker.transaction():
+        result, _ = track_roll(tracker, random_obj, verdict, player, rules)
+    trace_result(random_obj, result, started, campaign=campaign)
     return result
 
 
+def trace_result(random_obj: dict, result: dict, started: float, posted_at=None,
+                 campaign: str = None):
+    """Append the verification to the trace file, if tracing is on (see rolltrace.py)."""
+    log = get_trace_log()
+    if log is not None:
+        log.verify(random_obj, result, started, time.time(), posted_at, campaign)
+
+
+def serial_order(record: dict) -> tuple:
+    """Sort key putting a player's rolls in serial order (unknown serials last)."""
+    serial = record["random"].get("serialNumber")
+    return (not isinstance(serial, int), serial if isinstance(serial, int) else 0, record["index"])
+
+
+def verify_records(tracker, records: list, executor, mode: str = None, report=None,
+                   use_cache: bool = True, rules=None, campaign: str = None):
+    """
+    Verify parsed records ({"index", "random", "signature", "player"},
+    optionally "postedAt" for the trace).
+    
+    Signatures are checked concurrently on executor, in chunks of
+    batch_size() records so the ones random.org has to answer share one
+    JSON-RPC batch request per chunk; serials are then analysed per hashed
+    API key in serial order, so records read out of order give the same
+    verdicts as verifying the posts one by one.
+    report(index, result) is called as soon as a record and every earlier
+    serial of the same key are done; each such run is judged by the
+    suspicion rules as one batch.
+    """
+    queues = {}
+    for record in records:
+        queues.setdefault(record["random"].get("hashedApiKey", ""), []).append(record)
+    for queue in queues.values():
+        queue.sort(key=serial_order)
+    
+    def advance(queue: list):
+        """Track and report the leading run of checked rolls in a key's queue."""
+        run = []
+        while queue and "checked" in queue[0]:
+            run.append(queue.pop(0))
+        verified = [r for r in run if not r["checked"][1]]
+        tracked = track_rolls(tracker, [
+            (r["random"], r["checked"][0], r["player"]) for r in verified
+        ], rules) if verified else []
+        results = {id(r): result for r, (result, _) in zip(verified, tracked)}
+        for record in run:
+            result = results.get(id(record)) or record["checked"][1]
+            trace_result(record["random"], result, record["started"], record.get("postedAt"), campaign)
+            report(record["index"], result)
+    
+    for record in records:
+        record["started"] = time.time()
+    size = batch_size()
+    chunks = [records[start:start + size] for start in range(0, len(records), size)]
+    futures = {
+        executor.submit(check_rolls, [(r["random"], r["signature"], r["player"]) for r in chunk],
+                        mode, use_cache): chunk
+        for chunk in chunks
+    }
+    for future in as_completed(futures):
+        keys = []
+        for record, checked in zip(futures[future], future.result()):
+            record["checked"] = checked
+            key = record["random"].get("hashedApiKey", "")
+            if key not in keys:
+                keys.append(key)
+        for key in keys:
+            advance(queues[key])
+
+
+def count_result(counts: dict, result: dict):
+    """Add one roll result to {"verified", "failed", "suspicious"} counts."""
+    if not result.get("verified"):
+        counts["failed"] += 1
+    elif result.get("suspicious"):
+        counts["suspicious"] += 1
+    else:
+        counts["verified"] += 1
+
+
+def verify_batch(lines, tracker_path: str, default_player: str = ANONYMOUS, mode: str = None,
+                 concurrency: int = DEFAULT_CONCURRENCY, emit=None, rules=None,
+                 campaign: str = None) -> dict:
+    """
+    Verify many blobs (JSON Lines) with one tracker load and one save (one
+    transaction for a SQLite tracker).
+    
+    Each line is {"random": {...}, "signature": "...", "player": "..."}
+    ("player" optional). See verify_records() for the ordering; results,
+    tagged with their 0-based input "index", stream out through emit.
+    
+    Returns {"verified", "failed", "suspicious"} counts.
+    """
+    emit = emit or (lambda result: print(json.dumps(result, ensure_ascii=False), flush=True))
+    counts = {"verified": 0, "failed": 0, "suspicious": 0}
+    
+    def report(index: int, result: dict):
+        record = {"index": index}
+        record.update(result)
+        count_result(counts, result)
+        with phase("output"):
+            emit(record)
+    
+    records = []
+    for index, line in enumerate(timed_iter("input", lines)):
+        if not line.strip():
+            continue
+        try:
+            blob = load_blob(line)
+            random_obj = blob["random"]
+            signature = blob["signature"]
+            if not isinstance(random_obj, dict) or not isinstance(signature, str):
+                raise TypeError("random must be an object and signature a string")
+        except (ValueError, KeyError, TypeError) as e:
+            report(index, {"verified": False, "error": f"Invalid record: {e}"})
+            continue
+        records.append({
+            "index": index,
+            "random": random_obj,
+            "signature": signature,
+            "player": blob.get("player") or default_player,
+            "postedAt": post_time(blob)
+        })
+    
+    with tracker_store(tracker_path) as tracker, tracker.transaction(), \
+            ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        verify_records(tracker, records, executor, mode, report, rules=rules, campaign=campaign)
+    return counts
+
+
+def post_report(post: dict, rolls: list) -> dict:
+    """Per-post summary of a post's roll results (in the order they appear)."""
+    counts = {"verified": 0, "failed": 0, "suspicious": 0}
+    for result in rolls:
+        count_result(counts, result)
+    
+    total = len(rolls)
+    if counts["failed"]:
+        message = f"❌ {counts['failed']} of {total} roll(s) failed verification."
+    elif counts["suspicious"]:
+        message = f"⚠️  {counts['suspicious']} of {total} roll(s) SUSPICIOUS."
+    else:
+        message = f"✅ {total} roll(s) verified."
+    
+    report = {
+        "post": post["post"],
+        "source": post["source"],
+        "line": post["line"],
+        "id": post["id"],
+        "author": post["author"],
+        "rolls": rolls,
+        "message": message
+    }
+    report.update(counts)
+    return report
+
+
+def ingest_thread(path: str, tracker_path: str, default_player: str = ANONYMOUS,
+                  mode: str = None, concurrency: int = DEFAULT_CONCURRENCY,
+                  window: int = INGEST_WINDOW, emit=None, full: bool = False, rules=None,
+                  campaign: str = None) -> dict:
+    """
+    Find and verify every new roll in a saved thread (see ingest.py for
+    formats).
+    
+    Each file is resumed from its checkpoint in the tracker, so only what
+    was added since the last ingest is read and verified (plus the last
+    post seen, in case it was still being written). full=True ignores the
+    checkpoints and the verdict cache: every blob is read and its
+    signature checked again. Rolls the tracker already has are then
+    audited: their serials and the suspicion rules are judged against a
+    scratch tracker holding only this run's audited rolls (so a serial
+    posted twice in the thread is still a replay, but one recorded by an
+    earlier ingest is not), nothing about them is recorded again, and
+    their results carry "audit": true. Rolls the tracker hasn't seen are
+    recorded as usual.
+    
+    Posts are read in one pass and verified a window of about `window`
+    blobs at a time, so memory stays flat however long the thread is. Each
+    blob's player is its post's author (else the blob's userData
+    character, else default_player). One report per post that carries a
+    roll is emitted in thread order. The tracker, with the new
+    checkpoints, is written once (one transaction for SQLite), as in
+    verify_batch().
+    
+    Returns {"files", "resumed", "posts", "rolls", "verified", "failed",
+    "suspicious"} counts for new rolls; with full=True, "audit" holds
+    {"rolls", "verified", "failed", "suspicious"} for the audited ones.
+    """
+    emit = emit or (lambda report: print(json.dumps(report, ensure_ascii=False), flush=True))
+    counts = {"files": 0, "resumed": 0, "posts": 0, "rolls": 0,
+              "verified": 0, "failed": 0, "suspicious": 0}
+    audit_tracker = None
+    if full:
+        counts["audit"] = {"rolls": 0, "verified": 0, "failed": 0, "suspicious": 0}
+        audit_tracker = JSONTracker()  # in memory only
+    
+    def recorded(record: dict) -> bool:
+        random_obj = record["random"]
+        serial = random_obj.get("serialNumber")
+        return isinstance(serial, int) and tracker.has_serial(
+            player_key_for(random_obj.get("hashedApiKey", "")), serial)
+    
+    def flush(posts: list):
+        results = {}
+        records = []
+        for post in posts:
+            for i, blob in enumerate(post["blobs"]):
+                user_data = blob["random"].get("userData")
+                character = user_data.get("character") if isinstance(user_data, dict) else None
+                records.append({
+                    "index": (post["file"], post["post"], i),
+                    "random": blob["random"],
+                    "signature": blob["signature"],
+                    "player": post["author"] or character or default_player,
+                    "postedAt": post.get("postedAt")
+                })
+        audited = [r for r in records if recorded(r)] if full else []
+        if audited:
+            ids = set(id(r) for r in audited)
+            records = [r for r in records if id(r) not in ids]
+            verify_records(audit_tracker, audited, executor, mode,
+                           lambda index, result: results.__setitem__(index, dict(result, audit=True)),
+                           False, rules, campaign)
+        verify_records(tracker, records, executor, mode,
+                       lambda index, result: results.__setitem__(index, result), not full, rules, campaign)
+        
+        for post in posts:
+            rolls = [dict(results[(post["file"], post["post"], i)], line=blob["line"])
+                     for i, blob in enumerate(post["blobs"])]
+            rolls += [{"verified": False, "error": e["error"], "line": e["line"]} for e in post["errors"]]
+            rolls.sort(key=lambda r: r["line"] or 0)
+            report = post_report(post, rolls)
+            for roll in rolls:
+                bucket = counts["audit"] if roll.get("audit") else counts
+                bucket["rolls"] += 1
+                count_result(bucket, roll)
+            with phase("output"):
+                emit(report)
+    
+    with tracker_store(tracker_path) as tracker, tracker.transaction(), \
+            ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        pending = []
+        size = 0
+        for file_number, source in enumerate(iter_sources(path)):
+            key = checkpoint_key(source)
+            scan = SourceScan(source, None if full or key is None else tracker.get_checkpoint(key))
+            counts["files"] += 1
+            counts["resumed"] += scan.resumed
+            for post in timed_iter("scan", scan):
+                counts["posts"] += 1
+                if not post["blobs"] and not post["errors"]:
+                    continue
+                post["file"] = file_number
+                pending.append(post)
+                size += len(post["blobs"])
+                if size >= window:
+                    flush(pending)
+                    pending, size = [], 0
+            if key is not None:
+                # Committed with the serials, so a failed run re-reads this file
+                tracker.set_checkpoint(key, scan.checkpoint())
+        if pending:
+            flush(pending)
+    return counts
+
+
 def show_history(player: str, tracker_path: str) -> dict:
-    """Show serial history for a player."""
-    tracker = load_tracker(tracker_path)
+    """
+    Show serial history for a player.
+    
+    The API key with the most rolls under that name is shown; any other
+    keys that have posted under it are listed in "otherKeys".
+    """
+    with tracker_store(tracker_path) as tracker:
+        # Name index lookup (case-insensitive)
+        found = tracker.find_players(player)
+    
+    if not found:
+        return {"error": f"No history found for player: {player}"}
+    data = found[0]
+    result = {
+        "player": data["name"],
+        "hashedApiKey": data["playerKey"] + "...",
+        "names": data["names"],
+        "serialCount": data["serialCount"],
+        "serials": data["serials"],
+        "lastSerial": data["serials"][-1] if data["serials"] else None,
+        "serialRuns": data["runs"],
+        "missingSerials": data["missing"],
+        "otherKeys": [
+            {"hashedApiKey": other["playerKey"] + "...", "names": other["names"],
+             "serialCount": other["serialCount"]}
+            for other in found[1:]
+        ]
+    }
+    if result["otherKeys"]:
+        result["warning"] = f"{len(found)} API keys have posted as {player}"
+    elif len(data["names"]) > 1:
+        result["warning"] = f"This API key has posted as {', '.join(data['names'])}"
+    return result
+
+
+def show_aliases(tracker_path: str) -> dict:
+    """API keys seen under several names, and names seen from several API keys."""
+    with tracker_store(tracker_path) as tracker:
+        aliases = tracker.aliases()
     
-    # Search by name (fuzzy match)
-    for key, data in tracker["players"].items():
-        if data.get("name", "").lower() == player.lower():
-            return {
-                "player": data["name"],
+    return {
+        "keysWithSeveralNames": [
+            {"hashedApiKey": key + "...", "names": names}
+            for key, names in sorted(aliases["keys"].items())
+        ],
+        "namesWithSeveralKeys": [
+            {"name": name, "hashedApiKeys": [key + "..." for key in keys]}
+            for name, keys in sorted(aliases["names"].items(), key=lambda item: item[0].lower())
+        ]
+    }
+
+
+def show_stats(player: str, tracker_path: str) -> dict:
+    """Dice fairness statistics for a player's API keys (every player if ANONYMOUS)."""
+    with tracker_store(tracker_path) as tracker:
+        if player == ANONYMOUS:
+            stats = tracker.all_stats()
+        else:
+            stats = {key: tracker.get_stats(key) for key in tracker.keys_for_name(player)}
+        players = []
+        for key, dice in sorted(stats.items()):
+            summaries = [DieStats.from_dict(die, data).summary() for die, data in sorted(dice.items())]
+            players.append({
                 "hashedApiKey": key + "...",
-                "serialCount": len(data["serials"]),
-                "serials": data["serials"],
-                "lastSerial": data["serials"][-1] if data["serials"] else None
-            }
+                "names": tracker.names_for_key(key),
+                "dice": summaries,
+                "warnings": [s["warning"] for s in summaries if "warning" in s]
+            })
+    
+    if not players:
+        return {"error": f"No dice statistics found for player: {player}"}
+    return {"players": players}
+
+
+def rebuild_stats(path: str, tracker_path: str, mode: str = None) -> dict:
+    """
+    Recompute every player's dice statistics from an archive (any --ingest
+    format: thread exports, directories of posts, --batch JSON Lines).
+    
+    Only authentic blobs whose serial the tracker has recorded count, each
+    serial once. Signatures are checked batch_size() blobs at a time (one
+    JSON-RPC batch for the ones random.org has to answer). Face counts are
+    gathered per player and die first, then each DieStats is built from
+    its histogram in one step (DieStats.from_counts), replacing all stored
+    statistics.
+    """
+    histograms = {}
+    seen = set()
+    counts = {"rolls": 0, "skipped": 0}
+    pending = []
+    size = batch_size()
+    
+    def flush():
+        verdicts = verify_signatures([(blob["random"], blob["signature"]) for blob, _ in pending], mode)
+        for (blob, key), verdict in zip(pending, verdicts):
+            if key in seen or not verdict.get("result", {}).get("authenticity"):
+                counts["skipped"] += 1
+                continue
+            seen.add(key)
+            counts["rolls"] += 1
+            for die, histogram in roll_histograms(blob["random"]).items():
+                histograms.setdefault((key[0], die), Counter()).update(histogram)
+        del pending[:]
+    
+    tracker = load_tracker(tracker_path)
+    try:
+        with tracker.transaction():
+            for source in iter_sources(path):
+                for post in SourceScan(source):
+                    for blob in post["blobs"]:
+                        random_obj = blob["random"]
+                        player_key = player_key_for(random_obj.get("hashedApiKey", ""))
+                        serial = random_obj.get("serialNumber")
+                        if (not isinstance(serial, int) or (player_key, serial) in seen
+                                or not tracker.has_serial(player_key, serial)):
+                            counts["skipped"] += 1
+                            continue
+                        pending.append((blob, (player_key, serial)))
+                        if len(pending) >= size:
+                            flush()
+            if pending:
+                flush()
+            
+            tracker.clear_stats()
+            for (player_key, die), histogram in histograms.items():
+                tracker.put_stats(player_key, die, DieStats.from_counts(die, histogram).to_dict())
+    finally:
+        tracker.close()
+    
+    counts["players"] = len({player_key for player_key, _ in histograms})
+    return counts
+
+
+def clear_tracker(tracker_path: str) -> dict:
+    """Forget every serial, name, statistic and checkpoint (new campaign)."""
+    with tracker_store(tracker_path) as tracker, tracker.transaction():
+        tracker.clear()
+    return {"message": "Serial tracker cleared."}
+
+
+def import_tracker(source_path: str, tracker_path: str) -> dict:
+    """
+    Copy a JSON serial tracker (serials, names, dice statistics and ingest
+    checkpoints) into the tracker at tracker_path (e.g. a .db).
+    """
+    data = load_json(source_path)
+    tracker = load_tracker(tracker_path)
+    try:
+        counts = import_tracker_data(tracker, data)
+    finally:
+        tracker.close()
+    return {"message": f"Imported {counts['serials']} serials for {counts['players']} players, "
+                       f"{counts['stats']} dice statistics and {counts['checkpoints']} thread "
+                       f"checkpoints into {tracker_path}."}
+
+
+def fail(message: str):
+    print(json.dumps({"error": message}))
+    sys.exit(1)
+
+
+def read_blob(args) -> tuple:
+    """The (random object, signature) to verify, from --random/--signature or stdin."""
+    random_obj = None
+    signature = None
     
-    return {"error": f"No history found for player: {player}"}
+    with phase("input"):
+        if args.random and args.signature:
+            # From arguments
+            try:
+                random_obj = RandomObject.from_text(args.random)
+                signature = args.signature
+            except ValueError as e:
+                fail(f"Invalid JSON in --random: {e}")
+        else:
+            # Try reading from stdin
+            if not sys.stdin.isatty():
+                try:
+                    blob = load_blob(sys.stdin.read())
+                    random_obj = blob.get("random")
+                    signature = blob.get("signature")
+                except json.JSONDecodeError as e:
+                    fail(f"Invalid JSON from stdin: {e}")
+    
+    if not random_obj or not signature:
+        fail("Missing random object or signature. Use --random and --signature, or pipe JSON blob.")
+    return random_obj, signature
+
+
+def exit_status(counts: dict) -> int:
+    """1 if any roll (new or audited) failed, 2 if any was suspicious, else 0."""
+    audit = counts.get("audit", {})
+    if counts["failed"] or audit.get("failed"):
+        return 1
+    if counts["suspicious"] or audit.get("suspicious"):
+        return 2
+    return 0
+
+
+def ingest_summary(counts: dict) -> str:
+    message = (f"Scanned {counts['posts']} posts in {counts['files']} file(s) "
+               f"({counts['resumed']} resumed from checkpoints): {counts['rolls']} new rolls, "
+               f"{counts['verified']} verified, {counts['suspicious']} suspicious, "
+               f"{counts['failed']} failed.")
+    audit = counts.get("audit")
+    if audit is not None:
+        message += (f" Audited {audit['rolls']} already recorded rolls: {audit['verified']} verified, "
+                    f"{audit['suspicious']} suspicious, {audit['failed']} failed.")
+    return json.dumps({"message": message})
+
+
+class ServiceConnection(http.client.HTTPConnection):
+    """HTTP to dm-verify-service.py over its Unix socket."""
+
+    def __init__(self, socket_path: str, timeout: float = SERVICE_TIMEOUT):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+def call_service(socket_path: str, method: str, path: str, payload: dict = None, query: dict = None) -> dict:
+    """
+    One request to the dm-verify-service.py on socket_path, returning its
+    JSON reply. Raises RuntimeError if the service can't be reached or
+    refuses the request.
+    """
+    target = path
+    if query:
+        target += "?" + urlencode(query)
+    body = encode(payload) if payload is not None else None
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    conn = ServiceConnection(socket_path)
+    try:
+        conn.request(method, target, body, headers)
+        response = conn.getresponse()
+        reply = json.loads(response.read().decode("utf-8"))
+    except (OSError, ValueError, http.client.HTTPException) as e:
+        raise RuntimeError(f"Verification service unavailable at {socket_path}: {e}")
+    finally:
+        conn.close()
+    if response.status != 200:
+        raise RuntimeError(reply.get("error") or f"Verification service answered HTTP {response.status}")
+    return reply
+
+
+def run_client(socket_path: str, args):
+    """
+    Do what the arguments ask through the service on socket_path instead of locally,
+    printing the same output and exiting with the same status.
+    """
+    if args.import_tracker or args.rebuild_stats:
+        fail(f"--import-tracker and --rebuild-stats run locally: stop the service, "
+             f"unset {SERVICE_ENV} and run them against its tracker")
+    if args.ingest == "-":
+        fail("--ingest - can't read stdin through the service; pass a file or directory")
+    
+    request = {"player": args.player}
+    if args.campaign:
+        request["campaign"] = args.campaign
+    if args.verify_mode:
+        request["verifyMode"] = args.verify_mode
+    
+    try:
+        if args.clear:
+            reply = call_service(socket_path, "POST", "/clear", request)
+        elif args.cache_stats:
+            reply = call_service(socket_path, "GET", "/cache-stats")
+        elif args.history or args.stats or args.aliases:
+            path = "/history" if args.history else "/stats" if args.stats else "/aliases"
+            reply = call_service(socket_path, "GET", path, query=request)
+        elif args.ingest:
+            request.update(path=os.path.abspath(args.ingest), fullAudit=args.full_audit)
+            reply = call_service(socket_path, "POST", "/ingest", request)
+        elif args.batch:
+            request["lines"] = list(timed_iter("input", sys.stdin))
+            reply = call_service(socket_path, "POST", "/batch", request)
+        else:
+            request["random"], request["signature"] = read_blob(args)
+            with phase("signature"):
+                reply = call_service(socket_path, "POST", "/verify", request)
+    except RuntimeError as e:
+        fail(str(e))
+    
+    with phase("output"):
+        if args.ingest:
+            for report in reply["reports"]:
+                print(json.dumps(report, ensure_ascii=False))
+            print(ingest_summary(reply["counts"]), file=sys.stderr)
+        elif args.batch:
+            for result in reply["results"]:
+                print(json.dumps(result, ensure_ascii=False))
+        elif args.clear:
+            print(json.dumps(reply))
+        else:
+            print(json.dumps(reply, indent=2, ensure_ascii=not (args.stats or args.aliases)))
+    
+    if args.ingest or args.batch:
+        sys.exit(exit_status(reply["counts"]))
+    if "random" in request:
+        if not reply.get("verified"):
+            sys.exit(1)
+        if reply.get("suspicious"):
+            sys.exit(2)
 
 
 def main():
+    started = time.perf_counter()
     parser = argparse.ArgumentParser(description="DM dice roll verification tool")
     parser.add_argument("--random", help="Random object JSON")
     parser.add_argument("--signature", help="Signature string")
-    parser.add_argument("--player", default="Unknown", help="Player/character name")
+    parser.add_argument("--player", default=ANONYMOUS, help="Player/character name")
     parser.add_argument("--tracker", default=DEFAULT_TRACKER, help="Serial tracker file path")
     parser.add_argument("--history", action="store_true", help="Show serial history")
+    parser.add_argument("--aliases", action="store_true",
+                        help="Report API keys with several names and names with several keys")
     parser.add_argument("--clear", action="store_true", help="Clear all tracking data")
+    parser.add_argument("--import-tracker", metavar="JSON",
+                        help="Copy a JSON serial tracker into --tracker (e.g. a .db)")
+    parser.add_argument("--stats", action="store_true", help="Show dice fairness statistics")
+    parser.add_argument("--rebuild-stats", metavar="PATH",
+                        help="Recompute dice statistics from an archive of threads or blobs")
+    parser.add_argument("--batch", action="store_true",
+                        help="Verify many blobs from stdin (JSON Lines), one tracker write")
+    parser.add_argument("--ingest", metavar="PATH",
+                        help="Find and verify every roll in a saved thread (file, directory or -)")
+    parser.add_argument("--full-audit", action="store_true",
+                        help="With --ingest: ignore checkpoints and cached verdicts, re-check everything")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Signatures checked at once in --batch and --ingest modes")
+    parser.add_argument("--cache-stats", action="store_true", help="Show verification cache statistics")
+    parser.add_argument("--verify-mode", choices=MODES,
+                        help="Signature check: auto (offline, API fallback), offline or online")
+    parser.add_argument("--rules", metavar="FILE",
+                        help="Suspicion rules (JSON, see rules.py); default $DM_VERIFY_RULES or built-in")
+    parser.add_argument("--campaign",
+                        help="Campaign for trace events and, with --service, the service's tracker")
+    parser.add_argument("--service", metavar="SOCKET",
+                        help=f"Run through a dm-verify-service.py (default ${SERVICE_ENV})")
+    parser.add_argument("--profile", action="store_true",
+                        help="Print a per-phase timing breakdown to stderr when done")
+    parser.add_argument("--profile-out", metavar="FILE",
+                        help="With --profile: also write cProfile stats to FILE")
     
     args = parser.parse_args()
+    if args.profile or args.profile_out:
+        profiling.start("dm-verify.py", args.profile_out, started)
+        profiling.record("arg_parse", time.perf_counter() - started)
+    start_export()
+    
+    service = args.service or os.environ.get(SERVICE_ENV)
+    if service:
+        run_client(service, args)
+        return
     
     # Handle special actions
     if args.clear:
-        save_tracker(args.tracker, {"players": {}})
-        print(json.dumps({"message": "Serial tracker cleared."}))
+        print(json.dumps(clear_tracker(args.tracker)))
+        return
+    
+    if args.import_tracker:
+        print(json.dumps(import_tracker(args.import_tracker, args.tracker)))
+        return
+    
+    if args.cache_stats:
+        print(json.dumps(get_verifier().cache.stats(), indent=2))
         return
     
     if args.history:
@@ -252,38 +1206,52 @@ def main():
         print(json.dumps(result, indent=2))
         return
     
-    # Get verification data
-    random_obj = None
-    signature = None
+    if args.stats:
+        print(json.dumps(show_stats(args.player, args.tracker), indent=2, ensure_ascii=False))
+        return
     
-    if args.random and args.signature:
-        # From arguments
+    if args.rebuild_stats:
         try:
-            random_obj = json.loads(args.random)
-            signature = args.signature
-        except json.JSONDecodeError as e:
-            print(json.dumps({"error": f"Invalid JSON in --random: {e}"}))
-            sys.exit(1)
-    else:
-        # Try reading from stdin
-        if not sys.stdin.isatty():
-            try:
-                blob = json.load(sys.stdin)
-                random_obj = blob.get("random")
-                signature = blob.get("signature")
-            except json.JSONDecodeError as e:
-                print(json.dumps({"error": f"Invalid JSON from stdin: {e}"}))
-                sys.exit(1)
-    
-    if not random_obj or not signature:
+            counts = rebuild_stats(args.rebuild_stats, args.tracker, args.verify_mode)
+        except (OSError, ValueError) as e:
+            fail(f"Cannot read archive: {e}")
         print(json.dumps({
-            "error": "Missing random object or signature. Use --random and --signature, or pipe JSON blob."
+            "message": f"Rebuilt dice statistics for {counts['players']} players from "
+                       f"{counts['rolls']} rolls ({counts['skipped']} blobs skipped)."
         }))
-        sys.exit(1)
+        return
+    
+    if args.aliases:
+        print(json.dumps(show_aliases(args.tracker), indent=2, ensure_ascii=False))
+        return
+    
+    try:
+        with phase("rules_load"):
+            rules = get_rules(args.rules)
+    except RuleError as e:
+        fail(str(e))
+    
+    if args.ingest:
+        try:
+            counts = ingest_thread(args.ingest, args.tracker, args.player, args.verify_mode,
+                                   args.concurrency, full=args.full_audit, rules=rules,
+                                   campaign=args.campaign)
+        except (OSError, ValueError) as e:
+            fail(f"Cannot read thread: {e}")
+        print(ingest_summary(counts), file=sys.stderr)
+        sys.exit(exit_status(counts))
+    
+    if args.batch:
+        counts = verify_batch(sys.stdin, args.tracker, args.player, args.verify_mode, args.concurrency,
+                              rules=rules, campaign=args.campaign)
+        sys.exit(exit_status(counts))
     
     # Verify the roll
-    result = verify_roll(random_obj, signature, args.player, args.tracker)
-    print(json.dumps(result, indent=2))
+    random_obj, signature = read_blob(args)
+    result = verify_roll(random_obj, signature, args.player, args.tracker, args.verify_mode, rules,
+                         args.campaign)
+    with phase("output"):
+        print(json.dumps(result, indent=2))
     
     # Exit with error code if not verified or suspicious
     if not result.get("verified"):
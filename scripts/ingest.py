@@ -0,0 +1,545 @@
+"""
+ingest.py - Find roll verification blobs in a saved thread
+
+Reads a thread export one line at a time and yields each post with the
+blobs found in it, so a thread of any size is scanned in one pass with
+only the current post in memory.
+
+Input:
+  *.md, *.markdown, *.txt  Markdown export. A post starts at an author line
+                           such as "**Comment by @Kira**" or
+                           "**Post by DM (@lexemy) in m/adnd**"; block quote
+                           markers ("> ") are ignored.
+  *.json, *.jsonl          Post objects, as a JSON array or one per line:
+                           {"id", "author", "body"} ("user"/"username" and
+                           "content"/"text" are accepted too), or bare
+                           {"random", "signature", "player"} blobs as
+                           --batch reads them, or a {"posts": [...]}
+                           export. Array elements, including each post of
+                           a "posts" array, are decoded one at a time, so
+                           memory is bounded by the largest single post,
+                           not the export. A post's "createdAt" (or
+                           "created_at", "timestamp", "postedAt") is kept
+                           as its "postedAt".
+  a directory              Every such file in it, in name order
+  -                        Markdown on stdin
+
+Blobs are found in the forms roll.py and templates/roll-post.md produce:
+  - a ```json fence holding {"random": {...}, "signature": "..."}
+  - the same object alone on a line (roll.py's raw blob)
+  - a ```json fence holding only the random object, followed by a
+    "signature:" line with the signature in backticks or in the next
+    fence (as in docs/example.md)
+Each random object keeps the exact text it was posted as (see blob.py).
+
+Checkpoints:
+    SourceScan(path, checkpoint) resumes a file at the last post an earlier
+    scan saw (its byte offset, line and post number), dropping the blobs of
+    that post that were already processed, so re-scanning a growing thread
+    only reads what was added. In a {"posts": [...]} export that is the
+    post's element of the array, and the checkpoint's "within": "posts"
+    says the scan resumes inside it. The checkpoint is ignored (full scan) if the
+    bytes just before that offset have changed, i.e. the export was edited
+    or replaced rather than appended to.
+
+Usage:
+    from ingest import SourceScan, iter_posts
+
+    for post in iter_posts("thread.md"):
+        print(post["author"], len(post["blobs"]), post["errors"])
+
+    scan = SourceScan("thread.md", checkpoint)
+    new_posts = list(scan)
+    checkpoint = scan.checkpoint()
+"""
+
+import io
+import os
+import re
+import sys
+import json
+import hashlib
+from pathlib import Path
+
+from blob import RandomObject, decode, loads as load_blob
+
+MARKDOWN_SUFFIXES = (".md", ".markdown", ".txt")
+JSON_SUFFIXES = (".json", ".jsonl")
+READ_SIZE = 1 << 16
+MAX_FENCE_CHARS = 1 << 20  # a fence longer than this is not a blob
+FINGERPRINT_BYTES = 4096   # bytes before a checkpoint that must be unchanged to resume
+POSTED_FIELDS = ("postedAt", "createdAt", "created_at", "timestamp")
+
+QUOTE = re.compile(r"^\s*(?:>\s?)+")
+FENCE = re.compile(r"^\s*(`{3,}|~{3,})\s*([\w+-]*)")
+AUTHOR = re.compile(r"^(?:#+\s*)?\**\s*(?:Comment|Post|Reply)\s+by\s+(.+?)\s*\**\s*$", re.I)
+HANDLE = re.compile(r"@([\w.-]+)")
+SIGNATURE = re.compile(r"^\**\s*signature\s*:?\s*\**\s*:?\s*(?:`([^`]+)`)?\s*$", re.I)
+
+
+def parse_author(text: str) -> str:
+    """'DM (@lexemy) in m/adnd' -> 'lexemy', '@Theron' -> 'Theron'."""
+    handle = HANDLE.search(text)
+    if handle:
+        return handle.group(1)
+    return text.split()[0].strip("*")
+
+
+def blob_hash(random_obj: dict, signature: str) -> str:
+    """Identity of a blob, independent of how it was formatted in the post."""
+    text = json.dumps({"random": random_obj, "signature": signature},
+                      sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def is_random_object(value) -> bool:
+    return isinstance(value, dict) and "serialNumber" in value and "data" in value
+
+
+class PostScanner:
+    """
+    Line-at-a-time blob scanner for one source.
+
+    feed() each line; it returns the previous post whenever an author line
+    starts a new one, and finish() returns the last post.
+    """
+
+    def __init__(self, source: str, author: str = None, post_id=None, split: bool = True,
+                 line: int = 1, offset: int = 0):
+        self.source = source
+        self.split = split
+        self.fence = None
+        self.pending = None  # random object still waiting for its signature
+        self.want_signature = False
+        self.post = self._new_post(line, offset, author, post_id)
+
+    def _new_post(self, line: int, offset: int, author: str = None, post_id=None) -> dict:
+        return {"source": self.source, "line": line, "offset": offset, "id": post_id,
+                "postedAt": None, "author": author, "blobs": [], "errors": []}
+
+    def _blob(self, line: int, random_obj: dict, signature: str):
+        self.post["blobs"].append({"line": line, "random": random_obj, "signature": signature,
+                                   "hash": blob_hash(random_obj, signature)})
+
+    def _error(self, line: int, message: str):
+        digest = hashlib.sha256(f"{line}:{message}".encode("utf-8")).hexdigest()
+        self.post["errors"].append({"line": line, "error": message, "hash": digest})
+
+    def _drop_pending(self):
+        if self.pending:
+            self._error(self.pending[0], "Random object without a signature")
+        self.pending = None
+        self.want_signature = False
+
+    def _candidate(self, line: int, text: str):
+        """A fence or line that may hold JSON: a blob, a random object, or neither."""
+        try:
+            value = load_blob(text)
+        except ValueError as e:
+            if '"random"' in text or '"serialNumber"' in text:
+                self._error(line, f"Unreadable verification blob: {e}")
+            return
+        if isinstance(value, dict) and isinstance(value.get("random"), dict) \
+                and isinstance(value.get("signature"), str):
+            self._blob(line, value["random"], value["signature"])
+            self.pending = None
+        elif is_random_object(value):
+            self._drop_pending()
+            self.pending = (line, RandomObject(value, text.encode("utf-8")))
+
+    def _close_fence(self):
+        _, lang, line, lines, size = self.fence
+        self.fence = None
+        if size > MAX_FENCE_CHARS:
+            return
+        text = "\n".join(lines).strip()
+        if self.want_signature:
+            self.want_signature = False
+            if self.pending and text:
+                self._blob(self.pending[0], self.pending[1], "".join(text.split()))
+                self.pending = None
+                return
+        if lang.lower() in ("json", "") and text.startswith("{"):
+            self._candidate(line, text)
+
+    def feed(self, number: int, raw: str, offset: int = 0):
+        """
+        Scan line number (starting at byte offset); returns the finished
+        previous post if this line starts a new one.
+        """
+        line = QUOTE.sub("", raw.rstrip("\r\n"))
+
+        if self.fence is not None:
+            marker = self.fence[0]
+            if line.strip().startswith(marker) and not line.strip().strip(marker[0]):
+                self._close_fence()
+            elif self.fence[4] <= MAX_FENCE_CHARS:
+                self.fence[3].append(line)
+                self.fence[4] += len(line)
+            return None
+
+        fence = FENCE.match(line)
+        if fence:
+            self.fence = [fence.group(1), fence.group(2), number + 1, [], 0]
+            return None
+
+        stripped = line.strip()
+        author = AUTHOR.match(stripped) if self.split else None
+        if author:
+            self._drop_pending()
+            finished = self.post
+            self.post = self._new_post(number, offset, parse_author(author.group(1)))
+            return finished
+
+        if stripped.startswith('{"random"'):
+            self._candidate(number, stripped)
+        elif self.pending:
+            signature = SIGNATURE.match(stripped)
+            if signature and signature.group(1):
+                self._blob(self.pending[0], self.pending[1], signature.group(1).strip())
+                self.pending = None
+            elif signature:
+                self.want_signature = True
+        return None
+
+    def finish(self) -> dict:
+        if self.fence is not None:
+            self._error(self.fence[2] - 1, "Code fence never closed")
+            self.fence = None
+        self._drop_pending()
+        return self.post
+
+
+def is_empty_preamble(post: dict) -> bool:
+    """Text before a file's first author line, with nothing in it to verify."""
+    return post["author"] is None and not post["blobs"] and not post["errors"]
+
+
+def scan_lines(source: str, lines, author: str = None, post_id=None, split: bool = True,
+               line: int = 1, offset: int = 0):
+    """Yield the posts in an iterable of Markdown lines (starting at line / byte offset)."""
+    scanner = PostScanner(source, author, post_id, split, line, offset)
+    for number, text in enumerate(lines, line):
+        finished = scanner.feed(number, text, offset)
+        if finished is not None and not is_empty_preamble(finished):
+            yield finished
+        offset += len(text.encode("utf-8"))
+    finished = scanner.finish()
+    if not is_empty_preamble(finished):
+        yield finished
+
+
+class JSONStream:
+    """
+    JSON text read from a file as needed. The read position is buffer[pos],
+    at byte offset `offset`; only the text from there on is kept.
+    """
+
+    def __init__(self, f, offset: int = 0):
+        self.f = f
+        self.buffer = ""
+        self.pos = 0
+        self.offset = offset
+        self.eof = False
+
+    def _read(self, size: int = None) -> bool:
+        """Append the next chunk of the file to the buffer (False at end of file)."""
+        chunk = "" if self.eof else self.f.read(size or READ_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _advance(self, end: int):
+        self.offset += len(self.buffer[self.pos:end].encode("utf-8"))
+        self.pos = end
+
+    def skip(self, chars: str = "") -> str:
+        """Skip whitespace and chars; the next character, or "" at end of file."""
+        while True:
+            pos = self.pos
+            while pos < len(self.buffer) and (self.buffer[pos].isspace() or self.buffer[pos] in chars):
+                pos += 1
+            self._advance(pos)
+            if pos < len(self.buffer):
+                return self.buffer[pos]
+            if not self._read():
+                return ""
+
+    def expect(self, char: str):
+        """Skip whitespace, then char (raises ValueError if something else is next)."""
+        if self.skip() != char:
+            raise ValueError(f"Expecting {char!r} at byte {self.offset}")
+        self._advance(self.pos + 1)
+
+    def buffered(self):
+        """
+        Decode and consume the object at the read position if all of it is
+        buffered and it has no "posts" array to stream; otherwise None.
+        """
+        try:
+            value, end = decode(self.buffer, self.pos)
+        except ValueError:
+            return None
+        if not isinstance(value, dict) or isinstance(value.get("posts"), list):
+            return None
+        self._advance(end)
+        return value
+
+    def value(self) -> tuple:
+        """
+        Decode the value at the read position; returns (value, raw text).
+
+        While the value is incomplete, each read is as large as what is
+        buffered, so a large value is decoded O(log n) times over a
+        doubling buffer, not once per READ_SIZE chunk.
+        """
+        self.skip()
+        while True:
+            try:
+                value, end = decode(self.buffer, self.pos)
+            except ValueError:
+                if not self._read(max(READ_SIZE, len(self.buffer) - self.pos)):
+                    raise
+                continue
+            # A number ending at the buffer end might continue in the next chunk
+            if end < len(self.buffer) or isinstance(value, (dict, list, str)) or not self._read():
+                raw = self.buffer[self.pos:end]
+                self._advance(end)
+                return value, raw
+
+
+def iter_members(stream: JSONStream, resume: bool = False):
+    """
+    Yield (byte offset, value, within) for a top-level object: the object
+    itself (within None), or, if it has a "posts" array, each element of
+    that array in turn (within "posts"), with its other members dropped.
+    With resume, the stream starts at an element of that posts array.
+    """
+    start = stream.offset
+    streamed = resume
+    fields = {}
+    if not resume:
+        value = stream.buffered()
+        if value is not None:
+            yield start, value, None  # the common case: a post or blob already in the buffer
+            return
+        stream.expect("{")
+        if stream.skip() == "}":
+            stream.expect("}")
+            yield start, fields, None
+            return
+    while True:
+        if resume:
+            resume = False
+            yield from iter_elements(stream)
+            if stream.skip() == "}":
+                stream.expect("}")
+                break
+            stream.expect(",")
+        key, _ = stream.value()
+        if not isinstance(key, str):
+            raise ValueError(f"Expecting property name at byte {stream.offset}")
+        stream.expect(":")
+        if key == "posts" and stream.skip() == "[":
+            stream.expect("[")
+            yield from iter_elements(stream)
+            streamed = True
+        else:
+            value, raw = stream.value()
+            if key == "random" and isinstance(value, dict):
+                value = RandomObject(value, raw.encode("utf-8"))
+            fields[key] = value
+        if stream.skip() == "}":
+            stream.expect("}")
+            break
+        stream.expect(",")
+    if not streamed:
+        yield start, fields, None
+
+
+def iter_elements(stream: JSONStream):
+    """Yield (byte offset, value, "posts") for each element of a posts array, through its "]"."""
+    while True:
+        char = stream.skip(",")
+        if char == "]":
+            stream.expect("]")
+            return
+        if not char:
+            raise ValueError("Expecting ']' to close the posts array")
+        start = stream.offset
+        yield start, stream.value()[0], "posts"
+
+
+def iter_json_values(f, offset: int = 0, within: str = None):
+    """
+    Decode a JSON array, or concatenated / line-separated values, one value
+    at a time. Yields (byte offset, value, within), counting from offset.
+
+    A top-level object is read one member at a time, and the elements of
+    its "posts" array (a {"posts": [...]} export) are yielded one by one,
+    with within="posts", so only the current post is held in memory.
+    Pass within="posts" to start at such an element (a resumed scan).
+    """
+    stream = JSONStream(f, offset)
+    if within == "posts":
+        yield from iter_members(stream, resume=True)
+    while True:
+        # The outer array's brackets and commas are skipped like whitespace
+        char = stream.skip(",[]")
+        if not char:
+            return
+        if char == "{":
+            yield from iter_members(stream)
+        else:
+            start = stream.offset
+            yield start, stream.value()[0], None
+
+
+def post_author(post: dict) -> str:
+    author = post.get("author") or post.get("user") or post.get("username")
+    if isinstance(author, dict):
+        author = author.get("name") or author.get("username") or author.get("handle")
+    return str(author).lstrip("@") if author else None
+
+
+def post_time(post: dict):
+    """The post's timestamp as exported (string or epoch number), or None."""
+    for field in POSTED_FIELDS:
+        if post.get(field) is not None:
+            return post[field]
+    return None
+
+
+def post_body(post: dict) -> str:
+    body = post.get("body") or post.get("content") or post.get("text") or ""
+    return body if isinstance(body, str) else ""
+
+
+def scan_json(source: str, f, offset: int = 0, within: str = None):
+    """
+    Yield the posts in a JSON export of post objects (starting at byte
+    offset, inside a {"posts": [...]} array if within is "posts"). Posts
+    from such an array carry "within": "posts".
+    """
+    for start, post, within in iter_json_values(f, offset, within):
+        if not isinstance(post, dict) or (within is None and "posts" in post):
+            continue  # not a post, or a "posts" member that isn't an array
+        if isinstance(post.get("random"), dict) and isinstance(post.get("signature"), str):
+            scanned = [blob_post(source, start, post)]
+        else:
+            # The post object carries its author, so author lines don't split it
+            scanned = scan_lines(source, post_body(post).splitlines(True),
+                                 post_author(post), post.get("id"), split=False)
+        for scanned_post in scanned:
+            scanned_post.update(line=None, offset=start, postedAt=post_time(post))
+            if within:
+                scanned_post["within"] = within
+            yield scanned_post
+
+
+def blob_post(source: str, offset: int, record: dict) -> dict:
+    """A post holding one bare blob record (--batch's JSON Lines format)."""
+    player = record.get("player")
+    return {"source": source, "line": None, "offset": offset, "id": record.get("id"),
+            "postedAt": post_time(record), "author": str(player) if player else None, "errors": [],
+            "blobs": [{"line": None, "random": record["random"], "signature": record["signature"],
+                       "hash": blob_hash(record["random"], record["signature"])}]}
+
+
+def fingerprint(source, offset: int) -> str:
+    """Hash of the bytes just before offset in source."""
+    with open(source, "rb") as f:
+        start = max(0, offset - FINGERPRINT_BYTES)
+        f.seek(start)
+        return hashlib.sha256(f.read(offset - start)).hexdigest()
+
+
+def checkpoint_key(source) -> str:
+    """Checkpoint key for a source (None for stdin, which can't be resumed)."""
+    return None if str(source) == "-" else str(Path(source).resolve())
+
+
+def checkpoint_matches(source, checkpoint: dict) -> bool:
+    """Whether source still begins with the content checkpoint was taken from."""
+    try:
+        return (os.path.getsize(source) >= checkpoint["offset"]
+                and fingerprint(source, checkpoint["offset"]) == checkpoint["fingerprint"])
+    except (OSError, KeyError, TypeError):
+        return False
+
+
+class SourceScan:
+    """
+    The posts of one source (a file, or "-" for stdin), numbered from 0 in
+    "post", resumed from a checkpoint when it still matches the file.
+
+    Iterate once, then checkpoint() describes where the next scan starts:
+    the last post (which may still be edited or cut short) is scanned
+    again, minus the blobs and errors already seen in it.
+    """
+
+    def __init__(self, source, checkpoint: dict = None):
+        self.source = source
+        self.resumed = bool(checkpoint) and str(source) != "-" and checkpoint_matches(source, checkpoint)
+        self.start = checkpoint if self.resumed else {"offset": 0, "line": 1, "post": 0, "seen": []}
+        self.tail = None
+
+    def _posts(self, f):
+        offset = self.start["offset"]
+        if Path(str(self.source)).suffix.lower() in JSON_SUFFIXES:
+            return scan_json(str(self.source), f, offset, self.start.get("within"))
+        return scan_lines(str(self.source), f, line=self.start["line"] or 1, offset=offset)
+
+    def __iter__(self):
+        if str(self.source) == "-":
+            yield from self._numbered(sys.stdin)
+            return
+        with open(self.source, "rb") as raw:
+            raw.seek(self.start["offset"])
+            with io.TextIOWrapper(raw, encoding="utf-8", newline="") as f:
+                yield from self._numbered(f)
+
+    def _numbered(self, f):
+        seen = set(self.start["seen"]) if self.resumed else set()
+        for number, post in enumerate(self._posts(f), self.start["post"]):
+            post["post"] = number
+            hashes = [item["hash"] for item in post["blobs"] + post["errors"]]
+            if self.tail is None or self.tail["offset"] != post["offset"]:
+                self.tail = {"offset": post["offset"], "line": post["line"], "post": number, "seen": []}
+                if post.get("within"):
+                    self.tail["within"] = post["within"]
+            self.tail["seen"] += hashes
+            if post["offset"] == self.start["offset"] and seen:
+                # Already processed by the scan that saved the checkpoint
+                post["blobs"] = [b for b in post["blobs"] if b["hash"] not in seen]
+                post["errors"] = [e for e in post["errors"] if e["hash"] not in seen]
+            yield post
+
+    def checkpoint(self) -> dict:
+        """Where the next scan of this source should start (call after iterating)."""
+        tail = self.tail or self.start
+        return dict(tail, fingerprint=fingerprint(self.source, tail["offset"]),
+                    size=os.path.getsize(self.source))
+
+
+def iter_sources(path: str):
+    """The files a thread path stands for: itself, a directory's post files, or "-"."""
+    if path == "-":
+        yield "-"
+        return
+    path = Path(path)
+    if path.is_dir():
+        for child in sorted(path.iterdir()):
+            if child.is_file() and child.suffix.lower() in MARKDOWN_SUFFIXES + JSON_SUFFIXES:
+                yield child
+    else:
+        yield path
+
+
+def iter_posts(path: str):
+    """Yield every post in a thread export file, a directory of them, or - (stdin)."""
+    for source in iter_sources(path):
+        yield from SourceScan(source)
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+roll-daemon.py - Long-running dice roller for many agents on one host
+
+Usage:
+    python roll-daemon.py [--socket PATH] [--window MS]
+
+    # Then point roll.py at it (same arguments, same output):
+    export ROLL_DAEMON_SOCKET=/tmp/agentic-dnd-roll.sock
+    python roll.py 1d20+5 "Theron" "Attack roll"
+
+Options:
+    --socket   Unix socket to listen on (default: /tmp/agentic-dnd-roll.sock)
+    --window   Coalescing window in milliseconds for requests that ask for
+               it (default: 50, 0 disables)
+
+Protocol:
+    One JSON object per line in, one JSON object per line out:
+
+    -> {"expression": "1d20+5", "character": "Theron", "purpose": "Attack",
+        "apiKey": "...", "campaign": "Goblin Ambush", "coalesce": true}
+    <- {"output": "<same text roll.py prints>", "result": {<roll.py --jsonl record>}}
+       or {"error": "..."}
+
+    apiKey is optional (defaults to the daemon's RANDOM_ORG_API_KEY);
+    campaign is optional (defaults to the daemon's DND_CAMPAIGN; roll.py
+    sends its --campaign or DND_CAMPAIGN) and is signed into userData;
+    coalesce defaults to false (roll.py sends true when
+    ROLL_DAEMON_COALESCE is set).
+
+Coalescing (opt-in):
+    Requests that send "coalesce": true, for the same API key, character
+    and campaign, arriving within the window are rolled together as ONE
+    generateSignedIntegerSequences call, one sequence per dice group. Each
+    caller gets its own post text for its slice of the data, and all of
+    them share the same serial and verification blob, whose userData lists
+    every purpose and notation, separated by " | ".
+
+    What the DM sees: one serial for all of them. The first post verified
+    records it; every other post carrying the same blob is reported as a
+    replay ("🔁 already recorded"), and the blob's notation is the
+    combined one, so its total is the sum over every caller's dice. Only
+    coalesce rolls that go out in ONE post (e.g. a character's attacks for
+    a round), and post the blob once.
+
+    A batch is rolled early, before adding a request, if the combined
+    roll would exceed 20 dice groups or random.org's 1000-character
+    userData limit.
+
+Environment:
+    RANDOM_ORG_API_KEY - Default API key for requests that don't send one
+    DND_CAMPAIGN       - Default campaign for requests that don't send one
+    RANDOM_ORG_METRICS_PORT - Serve Prometheus metrics at
+                         http://127.0.0.1:PORT/metrics (see metrics.py);
+                         RANDOM_ORG_METRICS_FILE is written on shutdown
+"""
+
+import os
+import sys
+import json
+import signal
+import argparse
+import threading
+import socketserver
+from concurrent.futures import Future
+
+import roll
+from metrics import start_export
+from scheduler import key_id
+
+DEFAULT_SOCKET = "/tmp/agentic-dnd-roll.sock"
+DEFAULT_WINDOW_MS = 50
+
+
+def render(response: dict, request: dict, data: list = None) -> dict:
+    """Turn an API response into the reply for one caller."""
+    try:
+        result = roll.build_result(
+            response, request["character"], request["purpose"], request["parsed"], data
+        )
+    except roll.RollError as e:
+        return {"error": str(e)}
+    return {"output": roll.render_output(result), "result": result}
+
+
+def combine(requests: list) -> tuple:
+    """The (expression, purpose) of one signed roll covering every request, in order."""
+    expression = {
+        "notation": " | ".join(r["parsed"]["notation"] for r in requests),
+        "groups": [g for r in requests for g in r["parsed"]["groups"]],
+        "modifier": 0
+    }
+    return expression, " | ".join(r["purpose"] for r in requests)
+
+
+def fits(requests: list) -> bool:
+    """True if the requests can share one signed roll (groups and userData size)."""
+    expression, purpose = combine(requests)
+    first = requests[0]
+    size = len(json.dumps(roll.user_data(first["character"], purpose, expression["notation"], first["campaign"])))
+    return len(expression["groups"]) <= roll.MAX_GROUPS and size <= roll.USER_DATA_LIMIT
+
+
+class Coalescer:
+    """Groups opted-in requests per (API key, character, campaign) for a short window, then rolls them."""
+
+    def __init__(self, window: float):
+        self.window = window
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def submit(self, request: dict) -> Future:
+        future = Future()
+        if self.window <= 0 or request.get("coalesce") is not True:
+            self._run([(request, future)])
+            return future
+
+        batch_key = (key_id(request["apiKey"]), request["character"], request["campaign"])
+        flush = None
+
+        with self._lock:
+            batch = self._pending.get(batch_key)
+            if batch is not None and not fits([r for r, _ in batch["items"]] + [request]):
+                # Too big to share one request; roll what we have now
+                flush = self._pending.pop(batch_key)
+                flush["timer"].cancel()
+                batch = None
+
+            if batch is None:
+                batch = {"items": []}
+                batch["timer"] = threading.Timer(self.window, self._flush, args=(batch_key, batch))
+                batch["timer"].daemon = True
+                self._pending[batch_key] = batch
+                batch["timer"].start()
+
+            batch["items"].append((request, future))
+
+        if flush is not None:
+            self._run(flush["items"])
+        return future
+
+    def _flush(self, batch_key, batch):
+        with self._lock:
+            if self._pending.get(batch_key) is batch:
+                del self._pending[batch_key]
+        self._run(batch["items"])
+
+    def _run(self, items: list):
+        try:
+            if len(items) == 1:
+                request, future = items[0]
+                response = roll.roll_expression(
+                    request["parsed"], request["character"], request["purpose"], request["apiKey"],
+                    request["campaign"]
+                )
+                future.set_result(render(response, request))
+                return
+
+            self._run_coalesced(items)
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_result({"error": str(e)})
+
+    def _run_coalesced(self, items: list):
+        requests = [request for request, _ in items]
+        combined, purpose = combine(requests)
+        first = requests[0]
+        response = roll.roll_expression(combined, first["character"], purpose, first["apiKey"],
+                                        first["campaign"])
+
+        if "error" in response:
+            for request, future in items:
+                future.set_result(render(response, request))
+            return
+
+        sequences = response["result"]["random"]["data"]
+        offset = 0
+        for request, future in items:
+            count = len(request["parsed"]["groups"])
+            data = sequences[offset:offset + count]
+            offset += count
+            future.set_result(render(response, request, data[0] if count == 1 else data))
+
+
+class RollHandler(socketserver.StreamRequestHandler):
+    """Reads JSON-line roll requests from one client connection."""
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            reply = self.server.roll(line)
+            self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class RollDaemon(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, window: float):
+        self.coalescer = Coalescer(window)
+        self.default_key = os.environ.get("RANDOM_ORG_API_KEY")
+        super().__init__(socket_path, RollHandler)
+
+    def roll(self, line: bytes) -> dict:
+        try:
+            request = json.loads(line.decode("utf-8"))
+            request["parsed"] = roll.parse_expression(str(request["expression"]))
+        except (ValueError, KeyError, TypeError) as e:
+            return {"error": f"Invalid request: {e}"}
+
+        request["character"] = request.get("character") or "Unknown"
+        request["purpose"] = request.get("purpose") or "Generic roll"
+        request["apiKey"] = request.get("apiKey") or self.default_key
+        request["campaign"] = str(request["campaign"]) if request.get("campaign") else None
+        if not request["apiKey"]:
+            return {"error": "No apiKey in request and RANDOM_ORG_API_KEY not set for the daemon"}
+
+        return self.coalescer.submit(request).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local dice roll daemon")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket path")
+    parser.add_argument("--window", type=float, default=DEFAULT_WINDOW_MS,
+                        help="Coalescing window in milliseconds (0 disables)")
+    args = parser.parse_args()
+    start_export()
+
+    if os.path.exists(args.socket):
+        os.unlink(args.socket)
+
+    old_umask = os.umask(0o177)  # socket readable by this user only (API keys travel over it)
+    try:
+        server = RollDaemon(args.socket, args.window / 1000.0)
+    finally:
+        os.umask(old_umask)
+
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    print(json.dumps({"message": f"Roll daemon listening on {args.socket}"}), file=sys.stderr)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
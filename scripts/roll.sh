@@ -11,6 +11,7 @@
 #
 # Environment:
 #   RANDOM_ORG_API_KEY - Your random.org API key (required)
+#   RANDOM_ORG_API_URL - Override the API endpoint (e.g. tools/standin.py)
 #
 # Output:
 #   Human-readable results + verification JSON for posting
@@ -18,6 +19,8 @@
 
 set -e
 
+API_URL="${RANDOM_ORG_API_URL:-https://api.random.org/json-rpc/4/invoke}"
+
 # Check for API key
 if [ -z "$RANDOM_ORG_API_KEY" ]; then
     echo "Error: RANDOM_ORG_API_KEY environment variable not set" >&2
@@ -52,7 +55,7 @@ fi
 TIMESTAMP=$(date -u +%Y-%m-%dT%H:%M:%SZ)
 
 # Make the API call
-RESPONSE=$(curl -s -X POST https://api.random.org/json-rpc/4/invoke \
+RESPONSE=$(curl -s -X POST "$API_URL" \
     -H "Content-Type: application/json" \
     -d "{
         \"jsonrpc\": \"2.0\",
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+rolltrace.py - Follow a roll from roll.py to the DM's verification
+
+roll.py and dm-verify.py append trace events to a local JSON Lines file
+(RANDOM_ORG_TRACE_FILE), one per roll and one per verification, keyed by
+the roll's hashedApiKey (first 16 characters, as in the serial tracker)
+and serial number. Nothing is rewritten, so player and DM trace files can
+simply be concatenated or passed together.
+
+Events:
+    {"event": "roll", "trace": "a1b2c3d4e5f60718:4242", "key", "serial",
+     "campaign", "character", "purpose", "notation", "completionTime",
+     "spans": {"request":  {"start": <epoch s>, "ms": ...},   # build + quota wait
+               "response": {"start": ..., "ms": ...}}}         # random.org round trip
+
+    {"event": "verify", "trace", "key", "serial", "campaign", "player",
+     "outcome": "verified"|"suspicious"|"replay"|"failed", "rule",
+     "completionTime", "postedAt",
+     "spans": {"post": {"start", "ms"},            # completion -> posted (if known)
+               "verification": {"start", "ms"}}}   # signature check + serial analysis
+
+    postedAt comes from the post's timestamp in a JSON thread export
+    ("createdAt", "created_at", "timestamp" or "postedAt"); Markdown
+    exports don't carry one, so their rolls have no post span.
+
+Lifecycle:
+    requested -> sent -> generated (random.org's completionTime) ->
+    received (player) -> posted -> verification started -> verified (DM).
+    The timeline lists them in that order, whatever the clocks say:
+    completionTime has whole-second resolution (marked "coarse"), so it
+    often reads earlier than the request that produced it.
+    End-to-end latency runs from the request (or, without a roll event,
+    the completionTime) to the end of the first verification. verifyLagMs
+    runs from the player receiving the roll to the start of the first
+    verification; without a roll event it can only be measured from the
+    completionTime, and is reported as verifyLagCoarseMs instead. Player
+    and DM clocks are compared as they are, so skew between hosts shows up
+    in the post, lag and end-to-end spans.
+
+Usage:
+    # Full lifecycle of one roll ("KEY:SERIAL", or a serial for every key)
+    python rolltrace.py --show a1b2c3d4e5f60718:4242
+
+    # Percentiles per campaign (or just one)
+    python rolltrace.py --stats [--campaign "Goblin Ambush"]
+
+Options:
+    --show ID       Lifecycle of the roll(s) with this trace id or serial
+    --stats         p50/p90/p99 of each span and end-to-end, per campaign
+    --campaign NAME With --stats: only this campaign
+    --file PATH     Trace file to read (repeatable; default:
+                    $RANDOM_ORG_TRACE_FILE)
+
+Environment:
+    RANDOM_ORG_TRACE_FILE - Where roll.py and dm-verify.py append events
+                            (tracing is off if unset)
+    DND_CAMPAIGN          - Campaign to tag events with. roll.py (or its
+                            --campaign) also puts it in the signed userData,
+                            so the DM's events inherit it; dm-verify.py's
+                            --campaign overrides what a roll carries
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import threading
+from datetime import datetime, timezone
+
+TRACE_ENV = "RANDOM_ORG_TRACE_FILE"
+CAMPAIGN_ENV = "DND_CAMPAIGN"
+NO_CAMPAIGN = "(none)"
+PERCENTILES = (50, 90, 99)
+MILESTONES = ("requested", "sent", "generated", "received", "posted", "verification started", "verified")
+COARSE = ("generated",)  # whole-second timestamps
+
+TIMESTAMP = re.compile(
+    r"^\s*(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})(\.\d+)?\s*(Z|[+-]\d{2}:?\d{2})?\s*$"
+)
+
+_logs = {}
+_logs_lock = threading.Lock()
+
+
+def trace_id(hashed_key: str, serial) -> str:
+    return f"{(hashed_key or '')[:16]}:{serial}"
+
+
+def parse_time(value):
+    """Epoch seconds for an epoch number or ISO-8601/random.org timestamp (None if neither)."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) / 1000.0 if value > 1e11 else float(value)  # epoch ms or s
+    match = TIMESTAMP.match(value) if isinstance(value, str) else None
+    if not match:
+        return None
+    year, month, day, hour, minute, second, fraction, zone = match.groups()
+    stamp = datetime(int(year), int(month), int(day), int(hour), int(minute), int(second),
+                     tzinfo=timezone.utc).timestamp()
+    if fraction:
+        stamp += float(fraction)
+    if zone and zone != "Z":
+        sign = -1 if zone[0] == "-" else 1
+        digits = zone[1:].replace(":", "")
+        stamp -= sign * (int(digits[:2]) * 3600 + int(digits[2:]) * 60)
+    return stamp
+
+
+def span(start: float, end: float) -> dict:
+    return {"start": round(start, 6), "ms": round((end - start) * 1000, 3)}
+
+
+def campaign_of(random_obj: dict, override: str = None):
+    """override (e.g. dm-verify.py --campaign), else userData's campaign, else $DND_CAMPAIGN."""
+    user_data = random_obj.get("userData")
+    campaign = user_data.get("campaign") if isinstance(user_data, dict) else None
+    return override or campaign or os.environ.get(CAMPAIGN_ENV) or None
+
+
+class TraceLog:
+    """Appends trace events to a JSON Lines file, one write per event."""
+
+    def __init__(self, path: str, campaign: str = None):
+        self.path = path
+        self.campaign = campaign
+        self._lock = threading.Lock()
+
+    def write(self, event: dict):
+        line = (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            # O_APPEND: concurrent writers (player and DM on one host) never interleave a line
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+
+    def roll(self, random_obj: dict, requested: float, sent: float, received: float,
+             campaign: str = None):
+        """Player side: a signed roll came back (epoch seconds for each milestone)."""
+        user_data = random_obj.get("userData") if isinstance(random_obj.get("userData"), dict) else {}
+        self.write({
+            "event": "roll",
+            "trace": trace_id(random_obj.get("hashedApiKey"), random_obj.get("serialNumber")),
+            "key": (random_obj.get("hashedApiKey") or "")[:16],
+            "serial": random_obj.get("serialNumber"),
+            "campaign": campaign or campaign_of(random_obj, self.campaign),
+            "character": user_data.get("character"),
+            "purpose": user_data.get("purpose"),
+            "notation": user_data.get("notation"),
+            "completionTime": random_obj.get("completionTime"),
+            "spans": {"request": span(requested, sent), "response": span(sent, received)}
+        })
+
+    def verify(self, random_obj: dict, result: dict, started: float, finished: float,
+               posted_at=None, campaign: str = None):
+        """DM side: a roll was verified (or failed to verify); campaign overrides self.campaign."""
+        if not result.get("verified"):
+            outcome = "failed"
+        elif result.get("replay"):
+            outcome = "replay"
+        elif result.get("suspicious"):
+            outcome = "suspicious"
+        else:
+            outcome = "verified"
+        spans = {"verification": span(started, finished)}
+        completed = parse_time(random_obj.get("completionTime"))
+        posted = parse_time(posted_at)
+        if completed is not None and posted is not None:
+            spans["post"] = span(completed, posted)
+        self.write({
+            "event": "verify",
+            "trace": trace_id(random_obj.get("hashedApiKey"), random_obj.get("serialNumber")),
+            "key": (random_obj.get("hashedApiKey") or "")[:16],
+            "serial": random_obj.get("serialNumber"),
+            "campaign": campaign_of(random_obj, campaign or self.campaign),
+            "player": result.get("player"),
+            "outcome": outcome,
+            "rule": result.get("suspicionRule"),
+            "completionTime": random_obj.get("completionTime"),
+            "postedAt": posted_at,
+            "spans": spans
+        })
+
+
+def get_trace_log():
+    """The process-wide TraceLog for $RANDOM_ORG_TRACE_FILE, or None if tracing is off."""
+    path = os.environ.get(TRACE_ENV)
+    if not path:
+        return None
+    with _logs_lock:
+        log = _logs.get(path)
+        if log is None:
+            log = _logs[path] = TraceLog(path)
+        return log
+
+
+def load_events(paths: list) -> dict:
+    """{trace id: [events]} from trace files (unreadable lines are skipped)."""
+    traces = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(event, dict) and event.get("trace"):
+                    traces.setdefault(event["trace"], []).append(event)
+    return traces
+
+
+def iso(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def lifecycle(trace: str, events: list) -> dict:
+    """The milestones, spans and end-to-end latency of one roll."""
+    rolls = [e for e in events if e.get("event") == "roll"]
+    checks = sorted((e for e in events if e.get("event") == "verify"),
+                    key=lambda e: e["spans"]["verification"]["start"])
+    roll = rolls[0] if rolls else None
+    first = checks[0] if checks else None
+
+    milestones = {}
+    spans = {}
+    start = None
+    received = None
+    if roll:
+        request, response = roll["spans"]["request"], roll["spans"]["response"]
+        received = response["start"] + response["ms"] / 1000.0
+        milestones.update({"requested": request["start"], "sent": response["start"], "received": received})
+        spans["requestMs"] = request["ms"]
+        spans["responseMs"] = response["ms"]
+        start = request["start"]
+
+    source = roll or first or {}
+    completed = parse_time(source.get("completionTime"))
+    if completed is not None:
+        milestones["generated"] = completed
+        start = completed if start is None else start
+
+    end = None
+    if first:
+        posted = parse_time(first.get("postedAt"))
+        if posted is not None:
+            milestones["posted"] = posted
+            if "post" in first["spans"]:
+                spans["postMs"] = first["spans"]["post"]["ms"]
+        verification = first["spans"]["verification"]
+        end = verification["start"] + verification["ms"] / 1000.0
+        milestones.update({"verification started": verification["start"], "verified": end})
+        spans["verificationMs"] = verification["ms"]
+        if received is not None:
+            spans["verifyLagMs"] = round((verification["start"] - received) * 1000, 3)
+        elif completed is not None:
+            spans["verifyLagCoarseMs"] = round((verification["start"] - completed) * 1000, 3)
+
+    timeline = []
+    for name in MILESTONES:
+        if name in milestones:
+            entry = {"milestone": name, "at": iso(milestones[name])}
+            if name in COARSE:
+                entry["coarse"] = True
+            timeline.append(entry)
+    return {
+        "trace": trace,
+        "campaign": (roll or {}).get("campaign") or (first or {}).get("campaign"),
+        "character": (roll or {}).get("character"),
+        "player": (first or {}).get("player"),
+        "notation": (roll or {}).get("notation"),
+        "outcome": (first or {}).get("outcome"),
+        "rule": (first or {}).get("rule"),
+        "timeline": timeline,
+        "spans": spans,
+        "endToEndMs": round((end - start) * 1000, 3) if start is not None and end is not None else None,
+        "verifications": [{"at": iso(c["spans"]["verification"]["start"]), "outcome": c.get("outcome"),
+                           "ms": c["spans"]["verification"]["ms"]} for c in checks]
+    }
+
+
+def show(traces: dict, wanted: str) -> list:
+    """Lifecycles for a trace id, or for every key's roll with that serial."""
+    if ":" in wanted:
+        ids = [wanted] if wanted in traces else []
+    else:
+        ids = sorted(t for t in traces if t.rsplit(":", 1)[-1] == wanted)
+    return [lifecycle(t, traces[t]) for t in ids]
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def stats(traces: dict, campaign: str = None) -> dict:
+    """{campaign: {"rolls", "verified", outcomes, and p50/p90/p99 per span}}."""
+    samples = {}
+    for trace, events in traces.items():
+        life = lifecycle(trace, events)
+        name = life["campaign"] or NO_CAMPAIGN
+        if campaign is not None and name != campaign:
+            continue
+        entry = samples.setdefault(name, {"rolls": 0, "outcomes": {}, "values": {}})
+        entry["rolls"] += 1
+        if life["outcome"]:
+            entry["outcomes"][life["outcome"]] = entry["outcomes"].get(life["outcome"], 0) + 1
+        values = dict(life["spans"], endToEndMs=life["endToEndMs"])
+        for field, value in values.items():
+            if value is not None:
+                entry["values"].setdefault(field, []).append(value)
+
+    report = {}
+    for name in sorted(samples):
+        entry = samples[name]
+        report[name] = {"rolls": entry["rolls"], "outcomes": entry["outcomes"]}
+        for field, values in sorted(entry["values"].items()):
+            values.sort()
+            report[name][field] = dict(
+                {f"p{p}": percentile(values, p) for p in PERCENTILES}, n=len(values)
+            )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Roll-to-verification traces")
+    parser.add_argument("--show", metavar="ID", help="Lifecycle of a roll (KEY:SERIAL or SERIAL)")
+    parser.add_argument("--stats", action="store_true", help="Span percentiles per campaign")
+    parser.add_argument("--campaign", help="With --stats: only this campaign")
+    parser.add_argument("--file", action="append", help="Trace file (repeatable)")
+    args = parser.parse_args()
+
+    paths = args.file or ([os.environ[TRACE_ENV]] if os.environ.get(TRACE_ENV) else [])
+    if not paths or not (args.show or args.stats):
+        parser.print_help()
+        sys.exit(1)
+    try:
+        traces = load_events(paths)
+    except OSError as e:
+        print(json.dumps({"error": f"Cannot read trace file: {e}"}))
+        sys.exit(1)
+
+    if args.show:
+        found = show(traces, args.show)
+        if not found:
+            print(json.dumps({"error": f"No trace for {args.show}"}))
+            sys.exit(1)
+        print(json.dumps(found[0] if len(found) == 1 else found, indent=2, ensure_ascii=False))
+    else:
+        print(json.dumps(stats(traces, args.campaign), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
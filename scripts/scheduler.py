@@ -0,0 +1,250 @@
+"""
+scheduler.py - Quota- and advisoryDelay-aware scheduling for signed rolls
+
+Every generateSigned* response tells us how long to wait before the next
+request (advisoryDelay) and how much quota is left (bitsLeft, requestsLeft).
+The scheduler remembers those values per API key, both in-process and in a
+small state file so separate roll.py invocations share them, and:
+
+  * queues a request until the advisory delay has passed
+  * estimates the bit cost of a request from n and the die range
+  * rejects the request up front if it would overrun the remaining quota
+
+Quota resets at midnight UTC, so state from a previous UTC day is ignored.
+
+Environment:
+    RANDOM_ORG_STATE_DIR      - Where quota state is kept (default: ~/.cache/agentic-dnd)
+    RANDOM_ORG_RESERVE_BITS   - Bits to hold back for the DM or later rolls (default: 0)
+    RANDOM_ORG_MAX_WAIT       - Longest advisory delay to queue for, in seconds (default: 60)
+
+Quota left per key is exported as the randomorg_bits_left / randomorg_requests_left
+gauges (see metrics.py), and every successful response is appended to the
+quota ledger in the same directory, for run-out forecasts (see ledger.py).
+"""
+
+import os
+import json
+import math
+import time
+import hashlib
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+from ledger import Ledger
+from metrics import counter, gauge, histogram
+from profiling import phase
+
+DEFAULT_STATE_DIR = "~/.cache/agentic-dnd"
+STATE_FILE = "quota-state.json"
+DEFAULT_MAX_WAIT = 60.0
+
+# random.org error codes for exhausted quota
+ERROR_BITS_EXHAUSTED = 200
+ERROR_REQUESTS_EXHAUSTED = 201
+
+BITS_LEFT = gauge("randomorg_bits_left", "Bits left today, from the last response", ["key"])
+REQUESTS_LEFT = gauge("randomorg_requests_left", "Requests left today, from the last response", ["key"])
+BITS_USED = counter("randomorg_bits_used_total", "Bits charged by random.org", ["key"])
+WAIT_SECONDS = histogram("scheduler_wait_seconds", "Time queued for random.org's advisoryDelay")
+REJECTED = counter("scheduler_rejected_total", "Requests refused before sending", ["reason"])
+
+
+class QuotaExceeded(RuntimeError):
+    """The request would overrun the key's remaining quota (or wait too long)."""
+
+
+def key_id(api_key: str) -> str:
+    """Local identifier for an API key (never store the key itself)."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+def utc_day(ts: float = None) -> str:
+    """UTC date string; random.org quotas reset when it changes."""
+    return datetime.fromtimestamp(ts if ts is not None else time.time(), timezone.utc).strftime("%Y-%m-%d")
+
+
+def _as_list(value, n: int) -> list:
+    return list(value) if isinstance(value, list) else [value] * n
+
+
+def estimate_bits(method: str, params: dict) -> int:
+    """
+    Estimate the bits random.org will charge for a generation request.
+
+    Each integer costs log2(max - min + 1) bits, rounded up per group:
+    1d20 = 5, 2d6 = 6, 4d6 = 11 (matches docs/api-reference.md).
+    """
+    if method == "generateSignedIntegers":
+        groups = [(params["n"], params["min"], params["max"])]
+    elif method == "generateSignedIntegerSequences":
+        n = params["n"]
+        groups = zip(
+            _as_list(params["length"], n),
+            _as_list(params["min"], n),
+            _as_list(params["max"], n),
+        )
+    else:
+        return 0
+
+    bits = 0
+    for count, low, high in groups:
+        span = high - low + 1
+        if span > 1:
+            bits += math.ceil(count * math.log2(span))
+    return bits
+
+
+class Scheduler:
+    """Serialises signed requests per API key and enforces quota and delay."""
+
+    def __init__(self, state_dir: str = None, reserve_bits: int = None, max_wait: float = None):
+        state_dir = state_dir or os.environ.get("RANDOM_ORG_STATE_DIR") or DEFAULT_STATE_DIR
+        self.state_path = Path(state_dir).expanduser() / STATE_FILE
+        self.ledger = Ledger(state_dir)
+        if reserve_bits is None:
+            reserve_bits = int(os.environ.get("RANDOM_ORG_RESERVE_BITS", "0"))
+        if max_wait is None:
+            max_wait = float(os.environ.get("RANDOM_ORG_MAX_WAIT", DEFAULT_MAX_WAIT))
+        self.reserve_bits = reserve_bits
+        self.max_wait = max_wait
+
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock_for(self, kid: str) -> threading.Lock:
+        with self._locks_guard:
+            lock = self._locks.get(kid)
+            if lock is None:
+                lock = self._locks[kid] = threading.Lock()
+            return lock
+
+    def _load(self) -> dict:
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def _save_key(self, kid: str, key_state: dict):
+        # Re-read so concurrent roll.py processes don't drop each other's keys
+        state = self._load()
+        state[kid] = key_state
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_name(f"{STATE_FILE}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+
+    def status(self, api_key: str) -> dict:
+        """Last known quota state for a key (empty if unknown or stale)."""
+        key_state = self._load().get(key_id(api_key), {})
+        if key_state.get("day") != utc_day():
+            return {}
+        return key_state
+
+    def check(self, key_state: dict, cost: int):
+        """Raise QuotaExceeded if a request of `cost` bits cannot succeed today."""
+        if key_state.get("day") != utc_day():
+            return
+
+        requests_left = key_state.get("requestsLeft")
+        if requests_left is not None and requests_left < 1:
+            raise QuotaExceeded("No random.org requests left today (resets at midnight UTC)")
+
+        bits_left = key_state.get("bitsLeft")
+        if bits_left is not None and cost > bits_left - self.reserve_bits:
+            raise QuotaExceeded(
+                f"Roll needs ~{cost} bits but only {bits_left:,} are left"
+                + (f" ({self.reserve_bits:,} reserved)" if self.reserve_bits else "")
+                + " (resets at midnight UTC)"
+            )
+
+    def wait_time(self, key_state: dict) -> float:
+        """Seconds until the advisory delay from the last response has passed."""
+        return max(0.0, key_state.get("nextAllowed", 0.0) - time.time())
+
+    def submit(self, api_key: str, method: str, params: dict, send) -> dict:
+        """
+        Run send() (which performs the API call) once quota and delay allow.
+
+        Requests for the same key are queued behind each other; the response
+        is used to update the key's quota state before it is returned.
+        """
+        kid = key_id(api_key)
+        cost = estimate_bits(method, params)
+
+        with self._lock_for(kid):
+            with phase("quota_check"):
+                key_state = self._load().get(kid, {})
+                try:
+                    self.check(key_state, cost)
+                except QuotaExceeded:
+                    REJECTED.inc(reason="quota")
+                    raise
+
+            delay = self.wait_time(key_state)
+            if delay > self.max_wait:
+                REJECTED.inc(reason="delay")
+                raise QuotaExceeded(
+                    f"random.org asked us to wait {delay:.0f}s before the next request"
+                )
+            if delay > 0:
+                with phase("quota_wait"):
+                    time.sleep(delay)
+            WAIT_SECONDS.observe(delay)
+
+            with phase("api_call"):
+                response = send()
+            with phase("quota_save"):
+                key_state = self.update(key_state, response)
+                self._save_key(kid, key_state)
+                self.ledger.append(kid, response, params.get("userData"))
+            self.export(kid, key_state, response)
+            return response
+
+    def export(self, kid: str, key_state: dict, response: dict):
+        """Publish a key's quota state as metrics."""
+        if key_state.get("bitsLeft") is not None:
+            BITS_LEFT.set(key_state["bitsLeft"], key=kid)
+        if key_state.get("requestsLeft") is not None:
+            REQUESTS_LEFT.set(key_state["requestsLeft"], key=kid)
+        result = response.get("result")
+        if isinstance(result, dict) and result.get("bitsUsed"):
+            BITS_USED.inc(result["bitsUsed"], key=kid)
+
+    def update(self, key_state: dict, response: dict) -> dict:
+        """New key state after a response (success or quota error)."""
+        now = time.time()
+        day = utc_day(now)
+        key_state = dict(key_state) if key_state.get("day") == day else {}
+        key_state["day"] = day
+        key_state["lastRequest"] = now
+
+        if "error" in response:
+            code = response["error"].get("code") if isinstance(response["error"], dict) else None
+            if code == ERROR_BITS_EXHAUSTED:
+                key_state["bitsLeft"] = 0
+            elif code == ERROR_REQUESTS_EXHAUSTED:
+                key_state["requestsLeft"] = 0
+            return key_state
+
+        result = response.get("result", {})
+        for field in ("bitsLeft", "requestsLeft"):
+            if field in result:
+                key_state[field] = result[field]
+        key_state["nextAllowed"] = now + result.get("advisoryDelay", 0) / 1000.0
+        return key_state
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> Scheduler:
+    """Return the process-wide scheduler, creating it on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+        return _scheduler
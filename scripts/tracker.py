@@ -0,0 +1,748 @@
+"""
+tracker.py - Storage for dm-verify.py's serial tracker
+
+Every serial a player has ever rolled is kept, so a replayed old roll or
+one posted out of order can be told apart from a real gap no matter how
+long ago it happened. Per player, tracker.serial_set(key) answers "seen
+before?", "how many missing between A and B?" and "how many missing in
+total?" in O(log n).
+
+Names are indexed both ways: every character name a hashedApiKey has
+posted under, and every key that has posted under a name. History
+lookups by name don't scan the players, and tracker.aliases() reports
+keys with several names and names shared by several keys.
+
+Per player and die, dice fairness statistics (fairness.DieStats as a
+dict: face counts, running mean and M2) are stored alongside, updated as
+each new serial is recorded.
+
+Thread checkpoints (how far dm-verify.py --ingest has read each saved
+thread) are stored with the serials and committed in the same
+transaction, so the two can't disagree, and clear() resets both.
+
+Two backends with the same interface, picked by the tracker path:
+
+  *.json                   The original serial-tracker.json: loaded whole,
+                           rewritten whole on commit (with autocommit=False,
+                           only when commit() is called: dm-verify-service.py
+                           writes it every few seconds), no locking between
+                           processes. Full history is stored as runs of
+                           consecutive serials ([[first, last], ...]), which
+                           stays tiny for mostly consecutive rolls; "serials"
+                           keeps the last 50 in the order they were posted.
+  *.db, *.sqlite, *.sqlite3
+                           SQLite in WAL mode: one row per roll, indexed by
+                           player (hashedApiKey), serial and completionTime.
+                           Recording a roll is a few indexed row reads and
+                           one insert inside a write transaction, so several
+                           DM processes can verify at once without losing
+                           updates, and history lookups don't read the rest.
+
+Usage:
+    from tracker import open_tracker
+
+    store = open_tracker("serial-tracker.db")
+    with store.transaction():
+        seen = store.serial_set(player_key)
+        seen_before = 1234 in seen
+        total_missing = seen.total_missing()
+        store.add_serial(player_key, "Grognar", 1234, [17], "2026-02-06 19:00:00Z")
+        other_keys = [k for k in store.keys_for_name("Grognar") if k != player_key]
+    store.close()
+
+Time spent opening, locking and committing each backend is exported as
+the tracker_io_seconds histogram (see metrics.py).
+
+Migrating an existing JSON tracker (serials, names, dice statistics and
+thread checkpoints):
+    python dm-verify.py --tracker serial-tracker.db --import-tracker serial-tracker.json
+"""
+
+import os
+import json
+import time
+import sqlite3
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from contextlib import contextmanager
+from pathlib import Path
+
+from metrics import histogram
+from profiling import phase
+
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+JSON_MAX_SERIALS = 50
+HISTORY_LIMIT = 50
+BUSY_TIMEOUT = 30.0
+ANONYMOUS = "Unknown"  # dm-verify.py's default --player: not a name to index
+SCHEMA_VERSION = 2
+
+IO_SECONDS = histogram("tracker_io_seconds", "Serial tracker I/O by backend and operation",
+                       ["backend", "op"])
+IO_PHASES = {"open": "tracker_load", "begin": "tracker_lock", "commit": "tracker_save"}  # for --profile
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    player_key TEXT PRIMARY KEY,
+    name       TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS player_names (
+    player_key TEXT NOT NULL,
+    name       TEXT NOT NULL COLLATE NOCASE,
+    first_seen REAL NOT NULL,
+    PRIMARY KEY (player_key, name)
+);
+CREATE INDEX IF NOT EXISTS player_names_name ON player_names (name);
+
+CREATE TABLE IF NOT EXISTS rolls (
+    id              INTEGER PRIMARY KEY,
+    player_key      TEXT NOT NULL,
+    serial          INTEGER NOT NULL,
+    completion_time TEXT,
+    roll            TEXT,
+    recorded_at     REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS rolls_player ON rolls (player_key);
+CREATE UNIQUE INDEX IF NOT EXISTS rolls_serial ON rolls (player_key, serial);
+CREATE INDEX IF NOT EXISTS rolls_time ON rolls (player_key, completion_time);
+
+CREATE TABLE IF NOT EXISTS die_stats (
+    player_key TEXT NOT NULL,
+    die        TEXT NOT NULL,
+    stats      TEXT NOT NULL,
+    PRIMARY KEY (player_key, die)
+);
+
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread     TEXT PRIMARY KEY,
+    checkpoint TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class IntervalSet:
+    """
+    A set of integers stored as sorted, disjoint runs [start, end].
+
+    Consecutive serials collapse into one run, so memory grows with the
+    number of gaps rather than the number of rolls. Lookups bisect the run
+    starts (O(log n)); range counts use prefix sums that are rebuilt
+    lazily after an insert.
+    """
+
+    def __init__(self, runs=None):
+        self.starts = []
+        self.ends = []
+        self.count = 0
+        self._prefix = None
+        for start, end in runs or []:
+            self.add_range(start, end)
+
+    @classmethod
+    def from_values(cls, values) -> "IntervalSet":
+        result = cls()
+        for value in sorted(set(values)):
+            result.add(value)
+        return result
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, value: int) -> bool:
+        i = bisect_right(self.starts, value) - 1
+        return i >= 0 and value <= self.ends[i]
+
+    def add(self, value: int) -> bool:
+        """Add value; returns False if it was already present."""
+        return self.add_range(value, value) > 0
+
+    def add_range(self, start: int, end: int) -> int:
+        """Add every integer in [start, end]; returns how many were new."""
+        if end < start:
+            return 0
+        # Runs that overlap or touch [start, end] are merged into one
+        lo = bisect_left(self.ends, start - 1)
+        hi = bisect_right(self.starts, end + 1)
+        present = sum(
+            max(0, min(e, end) - max(s, start) + 1)
+            for s, e in zip(self.starts[lo:hi], self.ends[lo:hi])
+        )
+        added = end - start + 1 - present
+        if lo < hi:
+            start = min(start, self.starts[lo])
+            end = max(end, self.ends[hi - 1])
+        self.starts[lo:hi] = [start]
+        self.ends[lo:hi] = [end]
+        self.count += added
+        self._prefix = None
+        return added
+
+    def min(self):
+        return self.starts[0] if self.starts else None
+
+    def max(self):
+        return self.ends[-1] if self.ends else None
+
+    def predecessor(self, value: int):
+        """Largest member below value, or None."""
+        i = bisect_left(self.starts, value) - 1
+        if i < 0:
+            return None
+        return min(self.ends[i], value - 1)
+
+    def count_upto(self, value: int) -> int:
+        """Number of members <= value."""
+        i = bisect_right(self.starts, value) - 1
+        if i < 0:
+            return 0
+        if self._prefix is None:
+            self._prefix = [0] + list(accumulate(e - s + 1 for s, e in zip(self.starts, self.ends)))
+        return self._prefix[i] + min(self.ends[i], value) - self.starts[i] + 1
+
+    def missing_between(self, a: int, b: int) -> int:
+        """Integers strictly between a and b that are not members."""
+        if b - a <= 1:
+            return 0
+        return (b - a - 1) - (self.count_upto(b - 1) - self.count_upto(a))
+
+    def total_missing(self) -> int:
+        """Integers between the smallest and largest member that are not members."""
+        if not self.count:
+            return 0
+        return self.max() - self.min() + 1 - self.count
+
+    def runs(self) -> list:
+        return [[s, e] for s, e in zip(self.starts, self.ends)]
+
+
+class SQLiteSerialSet:
+    """IntervalSet-style queries answered from the rolls table's serial index."""
+
+    def __init__(self, db, player_key: str):
+        self.db = db
+        self.player_key = player_key
+
+    def _one(self, sql: str, *args):
+        return self.db.execute(sql, (self.player_key,) + args).fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._one("SELECT COUNT(*) FROM rolls WHERE player_key = ?")
+
+    def __contains__(self, value: int) -> bool:
+        return self._one("SELECT COUNT(*) FROM rolls WHERE player_key = ? AND serial = ?", value) > 0
+
+    def min(self):
+        return self._one("SELECT MIN(serial) FROM rolls WHERE player_key = ?")
+
+    def max(self):
+        return self._one("SELECT MAX(serial) FROM rolls WHERE player_key = ?")
+
+    def predecessor(self, value: int):
+        return self._one("SELECT MAX(serial) FROM rolls WHERE player_key = ? AND serial < ?", value)
+
+    def missing_between(self, a: int, b: int) -> int:
+        if b - a <= 1:
+            return 0
+        present = self._one(
+            "SELECT COUNT(*) FROM rolls WHERE player_key = ? AND serial > ? AND serial < ?", a, b
+        )
+        return (b - a - 1) - present
+
+    def total_missing(self) -> int:
+        low, high, count = self.db.execute(
+            "SELECT MIN(serial), MAX(serial), COUNT(*) FROM rolls WHERE player_key = ?", (self.player_key,)
+        ).fetchone()
+        return high - low + 1 - count if count else 0
+
+    def runs(self) -> list:
+        values = [row[0] for row in self.db.execute(
+            "SELECT serial FROM rolls WHERE player_key = ? ORDER BY serial", (self.player_key,)
+        )]
+        return IntervalSet.from_values(values).runs()
+
+
+@contextmanager
+def _timed_io(backend: str, op: str):
+    """Time tracker I/O for the tracker_io_seconds metric and --profile."""
+    with IO_SECONDS.time(backend=backend, op=op), phase(IO_PHASES[op]):
+        yield
+
+
+def load_json(tracker_path: str) -> dict:
+    """Load a serial-tracker.json (empty tracker if missing or unreadable)."""
+    path = Path(tracker_path)
+    if path.exists():
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError):
+            return {"players": {}}
+    return {"players": {}}
+
+
+def save_json(tracker_path: str, data: dict):
+    """Write a serial-tracker.json (atomically replaced, so a crash mid-write loses nothing)."""
+    path = Path(tracker_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(str(tmp), str(path))
+
+
+class JSONTracker:
+    """The serial-tracker.json format, kept in memory and written on commit."""
+
+    def __init__(self, path: str = None, data: dict = None, autocommit: bool = True):
+        self.path = path
+        self.autocommit = autocommit
+        if data is None and path:
+            with _timed_io("json", "open"):
+                data = load_json(path)
+        self.data = data if data is not None else {"players": {}}
+        self.data.setdefault("players", {})
+        self.dirty = False
+        self._sets = {}
+        self._keys_by_name = None
+
+    @contextmanager
+    def transaction(self):
+        yield self
+        if self.autocommit:
+            self.commit()
+
+    def commit(self):
+        """Write the tracker if anything changed since the last write."""
+        if self.dirty:
+            for player_key, serials in self._sets.items():
+                if player_key in self.data["players"]:
+                    self.data["players"][player_key]["runs"] = serials.runs()
+            if self.path:
+                with _timed_io("json", "commit"):
+                    save_json(self.path, self.data)
+        self.dirty = False
+
+    def close(self):
+        pass
+
+    def _serials(self, player_key: str) -> list:
+        return self.data["players"].get(player_key, {}).get("serials", [])
+
+    def last_serial(self, player_key: str):
+        serials = self._serials(player_key)
+        return serials[-1] if serials else None
+
+    def serial_set(self, player_key: str) -> IntervalSet:
+        """Every serial seen for a player (trackers from before "runs" use "serials")."""
+        serials = self._sets.get(player_key)
+        if serials is None:
+            data = self.data["players"].get(player_key, {})
+            if "runs" in data:
+                serials = IntervalSet(data["runs"])
+            else:
+                serials = IntervalSet.from_values(data.get("serials", []))
+            self._sets[player_key] = serials
+        return serials
+
+    def has_serial(self, player_key: str, serial: int) -> bool:
+        return serial in self.serial_set(player_key)
+
+    def recent_serials(self, player_key: str, limit: int = 10) -> list:
+        return self._serials(player_key)[-limit:]
+
+    def add_serial(self, player_key: str, name: str, serial: int, roll: list = None,
+                   completion_time: str = None) -> bool:
+        """Record a serial; returns False if it was already recorded."""
+        if not self.serial_set(player_key).add(serial):
+            return False
+        players = self.data["players"]
+        if player_key not in players:
+            players[player_key] = {"name": name, "names": [], "serials": []}
+        self.note_name(player_key, name)
+        serials = players[player_key]["serials"]
+        serials.append(serial)
+        if len(serials) > JSON_MAX_SERIALS:
+            players[player_key]["serials"] = serials[-JSON_MAX_SERIALS:]
+        self.dirty = True
+        return True
+
+    def names_for_key(self, player_key: str) -> list:
+        """Every name a player has posted under, first seen first."""
+        data = self.data["players"].get(player_key)
+        if data is None:
+            return []
+        if "names" not in data:
+            # Trackers from before the name index only kept the first name
+            data["names"] = [data["name"]] if data.get("name", ANONYMOUS) != ANONYMOUS else []
+        return data["names"]
+
+    def _name_index(self) -> dict:
+        """{lowercased name: [player_key, ...]}, built on first use."""
+        if self._keys_by_name is None:
+            self._keys_by_name = {}
+            for key in self.data["players"]:
+                for name in self.names_for_key(key):
+                    self._keys_by_name.setdefault(name.lower(), []).append(key)
+        return self._keys_by_name
+
+    def keys_for_name(self, name: str) -> list:
+        """Every player key that has posted under name (case-insensitive)."""
+        return list(self._name_index().get(name.lower(), []))
+
+    def note_name(self, player_key: str, name: str):
+        """Record that player_key has posted under name."""
+        if name == ANONYMOUS:
+            return
+        index = self._name_index()
+        players = self.data["players"]
+        if player_key not in players:
+            players[player_key] = {"name": name, "names": [], "serials": []}
+        data = players[player_key]
+        names = self.names_for_key(player_key)
+        if any(n.lower() == name.lower() for n in names):
+            return
+        names.append(name)
+        if data["name"] == ANONYMOUS:
+            data["name"] = name
+        index.setdefault(name.lower(), []).append(player_key)
+        self.dirty = True
+
+    def find_players(self, name: str) -> list:
+        """History of every player key that has posted under name, most rolls first."""
+        found = []
+        for key in self.keys_for_name(name):
+            data = self.data["players"][key]
+            serials = self.serial_set(key)
+            found.append({
+                "playerKey": key,
+                "name": data["name"],
+                "names": list(self.names_for_key(key)),
+                "serialCount": len(serials),
+                "serials": data["serials"],
+                "runs": serials.runs(),
+                "missing": serials.total_missing()
+            })
+        found.sort(key=lambda p: -p["serialCount"])
+        return found
+
+    def aliases(self) -> dict:
+        """{"keys": {key: names} with 2+ names, "names": {name: keys} with 2+ keys}."""
+        keys = {}
+        for key in self.data["players"]:
+            names = self.names_for_key(key)
+            if len(names) > 1:
+                keys[key] = list(names)
+        names = {}
+        for lowered, key_list in self._name_index().items():
+            if len(key_list) > 1:
+                name = next(n for n in self.names_for_key(key_list[0]) if n.lower() == lowered)
+                names[name] = list(key_list)
+        return {"keys": keys, "names": names}
+
+    def players(self) -> dict:
+        """{player_key: {"name", "names", "serials", "runs"}} for every tracked player."""
+        return {
+            key: dict(data, runs=self.serial_set(key).runs())
+            for key, data in self.data["players"].items()
+        }
+
+    def get_stats(self, player_key: str) -> dict:
+        """{die: stats dict} for a player."""
+        return self.data["players"].get(player_key, {}).get("stats", {})
+
+    def put_stats(self, player_key: str, die: str, stats: dict):
+        player = self.data["players"].setdefault(player_key, {"name": ANONYMOUS, "names": [], "serials": []})
+        player.setdefault("stats", {})[die] = stats
+        self.dirty = True
+
+    def all_stats(self) -> dict:
+        """{player_key: {die: stats dict}} for every player with statistics."""
+        return {key: data["stats"] for key, data in self.data["players"].items() if data.get("stats")}
+
+    def clear_stats(self):
+        for data in self.data["players"].values():
+            data.pop("stats", None)
+        self.dirty = True
+
+    def get_checkpoint(self, thread: str) -> dict:
+        return self.data.get("checkpoints", {}).get(thread)
+
+    def set_checkpoint(self, thread: str, checkpoint: dict):
+        """Save how far a thread has been read (committed with the serials)."""
+        self.data.setdefault("checkpoints", {})[thread] = checkpoint
+        self.dirty = True
+
+    def clear(self):
+        self.data = {"players": {}}
+        self._sets = {}
+        self._keys_by_name = None
+        self.dirty = True
+
+
+class SQLiteTracker:
+    """Serial tracker in a SQLite database (WAL mode, one row per roll)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode; transaction() issues BEGIN IMMEDIATE itself so the
+        # read of the previous serial and the insert are one atomic step
+        with _timed_io("sqlite", "open"):
+            self.db = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.executescript(SCHEMA)
+        self._depth = 0
+        if self.db.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            self._migrate()
+
+    def _migrate(self):
+        """Index the names of players recorded before player_names existed."""
+        with self.transaction():
+            self.db.execute("DROP INDEX IF EXISTS players_name")
+            self.db.execute(
+                "INSERT OR IGNORE INTO player_names (player_key, name, first_seen)"
+                " SELECT player_key, name, ? FROM players WHERE name != ?",
+                (time.time(), ANONYMOUS)
+            )
+            self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    @contextmanager
+    def transaction(self):
+        if self._depth:
+            self._depth += 1
+            try:
+                yield self
+            finally:
+                self._depth -= 1
+            return
+
+        # "begin" includes waiting for another process's write lock
+        with _timed_io("sqlite", "begin"):
+            self.db.execute("BEGIN IMMEDIATE")
+        self._depth = 1
+        try:
+            yield self
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        else:
+            with _timed_io("sqlite", "commit"):
+                self.db.execute("COMMIT")
+        finally:
+            self._depth = 0
+
+    def commit(self):
+        pass  # every change is committed by its transaction()
+
+    def close(self):
+        self.db.close()
+
+    def last_serial(self, player_key: str):
+        row = self.db.execute(
+            "SELECT serial FROM rolls WHERE player_key = ? ORDER BY id DESC LIMIT 1", (player_key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def serial_set(self, player_key: str) -> SQLiteSerialSet:
+        """Every serial seen for a player, queried through the serial index."""
+        return SQLiteSerialSet(self.db, player_key)
+
+    def has_serial(self, player_key: str, serial: int) -> bool:
+        return serial in self.serial_set(player_key)
+
+    def recent_serials(self, player_key: str, limit: int = 10) -> list:
+        rows = self.db.execute(
+            "SELECT serial FROM rolls WHERE player_key = ? ORDER BY id DESC LIMIT ?", (player_key, limit)
+        ).fetchall()
+        return [row[0] for row in reversed(rows)]
+
+    def add_serial(self, player_key: str, name: str, serial: int, roll: list = None,
+                   completion_time: str = None) -> bool:
+        """Record a serial; returns False if it was already recorded."""
+        with self.transaction():
+            self.note_name(player_key, name)
+            cursor = self.db.execute(
+                "INSERT OR IGNORE INTO rolls (player_key, serial, completion_time, roll, recorded_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (player_key, serial, completion_time,
+                 json.dumps(roll) if roll is not None else None, time.time())
+            )
+            return cursor.rowcount == 1
+
+    def names_for_key(self, player_key: str) -> list:
+        """Every name a player has posted under, first seen first."""
+        rows = self.db.execute(
+            "SELECT name FROM player_names WHERE player_key = ? ORDER BY first_seen, rowid", (player_key,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def keys_for_name(self, name: str) -> list:
+        """Every player key that has posted under name (case-insensitive)."""
+        rows = self.db.execute("SELECT player_key FROM player_names WHERE name = ?", (name,)).fetchall()
+        return [row[0] for row in rows]
+
+    def note_name(self, player_key: str, name: str):
+        """Record that player_key has posted under name."""
+        with self.transaction():
+            self.db.execute(
+                "INSERT OR IGNORE INTO players (player_key, name) VALUES (?, ?)", (player_key, name)
+            )
+            if name == ANONYMOUS:
+                return
+            cursor = self.db.execute(
+                "INSERT OR IGNORE INTO player_names (player_key, name, first_seen) VALUES (?, ?, ?)",
+                (player_key, name, time.time())
+            )
+            if cursor.rowcount == 1:
+                self.db.execute(
+                    "UPDATE players SET name = ? WHERE player_key = ? AND name = ?",
+                    (name, player_key, ANONYMOUS)
+                )
+
+    def find_players(self, name: str) -> list:
+        """History of every player key that has posted under name, most rolls first."""
+        found = []
+        for key in self.keys_for_name(name):
+            serials = self.serial_set(key)
+            found.append({
+                "playerKey": key,
+                "name": self.db.execute("SELECT name FROM players WHERE player_key = ?", (key,)).fetchone()[0],
+                "names": self.names_for_key(key),
+                "serialCount": len(serials),
+                "serials": self.recent_serials(key, HISTORY_LIMIT),
+                "runs": serials.runs(),
+                "missing": serials.total_missing()
+            })
+        found.sort(key=lambda p: -p["serialCount"])
+        return found
+
+    def aliases(self) -> dict:
+        """{"keys": {key: names} with 2+ names, "names": {name: keys} with 2+ keys}."""
+        keys = {
+            row[0]: self.names_for_key(row[0]) for row in self.db.execute(
+                "SELECT player_key FROM player_names GROUP BY player_key HAVING COUNT(*) > 1"
+            ).fetchall()
+        }
+        names = {
+            row[0]: self.keys_for_name(row[0]) for row in self.db.execute(
+                "SELECT name FROM player_names GROUP BY name HAVING COUNT(*) > 1"
+            ).fetchall()
+        }
+        return {"keys": keys, "names": names}
+
+    def players(self) -> dict:
+        """{player_key: {"name", "names", "serials", "runs"}} for every tracked player (last 50 serials)."""
+        return {
+            key: {
+                "name": name,
+                "names": self.names_for_key(key),
+                "serials": self.recent_serials(key, HISTORY_LIMIT),
+                "runs": self.serial_set(key).runs()
+            }
+            for key, name in self.db.execute("SELECT player_key, name FROM players").fetchall()
+        }
+
+    def get_stats(self, player_key: str) -> dict:
+        """{die: stats dict} for a player."""
+        rows = self.db.execute("SELECT die, stats FROM die_stats WHERE player_key = ?", (player_key,))
+        return {die: json.loads(stats) for die, stats in rows.fetchall()}
+
+    def put_stats(self, player_key: str, die: str, stats: dict):
+        with self.transaction():
+            self.db.execute(
+                "INSERT OR REPLACE INTO die_stats (player_key, die, stats) VALUES (?, ?, ?)",
+                (player_key, die, json.dumps(stats))
+            )
+
+    def all_stats(self) -> dict:
+        """{player_key: {die: stats dict}} for every player with statistics."""
+        result = {}
+        for key, die, stats in self.db.execute("SELECT player_key, die, stats FROM die_stats").fetchall():
+            result.setdefault(key, {})[die] = json.loads(stats)
+        return result
+
+    def clear_stats(self):
+        with self.transaction():
+            self.db.execute("DELETE FROM die_stats")
+
+    def get_checkpoint(self, thread: str) -> dict:
+        row = self.db.execute("SELECT checkpoint FROM checkpoints WHERE thread = ?", (thread,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_checkpoint(self, thread: str, checkpoint: dict):
+        """Save how far a thread has been read (committed with the serials)."""
+        with self.transaction():
+            self.db.execute(
+                "INSERT OR REPLACE INTO checkpoints (thread, checkpoint, updated_at) VALUES (?, ?, ?)",
+                (thread, json.dumps(checkpoint), time.time())
+            )
+
+    def clear(self):
+        with self.transaction():
+            self.db.execute("DELETE FROM checkpoints")
+            self.db.execute("DELETE FROM die_stats")
+            self.db.execute("DELETE FROM rolls")
+            self.db.execute("DELETE FROM player_names")
+            self.db.execute("DELETE FROM players")
+
+
+def open_tracker(path: str, autocommit: bool = True):
+    """
+    Open the tracker at path with the backend its file extension selects.
+    autocommit=False keeps a JSON tracker's changes in memory until
+    commit(); SQLite commits every transaction either way.
+    """
+    if Path(path).suffix.lower() in SQLITE_SUFFIXES:
+        return SQLiteTracker(path)
+    return JSONTracker(path, autocommit=autocommit)
+
+
+def import_players(store, players: dict) -> int:
+    """
+    Copy {player_key: {"name", "names", "serials", "runs", "stats"}} into
+    store, in one transaction.
+
+    Every serial in "runs" (full history) is copied, then any in "serials"
+    (the recent list, all that older JSON trackers kept) that the runs
+    don't cover, then every name in "names" and the dice statistics in
+    "stats" (replacing the store's for the same player and die). Returns
+    the number of serials copied.
+    """
+    copied = 0
+    with store.transaction():
+        for player_key, data in players.items():
+            name = data.get("name", ANONYMOUS)
+            for start, end in data.get("runs", []):
+                for serial in range(start, end + 1):
+                    copied += store.add_serial(player_key, name, serial)
+            for serial in data.get("serials", []):
+                copied += store.add_serial(player_key, name, serial)
+            for other in data.get("names", []):
+                store.note_name(player_key, other)
+            for die, stats in data.get("stats", {}).items():
+                store.put_stats(player_key, die, stats)
+    return copied
+
+
+def import_tracker_data(store, data: dict) -> dict:
+    """
+    Copy a whole JSON tracker's data (load_json()) into store, in one
+    transaction: its players (see import_players) and its thread
+    checkpoints. Returns {"serials", "players", "stats", "checkpoints"}
+    counts.
+    """
+    players = data.get("players", {})
+    checkpoints = data.get("checkpoints", {})
+    with store.transaction():
+        copied = import_players(store, players)
+        for thread, checkpoint in checkpoints.items():
+            store.set_checkpoint(thread, checkpoint)
+    return {
+        "serials": copied,
+        "players": len(players),
+        "stats": sum(len(p.get("stats", {})) for p in players.values()),
+        "checkpoints": len(checkpoints)
+    }
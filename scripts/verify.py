@@ -3,53 +3,56 @@
 verify.py - Verify a random.org signed dice roll
 
 Usage:
-    python verify.py <random_json_file> <signature_file>
-    python verify.py --inline '<random_json>' '<signature>'
-    python verify.py --json '<full_verification_json>'
+    python verify.py [--offline|--online] <random_json_file> <signature_file>
+    python verify.py [--offline|--online] --inline '<random_json>' '<signature>'
+    python verify.py [--offline|--online] --json '<full_verification_json>'
+    python verify.py --profile [--profile-out FILE] ...
 
 Examples:
     python verify.py random.json signature.txt
     python verify.py --inline '{"method":"generateSignedIntegers",...}' 'abc123...'
     python verify.py --json '{"random":{...},"signature":"..."}'
 
-This script calls random.org's verifySignature API to confirm
-that a dice roll is authentic and untampered.
+This script checks random.org's RSA signature to confirm that a dice
+roll is authentic and untampered. By default the check runs offline
+against random.org's certificate (fetched once and cached), falling back
+to the verifySignature API; --offline never calls the API, --online
+always does.
+The random object is checked, and sent to the API, as the exact text
+given rather than a re-encoding of it (see blob.py).
+
+--profile prints a per-phase timing breakdown to stderr as one JSON line
+when the script exits (arg_parse, signature with cert_load,
+verdict_cache and signature_offline/online, the HTTP stages of any API
+call, output; see profiling.py). --profile-out FILE also writes cProfile
+stats to FILE.
+
+Environment:
+    RANDOM_ORG_API_URL - Override the API endpoint (e.g. tools/standin.py)
+    RANDOM_ORG_VERIFY, RANDOM_ORG_CERT, RANDOM_ORG_VERIFY_CACHE_SIZE
+                       - Default mode, pinned certificate and verdict cache
+                         size (see signature.py)
 """
 
 import sys
 import json
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError, URLError
 
-API_URL = "https://api.random.org/json-rpc/4/invoke"
+import profiling
+from blob import RandomObject, loads as load_blob
+from profiling import phase
+from randomorg import describe_dice, flatten_data, get_client, report_timings
+from signature import get_verifier
 
 
-def verify_signature(random_obj: dict, signature: str) -> dict:
-    """Verify a signature using random.org API."""
-    
-    payload = {
-        "jsonrpc": "2.0",
-        "method": "verifySignature",
-        "params": {
-            "random": random_obj,
-            "signature": signature
-        },
-        "id": 1
-    }
-    
-    req = Request(
-        API_URL,
-        data=json.dumps(payload).encode("utf-8"),
-        headers={"Content-Type": "application/json"}
-    )
+def verify_signature(random_obj: dict, signature: str, mode: str = None) -> dict:
+    """Verify a signature offline against random.org's certificate, or via the API."""
     
-    try:
-        with urlopen(req, timeout=30) as response:
-            return json.loads(response.read().decode("utf-8"))
-    except HTTPError as e:
-        raise RuntimeError(f"HTTP error {e.code}: {e.reason}")
-    except URLError as e:
-        raise RuntimeError(f"Connection error: {e.reason}")
+    client = get_client()
+    with phase("signature"):
+        verdict = get_verifier(client).verify(random_obj, signature, mode)
+    if verdict["method"] == "online":
+        report_timings(client)
+    return {"result": verdict}
 
 
 def print_result(response: dict, random_obj: dict):
@@ -58,7 +61,8 @@ def print_result(response: dict, random_obj: dict):
     if "error" in response:
         print("❌ VERIFICATION FAILED")
         print()
-        print(f"Error: {response['error'].get('message', response['error'])}")
+        error = response["error"]
+        print(f"Error: {error.get('message', error) if isinstance(error, dict) else error}")
         return False
     
     authentic = response.get("result", {}).get("authenticity", False)
@@ -78,14 +82,15 @@ def print_result(response: dict, random_obj: dict):
         
         # Extract and display roll details
         data = random_obj.get("data", [])
-        n = random_obj.get("n", len(data))
-        max_val = random_obj.get("max", "?")
+        values = flatten_data(data)
         user_data = random_obj.get("userData", {})
         
         print("Roll details:")
-        print(f"  Dice:      {n}d{max_val}")
+        print(f"  Dice:      {describe_dice(random_obj)}")
+        if user_data and "notation" in user_data:
+            print(f"  Notation:  {user_data['notation']}")
         print(f"  Results:   {data}")
-        print(f"  Total:     {sum(data) if data else 'N/A'}")
+        print(f"  Total:     {sum(values) if values else 'N/A'}")
         
         if user_data:
             if "character" in user_data:
@@ -95,6 +100,11 @@ def print_result(response: dict, random_obj: dict):
         
         print(f"  Timestamp: {random_obj.get('completionTime', 'N/A')}")
         print(f"  Serial:    {random_obj.get('serialNumber', 'N/A')}")
+        verdict = response["result"]
+        checked = verdict.get("method", "online")
+        if verdict.get("cached"):
+            checked += f" (cached; verified {verdict['seen']} time(s) before)"
+        print(f"  Checked:   {checked}")
         
         return True
     else:
@@ -112,7 +122,14 @@ def print_result(response: dict, random_obj: dict):
         return False
 
 
-def main():
+def parse_args() -> tuple:
+    """(random_obj, signature, mode) from sys.argv; prints usage and exits if invalid."""
+    mode = None
+    for flag in ("--offline", "--online"):
+        if flag in sys.argv:
+            sys.argv.remove(flag)
+            mode = flag[2:]
+    
     if len(sys.argv) < 2:
         print(__doc__)
         sys.exit(1)
@@ -126,9 +143,9 @@ def main():
             print("Error: --inline requires <random_json> <signature>", file=sys.stderr)
             sys.exit(1)
         try:
-            random_obj = json.loads(sys.argv[2])
+            random_obj = RandomObject.from_text(sys.argv[2])
             signature = sys.argv[3]
-        except json.JSONDecodeError as e:
+        except ValueError as e:
             print(f"Error parsing random JSON: {e}", file=sys.stderr)
             sys.exit(1)
     
@@ -137,7 +154,7 @@ def main():
             print("Error: --json requires <verification_json>", file=sys.stderr)
             sys.exit(1)
         try:
-            data = json.loads(sys.argv[2])
+            data = load_blob(sys.argv[2])
             random_obj = data["random"]
             signature = data["signature"]
         except (json.JSONDecodeError, KeyError) as e:
@@ -150,20 +167,42 @@ def main():
             print("Error: requires <random_file> <signature_file>", file=sys.stderr)
             sys.exit(1)
         try:
-            with open(sys.argv[1]) as f:
-                random_obj = json.load(f)
+            with open(sys.argv[1], encoding="utf-8") as f:
+                random_obj = RandomObject.from_text(f.read())
             with open(sys.argv[2]) as f:
                 signature = f.read().strip()
         except FileNotFoundError as e:
             print(f"Error: {e}", file=sys.stderr)
             sys.exit(1)
-        except json.JSONDecodeError as e:
+        except ValueError as e:
             print(f"Error parsing random JSON file: {e}", file=sys.stderr)
             sys.exit(1)
     
+    return random_obj, signature, mode
+
+
+def main():
+    profile = "--profile" in sys.argv
+    if profile:
+        sys.argv.remove("--profile")
+    profile_out = None
+    if "--profile-out" in sys.argv:
+        i = sys.argv.index("--profile-out")
+        if i + 1 >= len(sys.argv):
+            print("Error: --profile-out requires <file>", file=sys.stderr)
+            sys.exit(1)
+        profile_out = sys.argv[i + 1]
+        del sys.argv[i:i + 2]
+    if profile or profile_out:
+        profiling.start("verify.py", profile_out)
+    
+    with phase("arg_parse"):
+        random_obj, signature, mode = parse_args()
+    
     try:
-        response = verify_signature(random_obj, signature)
-        success = print_result(response, random_obj)
+        response = verify_signature(random_obj, signature, mode)
+        with phase("output"):
+            success = print_result(response, random_obj)
         sys.exit(0 if success else 1)
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
@@ -12,9 +12,14 @@
 # This script calls random.org's verifySignature API to confirm
 # that a dice roll is authentic and untampered.
 #
+# Environment:
+#   RANDOM_ORG_API_URL - Override the API endpoint (e.g. tools/standin.py)
+#
 
 set -e
 
+API_URL="${RANDOM_ORG_API_URL:-https://api.random.org/json-rpc/4/invoke}"
+
 # Parse arguments
 if [ "$1" == "--inline" ]; then
     RANDOM_OBJ="$2"
@@ -44,7 +49,7 @@ PAYLOAD=$(jq -n \
     }')
 
 # Make the API call
-RESPONSE=$(curl -s -X POST https://api.random.org/json-rpc/4/invoke \
+RESPONSE=$(curl -s -X POST "$API_URL" \
     -H "Content-Type: application/json" \
     -d "$PAYLOAD")
 
@@ -0,0 +1,123 @@
+"""
+Thread export scanning: JSON exports are read one post at a time, and a
+re-scan resumes at the last post an earlier scan saw.
+
+Run from the repository root:
+    python -m unittest discover tests
+"""
+
+import io
+import os
+import sys
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import ingest  # noqa: E402
+
+EXPORT = ('{"thread": {"title": "Caves of Chaos — session 3"}, "posts": [\n'
+          '  {"id": "p1", "author": "Kira", "body": "Rolling for initiative"},\n'
+          '  {"id": "p2", "author": {"name": "Theron"}, "body": "Me too"}\n'
+          '], "meta": {"exported": 1}}\n')
+
+
+class IterJSONValuesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.read_size = ingest.READ_SIZE
+        ingest.READ_SIZE = 7  # values straddle many reads
+
+    def tearDown(self):
+        ingest.READ_SIZE = self.read_size
+
+    def test_posts_array_is_streamed(self):
+        values = list(ingest.iter_json_values(io.StringIO(EXPORT)))
+        self.assertEqual([v["id"] for _, v, _ in values], ["p1", "p2"])
+        raw = EXPORT.encode("utf-8")
+        for offset, value, within in values:
+            self.assertEqual(within, "posts")
+            self.assertTrue(raw[offset:].startswith(b'{"id": "' + value["id"].encode()))
+
+    def test_lines_and_arrays(self):
+        text = '[{"id": 1}, {"id": 2}]\n{"id": 3}\n{"posts": "not an array"}\n'
+        values = list(ingest.iter_json_values(io.StringIO(text)))
+        self.assertEqual([v for _, v, _ in values],
+                         [{"id": 1}, {"id": 2}, {"id": 3}, {"posts": "not an array"}])
+        self.assertEqual([w for _, _, w in values], [None] * 4)
+
+    def test_random_object_keeps_its_text(self):
+        text = '{"random": {"data": [4], "completionTime": 1.50}, "signature": "c2ln"}'
+        (_, value, _), = ingest.iter_json_values(io.StringIO(text))
+        self.assertEqual(value["random"].raw, b'{"data": [4], "completionTime": 1.50}')
+
+    def test_unclosed_posts_array(self):
+        with self.assertRaises(ValueError):
+            list(ingest.iter_json_values(io.StringIO('{"posts": [{"id": 1}')))
+
+
+def export_post(number: int) -> dict:
+    blob = {"random": {"serialNumber": number, "data": [number]}, "signature": f"sig{number}"}
+    return {"id": f"p{number}", "author": "Kira", "body": "Rolled:\n" + json.dumps(blob) + "\n"}
+
+
+class ResumeJSONExportTest(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".json")
+        os.close(handle)
+
+    def tearDown(self):
+        os.unlink(self.path)
+
+    def write(self, numbers: list, title: str = "Session 3"):
+        # The thread is re-exported whole, with new posts inside the array
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"thread": {"title": title}, "posts": [export_post(n) for n in numbers],
+                       "meta": {"exported": len(numbers)}}, f, indent=1)
+
+    def scan(self, checkpoint: dict = None) -> tuple:
+        scan = ingest.SourceScan(self.path, checkpoint)
+        posts = list(scan)
+        return scan, posts, scan.checkpoint()
+
+    def serials(self, posts: list) -> list:
+        return [blob["random"]["serialNumber"] for post in posts for blob in post["blobs"]]
+
+    def test_checkpoint_is_the_last_post(self):
+        self.write([1, 2, 3])
+        _, posts, checkpoint = self.scan()
+        self.assertEqual(len({post["offset"] for post in posts}), 3)
+        self.assertEqual(checkpoint["offset"], posts[-1]["offset"])
+        self.assertEqual(checkpoint["post"], 2)
+        self.assertEqual(checkpoint["within"], "posts")
+        self.assertEqual(checkpoint["seen"], [blob["hash"] for blob in posts[-1]["blobs"]])
+
+    def test_resume_reads_only_new_posts(self):
+        self.write([1, 2])
+        _, _, checkpoint = self.scan()
+        self.write([1, 2, 3, 4])
+        scan, posts, resumed = self.scan(checkpoint)
+        self.assertTrue(scan.resumed)
+        self.assertEqual([post["id"] for post in posts], ["p2", "p3", "p4"])
+        self.assertEqual([post["post"] for post in posts], [1, 2, 3])
+        self.assertEqual(self.serials(posts), [3, 4])
+        self.assertEqual(len(resumed["seen"]), 1)
+
+        # Nothing new: the last post is read again and nothing is reported
+        _, posts, _ = self.scan(resumed)
+        self.assertEqual(self.serials(posts), [])
+
+    def test_edited_export_is_rescanned(self):
+        self.write([1, 2])
+        _, _, checkpoint = self.scan()
+        self.write([1, 2, 3], title="Session 3 (edited)")
+        scan, posts, _ = self.scan(checkpoint)
+        self.assertFalse(scan.resumed)
+        self.assertEqual(self.serials(posts), [1, 2, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
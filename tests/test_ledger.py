@@ -0,0 +1,72 @@
+"""
+Quota ledger: a forecast reads only the end of the ledger, not all of it.
+
+Run from the repository root:
+    python -m unittest discover tests
+"""
+
+import sys
+import json
+import random
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import ledger  # noqa: E402
+
+NOW = 1792310775.0
+
+
+class EntriesSinceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.read_block = ledger.READ_BLOCK
+        ledger.READ_BLOCK = 256  # a few lines per block
+        self.dir = tempfile.TemporaryDirectory()
+        self.ledger = ledger.Ledger(self.dir.name)
+
+    def tearDown(self):
+        ledger.READ_BLOCK = self.read_block
+        self.dir.cleanup()
+
+    def write(self, times: list):
+        with open(self.ledger.path, "w", encoding="utf-8") as f:
+            for i, t in enumerate(times):
+                if i % 50 == 7:
+                    f.write("not an entry\n")
+                f.write(json.dumps([t, "k1", 5, 1000, 10, "Kira", "Attack roll"]) + "\n")
+
+    def all_since(self, since: float) -> list:
+        return [e for e in self.ledger.entries() if e["t"] >= since]
+
+    def test_matches_a_full_read(self):
+        rng = random.Random(1)
+        # Two days of rolls, appended a few seconds out of order now and then
+        times = sorted(NOW - rng.uniform(0, 2 * 86400) for _ in range(2000))
+        times = [t - rng.uniform(0, 30) if rng.random() < 0.1 else t for t in times]
+        self.write(times)
+        for since in (ledger.day_start(NOW), NOW - 3600, NOW - 3 * 86400, NOW + 1):
+            self.assertEqual(self.ledger.entries(since=since), self.all_since(since))
+
+    def test_short_and_missing_ledger(self):
+        self.assertEqual(self.ledger.entries(since=0), [])
+        self.write([NOW - 10, NOW - 5])
+        self.assertEqual(len(self.ledger.entries(since=NOW - 7)), 1)
+
+    def test_forecast_reads_from_the_end(self):
+        self.write([NOW - 86400 * 30 + i * 60 for i in range(2000)] + [NOW - 120, NOW - 60])
+        reads = []
+        start_offset = ledger.start_offset
+        ledger.start_offset = lambda f, since: reads.append(start_offset(f, since)) or reads[-1]
+        try:
+            result = self.ledger.forecast("k1", now=NOW)
+        finally:
+            ledger.start_offset = start_offset
+        self.assertEqual(result["today"]["rolls"], 2)
+        self.assertGreater(reads[0], self.ledger.path.stat().st_size - 2 * ledger.READ_BLOCK)
+
+
+if __name__ == "__main__":
+    unittest.main()
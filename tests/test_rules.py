@@ -0,0 +1,54 @@
+"""
+Suspicion rule metrics: keep/drop notation is read the way roll.py rolls it.
+
+Run from the repository root:
+    python -m unittest discover tests
+"""
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from rules import group_metrics  # noqa: E402
+
+
+def random_object(notation: str, data: list, low: int = 1, high: int = 20) -> dict:
+    return {"data": data, "min": low, "max": high, "userData": {"notation": notation}}
+
+
+class GroupMetricsTest(unittest.TestCase):
+
+    def test_drop_shorthand(self):
+        # 4d6d1: drop the lowest die, as dice.py reads it
+        group, = group_metrics(random_object("4d6d1", [1, 6, 6, 6], high=6))
+        self.assertEqual(group["lowest"], 6)
+        self.assertEqual(group["total"], 18)
+        self.assertEqual(group["n"], 4)
+
+    def test_keep_shorthand(self):
+        # 2d20k1: keep the highest die
+        group, = group_metrics(random_object("2d20k1", [2, 20]))
+        self.assertEqual(group["lowest"], 20)
+        self.assertEqual(group["total"], 20)
+        self.assertEqual(group["maxed"], 1)
+
+    def test_keep_lowest(self):
+        group, = group_metrics(random_object("2d20kl1", [19, 3]))
+        self.assertEqual(group["highest"], 3)
+
+    def test_groups_with_modifier(self):
+        groups = group_metrics({"data": [[4, 17], [2, 5]], "min": [1, 1], "max": [20, 6],
+                                "userData": {"notation": "2d20kh1+2d6+3"}})
+        self.assertEqual([g["total"] for g in groups], [17, 7])
+
+    def test_notation_not_matching_data_counts_every_die(self):
+        group, = group_metrics(random_object("1d20+1d6", [2, 20]))
+        self.assertEqual(group["total"], 22)
+        group, = group_metrics(random_object("not dice", [2, 20]))
+        self.assertEqual(group["total"], 22)
+
+
+if __name__ == "__main__":
+    unittest.main()
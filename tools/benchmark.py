@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+benchmark.py - End-to-end benchmarks for the roll, verify and tracker paths
+
+Usage:
+    python tools/benchmark.py [--quick] [--output bench-results.json]
+    python tools/benchmark.py --compare old.json --output new.json
+
+Runs entirely offline against an in-process random.org stand-in
+(tools/standin.py) and reports p50/p95/p99 latency and throughput for:
+
+    roll_dice          roll.py's signed roll, per player count and concurrency
+    verify_signature   dm-verify.py's signature check (online, offline, cache hit), per concurrency
+    verify_batch       online checks sent as JSON-RPC batches, per batch size (1 = no batching)
+    verify_roll        full DM verification incl. tracker load/save, per backend and tracker size
+    analyze_serial     serial analysis on an open tracker, per backend and tracker size
+    tracker_io         open tracker + record one roll + close, per backend and tracker size
+    cycle              roll -> format post -> dm-verify, per player count
+
+Results are written as JSON so runs can be compared between releases;
+--compare exits with status 1 if any benchmark's p50 or p95 regressed by
+more than --threshold (default 20%).
+
+Options:
+    --quick            Smaller sizes and fewer iterations
+    --output PATH      Where to write results (default: bench-results.json)
+    --compare PATH     Previous results to compare against
+    --threshold FRAC   Regression threshold for --compare (default: 0.2)
+    --latency MS       Latency the stand-in adds per request (default: 0)
+    --key-file PATH    Reuse a stand-in RSA key (skips key generation)
+    --only NAME        Run only the named benchmark (repeatable)
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import importlib.util
+from pathlib import Path
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+sys.path.insert(0, str(ROOT / "tools"))
+
+import standin  # noqa: E402
+import tracker as tracker_store  # noqa: E402
+
+BACKENDS = {"json": ".json", "sqlite": ".db"}
+BENCHMARKS = ["roll_dice", "verify_signature", "verify_batch", "verify_roll", "analyze_serial", "tracker_io", "cycle"]
+
+FULL = {
+    "players": [1, 10, 50],
+    "concurrency": [1, 4, 16],
+    "batch_sizes": [1, 10, 50],
+    "tracker_sizes": [0, 100, 1000, 5000],
+    "iterations": 200,
+}
+QUICK = {
+    "players": [1, 10],
+    "concurrency": [1, 4],
+    "batch_sizes": [1, 10],
+    "tracker_sizes": [0, 100, 1000],
+    "iterations": 40,
+}
+
+
+def load_script(name: str, filename: str):
+    """Import a script by path (dm-verify.py has a hyphen in its name)."""
+    spec = importlib.util.spec_from_file_location(name, str(ROOT / "scripts" / filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(name: str, params: dict, latencies: list, wall: float) -> dict:
+    values = sorted(latencies)
+    return {
+        "name": name,
+        "params": params,
+        "n": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "throughput_per_s": round(len(values) / wall, 1) if wall > 0 else 0.0,
+    }
+
+
+def timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def run_concurrent(fn, jobs: list, concurrency: int) -> tuple:
+    """Run fn(*job) for every job on `concurrency` threads; returns (latencies, wall)."""
+    start = time.perf_counter()
+    if concurrency == 1:
+        latencies = [timed(fn, *job) for job in jobs]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(lambda job: timed(fn, *job), jobs))
+    return latencies, time.perf_counter() - start
+
+
+def make_tracker(players: int, serials_per_player: int = 50) -> dict:
+    """A synthetic tracker shaped like dm-verify.py's serial-tracker.json."""
+    tracker = {"players": {}}
+    for i in range(players):
+        start = i * 1000
+        tracker["players"][f"{i:016x}"] = {
+            "name": f"Player{i}",
+            "serials": list(range(start, start + serials_per_player))
+        }
+    return tracker
+
+
+def seed_tracker(path: str, players: int):
+    """Write a synthetic tracker to path (JSON or SQLite by extension)."""
+    if os.path.exists(path):
+        os.unlink(path)
+    store = tracker_store.open_tracker(path)
+    try:
+        tracker_store.import_players(store, make_tracker(players)["players"])
+    finally:
+        store.close()
+
+
+class Bench:
+    def __init__(self, args, sizes: dict, workdir: Path):
+        self.args = args
+        self.sizes = sizes
+        self.workdir = workdir
+        self.results = []
+
+        key = standin.load_or_create_key(args.key_file)
+        self.server = standin.serve_in_thread(
+            key, daily_bits=10 ** 12, daily_requests=10 ** 9, latency=args.latency
+        )
+        os.environ["RANDOM_ORG_API_URL"] = self.server.url
+        os.environ["RANDOM_ORG_STATE_DIR"] = str(workdir / "state")
+
+        self.roll = load_script("roll", "roll.py")
+        self.dm = load_script("dm_verify", "dm-verify.py")
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def record(self, name: str, params: dict, latencies: list, wall: float):
+        result = summarize(name, params, latencies, wall)
+        self.results.append(result)
+        shown = " ".join(f"{k}={v}" for k, v in params.items())
+        print(
+            f"{name:<17} {shown:<28} p50={result['p50_ms']:>9.3f}ms p95={result['p95_ms']:>9.3f}ms "
+            f"p99={result['p99_ms']:>9.3f}ms  {result['throughput_per_s']:>8.1f}/s",
+            file=sys.stderr
+        )
+
+    def blobs(self, count: int, players: int = 1) -> list:
+        """Signed blobs from the stand-in, for the verification benchmarks."""
+        blobs = []
+        for i in range(count):
+            os.environ["RANDOM_ORG_API_KEY"] = f"bench-player-{i % players}"
+            result = self.roll.roll_dice(1, 20, f"Player{i % players}", "Benchmark")["result"]
+            blobs.append((result["random"], result["signature"], f"Player{i % players}"))
+        return blobs
+
+    def bench_roll_dice(self):
+        iterations = self.sizes["iterations"]
+        for players in self.sizes["players"]:
+            for concurrency in self.sizes["concurrency"]:
+                jobs = [(1, 20, f"Player{i % players}", "Benchmark", f"bench-player-{i % players}")
+                        for i in range(iterations)]
+
+                def roll_one(count, sides, character, purpose, api_key):
+                    expression = self.roll.parse_expression(f"{count}d{sides}")
+                    response = self.roll.roll_expression(expression, character, purpose, api_key)
+                    if "error" in response:
+                        raise RuntimeError(response["error"])
+
+                latencies, wall = run_concurrent(roll_one, jobs, concurrency)
+                self.record("roll_dice", {"players": players, "concurrency": concurrency}, latencies, wall)
+
+    def bench_verify_signature(self):
+        blobs = self.blobs(self.sizes["iterations"])
+        for mode in ("online", "offline", "cached"):
+            if mode == "cached":
+                for random_obj, signature, _ in blobs:
+                    self.dm.verify_signature(random_obj, signature)  # warm the verdict cache
+                jobs = [(random_obj, signature) for random_obj, signature, _ in blobs]
+            else:
+                jobs = [(random_obj, signature, mode, False) for random_obj, signature, _ in blobs]
+            for concurrency in self.sizes["concurrency"]:
+                latencies, wall = run_concurrent(self.dm.verify_signature, jobs, concurrency)
+                self.record("verify_signature", {"mode": mode, "concurrency": concurrency}, latencies, wall)
+
+    def bench_verify_batch(self):
+        pairs = [(random_obj, signature) for random_obj, signature, _ in self.blobs(self.sizes["iterations"])]
+        for size in self.sizes["batch_sizes"]:
+            os.environ["RANDOM_ORG_BATCH_SIZE"] = str(size)
+            latencies = []
+            start = time.perf_counter()
+            for i in range(0, len(pairs), size):
+                chunk = pairs[i:i + size]
+                elapsed = timed(self.dm.verify_signatures, chunk, "online", False)
+                latencies.extend([elapsed / len(chunk)] * len(chunk))  # per roll
+            self.record("verify_batch", {"batch_size": size}, latencies, time.perf_counter() - start)
+        os.environ.pop("RANDOM_ORG_BATCH_SIZE", None)
+
+    def bench_verify_roll(self):
+        iterations = max(10, self.sizes["iterations"] // 2)
+        for backend, suffix in BACKENDS.items():
+            for size in self.sizes["tracker_sizes"]:
+                tracker_path = str(self.workdir / f"verify-roll-{size}{suffix}")
+                seed_tracker(tracker_path, size)
+                blobs = self.blobs(iterations, players=4)
+                latencies, wall = run_concurrent(
+                    lambda r, s, p: self.dm.verify_roll(r, s, p, tracker_path), blobs, 1
+                )
+                self.record("verify_roll", {"backend": backend, "tracker_players": size}, latencies, wall)
+
+    def bench_analyze_serial(self):
+        iterations = self.sizes["iterations"] * 10
+        rng = random.Random(1)
+        for backend, suffix in BACKENDS.items():
+            for size in self.sizes["tracker_sizes"]:
+                tracker_path = str(self.workdir / f"analyze-{size}{suffix}")
+                seed_tracker(tracker_path, size)
+                tracker = self.dm.load_tracker(tracker_path)
+                keys = list(make_tracker(size)["players"]) or ["0" * 16]
+                jobs = []
+                for i in range(iterations):
+                    key = rng.choice(keys)
+                    jobs.append((tracker, "Player", key + "x" * 48, 10 ** 6 + i, [rng.randint(1, 20)]))
+                try:
+                    with tracker.transaction():
+                        latencies, wall = run_concurrent(self.dm.analyze_serial, jobs, 1)
+                finally:
+                    tracker.close()
+                self.record("analyze_serial", {"backend": backend, "tracker_players": size}, latencies, wall)
+
+    def bench_tracker_io(self):
+        iterations = max(10, self.sizes["iterations"] // 4)
+        for backend, suffix in BACKENDS.items():
+            for size in self.sizes["tracker_sizes"]:
+                tracker_path = str(self.workdir / f"tracker-io-{size}{suffix}")
+                seed_tracker(tracker_path, size)
+
+                def record_one(i):
+                    tracker = self.dm.load_tracker(tracker_path)
+                    try:
+                        with tracker.transaction():
+                            tracker.add_serial(f"{i % max(size, 1):016x}", "Player", 10 ** 6 + i)
+                    finally:
+                        tracker.close()
+
+                latencies, wall = run_concurrent(record_one, [(i,) for i in range(iterations)], 1)
+                self.record("tracker_io", {"backend": backend, "tracker_players": size}, latencies, wall)
+
+    def bench_cycle(self):
+        iterations = max(10, self.sizes["iterations"] // 2)
+        for players in self.sizes["players"]:
+            tracker_path = str(self.workdir / f"cycle-{players}.json")
+            seed_tracker(tracker_path, 0)
+            expression = self.roll.parse_expression("1d20")
+
+            def cycle(i):
+                character = f"Player{i % players}"
+                response = self.roll.roll_expression(expression, character, "Benchmark",
+                                                     f"bench-cycle-{i % players}")
+                self.roll.format_output(response, character, "Benchmark", expression, out=io.StringIO())
+                result = response["result"]
+                verdict = self.dm.verify_roll(result["random"], result["signature"], character, tracker_path)
+                if not verdict.get("verified"):
+                    raise RuntimeError(f"Cycle verification failed: {verdict}")
+
+            latencies, wall = run_concurrent(cycle, [(i,) for i in range(iterations)], 1)
+            self.record("cycle", {"players": players}, latencies, wall)
+
+
+def compare(previous: dict, current: dict, threshold: float) -> list:
+    """Benchmarks whose p50 or p95 got worse by more than threshold."""
+    def index(results):
+        return {(r["name"], json.dumps(r["params"], sort_keys=True)): r for r in results["results"]}
+
+    before = index(previous)
+    regressions = []
+    for key, now in index(current).items():
+        old = before.get(key)
+        if old is None:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if old[metric] > 0 and now[metric] > old[metric] * (1 + threshold):
+                regressions.append({
+                    "name": now["name"],
+                    "params": now["params"],
+                    "metric": metric,
+                    "before": old[metric],
+                    "after": now[metric],
+                    "change": round(now[metric] / old[metric] - 1, 3)
+                })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Roll/verify/tracker benchmarks against a local stand-in")
+    parser.add_argument("--quick", action="store_true", help="Smaller sizes and fewer iterations")
+    parser.add_argument("--output", default="bench-results.json", help="Where to write results")
+    parser.add_argument("--compare", help="Previous results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Regression threshold for --compare")
+    parser.add_argument("--latency", type=float, default=0.0, help="Stand-in latency per request (ms)")
+    parser.add_argument("--key-file", help="Reuse a stand-in RSA key")
+    parser.add_argument("--only", action="append", choices=BENCHMARKS, help="Run only this benchmark")
+    args = parser.parse_args()
+
+    sizes = QUICK if args.quick else FULL
+    with tempfile.TemporaryDirectory(prefix="agentic-dnd-bench-") as workdir:
+        bench = Bench(args, sizes, Path(workdir))
+        try:
+            for name in args.only or BENCHMARKS:
+                getattr(bench, f"bench_{name}")()
+        finally:
+            bench.close()
+
+    output = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": args.quick,
+            "latency_ms": args.latency,
+        },
+        "results": bench.results
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+    print(json.dumps({"message": f"Wrote {len(bench.results)} results to {args.output}"}), file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        regressions = compare(previous, output, args.threshold)
+        print(json.dumps({"regressions": regressions}, indent=2))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,606 @@
+#!/usr/bin/env python3
+"""
+standin.py - Local random.org stand-in for offline tests and benchmarks
+
+Usage:
+    python tools/standin.py [--port 8641] [--key-file standin-key.json]
+
+    # Point any script at it:
+    export RANDOM_ORG_API_URL=http://127.0.0.1:8641/json-rpc/4/invoke
+    export RANDOM_ORG_API_KEY=any-test-key
+    python scripts/roll.py 1d20+2d6 "Theron" "Attack"
+    python scripts/roll.py 1 20 "Theron" "Attack" | ... | python scripts/dm-verify.py
+
+Implements the parts of the JSON-RPC 4 Signed API the scripts use:
+    generateSignedIntegers, generateSignedIntegerSequences,
+    verifySignature, getResult
+and JSON-RPC 2.0 batch requests (an array of calls, answered by id).
+
+Results are signed for real (RSA PKCS#1 v1.5 with SHA-512) with a locally
+generated key, so tampering is detected exactly like against random.org.
+Serial numbers increase monotonically per API key, hashedApiKey is the
+base64 SHA-512 of the key, and bitsLeft/requestsLeft are charged per key.
+The signing certificate is served at /server.crt like the real API.
+
+Options:
+    --host, --port       Address to listen on (default: 127.0.0.1:8641)
+    --key-file           Load/save the RSA key here so signatures survive
+                         restarts (default: generate a fresh key each run)
+    --key-bits           RSA modulus size for new keys (default: 2048)
+    --cert-out           Also write the signing certificate (PEM) here
+    --bits, --requests   Daily quota per API key (default: 1000000, 1000)
+    --advisory-delay     advisoryDelay to return, in ms (default: 0; the
+                         real API usually asks for about 1000)
+    --latency, --jitter  Added server latency per request, in ms
+    --error-rate         Fraction of calls answered with JSON-RPC error -32603
+    --http-error-rate    Fraction of calls answered with HTTP 503
+    --no-batch           Refuse JSON-RPC batch requests with -32600, like a
+                         server without batch support (default: answer
+                         them, one response per call with an id)
+    --seed               Seed for dice values and injected faults
+"""
+
+import io
+import sys
+import json
+import math
+import time
+import base64
+import random
+import hashlib
+import argparse
+import threading
+import socketserver
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8641
+DEFAULT_PATH = "/json-rpc/4/invoke"
+DEFAULT_BITS = 1_000_000
+DEFAULT_REQUESTS = 1_000
+MAX_STORED_RESULTS = 10_000
+
+LICENSE = {
+    "type": "developer",
+    "text": "Random values licensed strictly for development and testing only",
+    "infoUrl": None
+}
+
+
+# ── RSA (PKCS#1 v1.5, SHA-512) ───────────────────────────────────────────────
+
+# DER DigestInfo prefix for SHA-512 (RFC 8017, section 9.2)
+SHA512_DIGEST_INFO = bytes.fromhex("3051300d060960864801650304020305000440")
+
+SMALL_PRIMES = [p for p in range(3, 2000) if all(p % d for d in range(2, int(p ** 0.5) + 1))]
+
+
+def _is_probable_prime(n: int, rng: random.Random, rounds: int = 40) -> bool:
+    if n < 2:
+        return False
+    for p in SMALL_PRIMES:
+        if n % p == 0:
+            return n == p
+    d, r = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        r += 1
+    for _ in range(rounds):
+        x = pow(rng.randrange(2, n - 1), d, n)
+        if x in (1, n - 1):
+            continue
+        for _ in range(r - 1):
+            x = pow(x, 2, n)
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def _random_prime(bits: int, rng: random.Random) -> int:
+    while True:
+        candidate = rng.getrandbits(bits) | (1 << (bits - 1)) | (1 << (bits - 2)) | 1
+        if _is_probable_prime(candidate, rng):
+            return candidate
+
+
+def generate_key(bits: int = 2048) -> dict:
+    """Generate an RSA key as a dict of integers (n, e, d, p, q)."""
+    rng = random.SystemRandom()
+    e = 65537
+    while True:
+        p = _random_prime(bits // 2, rng)
+        q = _random_prime(bits - bits // 2, rng)
+        if p == q:
+            continue
+        phi = (p - 1) * (q - 1)
+        if math.gcd(e, phi) != 1:
+            continue
+        n = p * q
+        if n.bit_length() == bits:
+            return {"n": n, "e": e, "d": _modinv(e, phi), "p": p, "q": q}
+
+
+def _modinv(a: int, m: int) -> int:
+    old_r, r, old_s, s = a, m, 1, 0
+    while r:
+        quotient = old_r // r
+        old_r, r = r, old_r - quotient * r
+        old_s, s = s, old_s - quotient * s
+    return old_s % m
+
+
+def _encode_digest(message: bytes, k: int) -> int:
+    """EMSA-PKCS1-v1_5 encoding of SHA-512(message) for a k-byte modulus."""
+    t = SHA512_DIGEST_INFO + hashlib.sha512(message).digest()
+    em = b"\x00\x01" + b"\xff" * (k - len(t) - 3) + b"\x00" + t
+    return int.from_bytes(em, "big")
+
+
+def sign(key: dict, message: bytes) -> bytes:
+    """RSASSA-PKCS1-v1_5 signature with SHA-512 (uses CRT for speed)."""
+    k = (key["n"].bit_length() + 7) // 8
+    m = _encode_digest(message, k)
+    p, q, d = key["p"], key["q"], key["d"]
+    s1 = pow(m, d % (p - 1), p)
+    s2 = pow(m, d % (q - 1), q)
+    h = (_modinv(q, p) * (s1 - s2)) % p
+    return (s2 + h * q).to_bytes(k, "big")
+
+
+def verify(key: dict, message: bytes, signature: bytes) -> bool:
+    k = (key["n"].bit_length() + 7) // 8
+    if len(signature) != k:
+        return False
+    return pow(int.from_bytes(signature, "big"), key["e"], key["n"]) == _encode_digest(message, k)
+
+
+def load_or_create_key(path: str = None, bits: int = 2048) -> dict:
+    """Load a key saved by a previous run, or generate (and save) a new one."""
+    if path:
+        try:
+            with open(path) as f:
+                return {name: int(value, 16) for name, value in json.load(f).items()}
+        except FileNotFoundError:
+            pass
+
+    key = generate_key(bits)
+    if path:
+        with open(path, "w") as f:
+            json.dump({name: format(value, "x") for name, value in key.items()}, f, indent=2)
+    return key
+
+
+# ── Minimal DER writer for a self-signed certificate ─────────────────────────
+
+def _der(tag: int, content: bytes) -> bytes:
+    length = len(content)
+    if length < 0x80:
+        header = bytes([length])
+    else:
+        size = length.to_bytes((length.bit_length() + 7) // 8, "big")
+        header = bytes([0x80 | len(size)]) + size
+    return bytes([tag]) + header + content
+
+
+def _der_int(value: int) -> bytes:
+    return _der(0x02, value.to_bytes(value.bit_length() // 8 + 1, "big"))
+
+
+def _der_oid(dotted: str) -> bytes:
+    parts = [int(x) for x in dotted.split(".")]
+    body = bytes([40 * parts[0] + parts[1]])
+    for part in parts[2:]:
+        chunk = [part & 0x7F]
+        part >>= 7
+        while part:
+            chunk.append(0x80 | (part & 0x7F))
+            part >>= 7
+        body += bytes(reversed(chunk))
+    return _der(0x06, body)
+
+
+def _der_seq(*items: bytes) -> bytes:
+    return _der(0x30, b"".join(items))
+
+
+def _der_time(when: datetime) -> bytes:
+    return _der(0x17, when.strftime("%y%m%d%H%M%SZ").encode("ascii"))
+
+
+OID_RSA_ENCRYPTION = "1.2.840.113549.1.1.1"
+OID_SHA512_WITH_RSA = "1.2.840.113549.1.1.13"
+OID_COMMON_NAME = "2.5.4.3"
+
+
+def make_certificate(key: dict, common_name: str = "random.org stand-in") -> bytes:
+    """Self-signed X.509 v3 certificate (DER) for the key's public half."""
+    now = datetime.now(timezone.utc)
+    algorithm = _der_seq(_der_oid(OID_SHA512_WITH_RSA), _der(0x05, b""))
+    name = _der_seq(_der(0x31, _der_seq(_der_oid(OID_COMMON_NAME), _der(0x0C, common_name.encode("utf-8")))))
+    public_key = _der_seq(_der_int(key["n"]), _der_int(key["e"]))
+    spki = _der_seq(
+        _der_seq(_der_oid(OID_RSA_ENCRYPTION), _der(0x05, b"")),
+        _der(0x03, b"\x00" + public_key)
+    )
+    tbs = _der_seq(
+        _der(0xA0, _der_int(2)),
+        _der_int(int(now.timestamp())),
+        algorithm,
+        name,
+        _der_seq(_der_time(now - timedelta(days=1)), _der_time(now + timedelta(days=3650))),
+        name,
+        spki
+    )
+    signature = sign(key, tbs)
+    return _der_seq(tbs, algorithm, _der(0x03, b"\x00" + signature))
+
+
+def pem(der: bytes, label: str = "CERTIFICATE") -> str:
+    body = base64.b64encode(der).decode("ascii")
+    lines = [body[i:i + 64] for i in range(0, len(body), 64)]
+    return f"-----BEGIN {label}-----\n" + "\n".join(lines) + f"\n-----END {label}-----\n"
+
+
+# ── The API itself ───────────────────────────────────────────────────────────
+
+class RPCError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def bits_for(counts_and_ranges) -> int:
+    """Bits charged for a request: ceil(n * log2(range)) per group."""
+    return sum(math.ceil(n * math.log2(span)) for n, span in counts_and_ranges if span > 1)
+
+
+class StandInAPI:
+    """In-memory state and JSON-RPC methods of the stand-in."""
+
+    def __init__(self, key: dict, daily_bits: int = DEFAULT_BITS, daily_requests: int = DEFAULT_REQUESTS,
+                 advisory_delay: int = 0, seed: int = None):
+        self.key = key
+        self.certificate = make_certificate(key)
+        self.daily_bits = daily_bits
+        self.daily_requests = daily_requests
+        self.advisory_delay = advisory_delay
+        self.rng = random.Random(seed)
+
+        self._accounts = {}
+        self._lock = threading.Lock()
+
+    def _account(self, api_key: str) -> dict:
+        day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        account = self._accounts.get(api_key)
+        if account is None:
+            account = self._accounts[api_key] = {
+                "hashedApiKey": base64.b64encode(hashlib.sha512(api_key.encode("utf-8")).digest()).decode("ascii"),
+                "serial": 0,
+                "results": {}
+            }
+        if account.get("day") != day:
+            account.update(day=day, bitsLeft=self.daily_bits, requestsLeft=self.daily_requests)
+        return account
+
+    @staticmethod
+    def serialize(random_obj: dict) -> bytes:
+        """The exact bytes that get signed (compact JSON, key order as given)."""
+        return json.dumps(random_obj, separators=(",", ":")).encode("utf-8")
+
+    def dispatch(self, method: str, params: dict):
+        handler = {
+            "generateSignedIntegers": self.generate_integers,
+            "generateSignedIntegerSequences": self.generate_sequences,
+            "verifySignature": self.verify_signature,
+            "getResult": self.get_result,
+        }.get(method)
+        if handler is None:
+            raise RPCError(-32601, f"Method not found: {method}")
+        if not isinstance(params, dict):
+            raise RPCError(-32602, "Invalid params")
+        return handler(params)
+
+    @staticmethod
+    def _int_param(params: dict, name: str, low: int, high: int) -> int:
+        value = params.get(name)
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise RPCError(-32602, f"Invalid params: {name} must be an integer")
+        if not (low <= value <= high):
+            raise RPCError(300, f"Parameter '{name}' is out of range")
+        return value
+
+    def _int_or_list(self, params: dict, name: str, n: int, low: int, high: int) -> list:
+        value = params.get(name)
+        if isinstance(value, list):
+            if len(value) != n:
+                raise RPCError(-32602, f"Invalid params: {name} must have {n} entries")
+            return [self._int_param({name: v}, name, low, high) for v in value]
+        return [self._int_param(params, name, low, high)] * n
+
+    def _sign_and_charge(self, params: dict, random_fields: dict, cost: int) -> dict:
+        api_key = params.get("apiKey")
+        if not isinstance(api_key, str) or not api_key:
+            raise RPCError(100, "API key not found")
+
+        with self._lock:
+            account = self._account(api_key)
+            if account["requestsLeft"] < 1:
+                raise RPCError(201, "Insufficient requests remaining for today")
+            if account["bitsLeft"] < cost:
+                raise RPCError(200, "Insufficient bits remaining for today")
+            account["requestsLeft"] -= 1
+            account["bitsLeft"] -= cost
+            account["serial"] += 1
+
+            random_obj = {"method": random_fields.pop("method"), "hashedApiKey": account["hashedApiKey"]}
+            random_obj.update(random_fields)
+            random_obj.update({
+                "license": LICENSE,
+                "licenseData": params.get("licenseData"),
+                "userData": params.get("userData"),
+                "ticketData": None,
+                "completionTime": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%SZ"),
+                "serialNumber": account["serial"]
+            })
+            signature = base64.b64encode(sign(self.key, self.serialize(random_obj))).decode("ascii")
+
+            result = {
+                "random": random_obj,
+                "signature": signature,
+                "cost": 0,
+                "bitsUsed": cost,
+                "bitsLeft": account["bitsLeft"],
+                "requestsLeft": account["requestsLeft"],
+                "advisoryDelay": self.advisory_delay
+            }
+            account["results"][account["serial"]] = result
+            if len(account["results"]) > MAX_STORED_RESULTS:
+                del account["results"][min(account["results"])]
+            return result
+
+    def generate_integers(self, params: dict) -> dict:
+        n = self._int_param(params, "n", 1, 10_000)
+        low = self._int_param(params, "min", -1_000_000_000, 1_000_000_000)
+        high = self._int_param(params, "max", -1_000_000_000, 1_000_000_000)
+        replacement = params.get("replacement", True)
+        if high < low or (not replacement and n > high - low + 1):
+            raise RPCError(300, "Parameter 'n' is out of range")
+
+        with self._lock:
+            if replacement:
+                data = [self.rng.randint(low, high) for _ in range(n)]
+            else:
+                data = self.rng.sample(range(low, high + 1), n)
+
+        return self._sign_and_charge(params, {
+            "method": "generateSignedIntegers",
+            "n": n,
+            "min": low,
+            "max": high,
+            "replacement": replacement,
+            "base": params.get("base", 10),
+            "pregeneratedRandomization": params.get("pregeneratedRandomization"),
+            "data": data
+        }, bits_for([(n, high - low + 1)]))
+
+    def generate_sequences(self, params: dict) -> dict:
+        n = self._int_param(params, "n", 1, 10_000)
+        lengths = self._int_or_list(params, "length", n, 1, 10_000)
+        lows = self._int_or_list(params, "min", n, -1_000_000_000, 1_000_000_000)
+        highs = self._int_or_list(params, "max", n, -1_000_000_000, 1_000_000_000)
+        replacement = params.get("replacement", True)
+        if any(h < l for l, h in zip(lows, highs)):
+            raise RPCError(300, "Parameter 'max' is out of range")
+
+        with self._lock:
+            data = [
+                [self.rng.randint(low, high) for _ in range(length)]
+                for length, low, high in zip(lengths, lows, highs)
+            ]
+
+        return self._sign_and_charge(params, {
+            "method": "generateSignedIntegerSequences",
+            "n": n,
+            "length": params["length"],
+            "min": params["min"],
+            "max": params["max"],
+            "replacement": replacement,
+            "base": params.get("base", 10),
+            "pregeneratedRandomization": params.get("pregeneratedRandomization"),
+            "data": data
+        }, bits_for(zip(lengths, [h - l + 1 for l, h in zip(lows, highs)])))
+
+    def verify_signature(self, params: dict) -> dict:
+        random_obj = params.get("random")
+        signature = params.get("signature")
+        if not isinstance(random_obj, dict) or not isinstance(signature, str):
+            raise RPCError(-32602, "Invalid params: random and signature are required")
+        try:
+            raw = base64.b64decode(signature, validate=True)
+        except ValueError:
+            return {"authenticity": False}
+        return {"authenticity": verify(self.key, self.serialize(random_obj), raw)}
+
+    def get_result(self, params: dict) -> dict:
+        api_key = params.get("apiKey")
+        serial = params.get("serialNumber")
+        with self._lock:
+            account = self._accounts.get(api_key) if isinstance(api_key, str) else None
+            if account is None:
+                raise RPCError(100, "API key not found")
+            result = account["results"].get(serial)
+        if result is None:
+            raise RPCError(400, f"Result with serial number {serial} not found")
+        return result
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    wbufsize = io.DEFAULT_BUFFER_SIZE  # headers + body in one write
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/server.crt":
+            self._send(200, pem(self.server.api.certificate).encode("ascii"), "application/x-pem-file")
+        else:
+            self._send(404, b"Not found", "text/plain")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        server = self.server
+
+        faults = server.faults
+        if faults["latency"] or faults["jitter"]:
+            with server.fault_lock:
+                jitter = server.fault_rng.uniform(-faults["jitter"], faults["jitter"])
+            time.sleep(max(0.0, faults["latency"] + jitter) / 1000.0)
+        with server.fault_lock:
+            roll_http = server.fault_rng.random()
+        if roll_http < faults["http_error_rate"]:
+            self._send(503, b"Service Unavailable (injected)", "text/plain")
+            return
+
+        try:
+            request = json.loads(body.decode("utf-8"))
+        except ValueError:
+            self._reply({"jsonrpc": "2.0", "error": {"code": -32700, "message": "Parse error"}, "id": None})
+            return
+
+        if isinstance(request, list) and request and server.batch:
+            responses = [self._answer(call, server) for call in request]
+            responses = [r for r in responses if r is not None]  # notifications get no reply
+            if responses:
+                self._reply(responses)
+            else:
+                self._send(204, b"")
+            return
+
+        if not isinstance(request, dict):
+            self._reply({"jsonrpc": "2.0", "error": {"code": -32600, "message": "Invalid request"}, "id": None})
+            return
+
+        self._reply(self._answer(request, server))
+
+    @staticmethod
+    def _answer(request, server) -> dict:
+        """The response to one call (None for a notification)."""
+        if not isinstance(request, dict):
+            return {"jsonrpc": "2.0", "error": {"code": -32600, "message": "Invalid request"}, "id": None}
+        with server.fault_lock:
+            roll_rpc = server.fault_rng.random()
+        request_id = request.get("id")
+        try:
+            if roll_rpc < server.faults["error_rate"]:
+                raise RPCError(-32603, "Internal error (injected)")
+            result = server.api.dispatch(request.get("method"), request.get("params"))
+            response = {"jsonrpc": "2.0", "result": result, "id": request_id}
+        except RPCError as e:
+            response = {"jsonrpc": "2.0", "error": {"code": e.code, "message": e.message, "data": None},
+                        "id": request_id}
+        return response if "id" in request else None
+
+    def _reply(self, response):
+        self._send(200, json.dumps(response, separators=(",", ":")).encode("utf-8"))
+
+
+class StandInServer(ThreadingHTTPServer):
+    """HTTP server wrapping a StandInAPI, with latency/error injection."""
+
+    def __init__(self, address: tuple, api: StandInAPI, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, http_error_rate: float = 0.0, seed: int = None,
+                 verbose: bool = False, batch: bool = True):
+        self.api = api
+        self.verbose = verbose
+        self.batch = batch
+        self.faults = {
+            "latency": latency,
+            "jitter": jitter,
+            "error_rate": error_rate,
+            "http_error_rate": http_error_rate
+        }
+        self.fault_rng = random.Random(seed)
+        self.fault_lock = threading.Lock()
+        super().__init__(address, StandInHandler)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{DEFAULT_PATH}"
+
+
+def serve_in_thread(key: dict = None, port: int = 0, **options) -> StandInServer:
+    """
+    Start a stand-in on a background thread (port 0 picks a free port).
+
+    Options are split between StandInAPI (daily_bits, daily_requests,
+    advisory_delay, seed) and StandInServer (latency, jitter, error_rate,
+    http_error_rate, batch). Call .shutdown() when done.
+    """
+    api_options = {k: options.pop(k) for k in ("daily_bits", "daily_requests", "advisory_delay")
+                   if k in options}
+    api = StandInAPI(key or load_or_create_key(), seed=options.get("seed"), **api_options)
+    server = StandInServer((DEFAULT_HOST, port), api, **options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local random.org stand-in server")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--key-file", help="Load/save the RSA signing key here")
+    parser.add_argument("--key-bits", type=int, default=2048, help="RSA modulus size for new keys")
+    parser.add_argument("--cert-out", help="Write the signing certificate (PEM) here")
+    parser.add_argument("--bits", type=int, default=DEFAULT_BITS, help="Daily bits per API key")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS, help="Daily requests per API key")
+    parser.add_argument("--advisory-delay", type=int, default=0, help="advisoryDelay to return (ms)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Added latency per request (ms)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random +/- latency (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of JSON-RPC errors")
+    parser.add_argument("--http-error-rate", type=float, default=0.0, help="Fraction of HTTP 503s")
+    parser.add_argument("--seed", type=int, help="Seed for dice values and injected faults")
+    parser.add_argument("--no-batch", action="store_true", help="Refuse JSON-RPC batch requests")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    key = load_or_create_key(args.key_file, args.key_bits)
+    api = StandInAPI(key, daily_bits=args.bits, daily_requests=args.requests,
+                     advisory_delay=args.advisory_delay, seed=args.seed)
+    if args.cert_out:
+        with open(args.cert_out, "w") as f:
+            f.write(pem(api.certificate))
+
+    server = StandInServer((args.host, args.port), api, latency=args.latency, jitter=args.jitter,
+                           error_rate=args.error_rate, http_error_rate=args.http_error_rate,
+                           seed=args.seed, verbose=args.verbose, batch=not args.no_batch)
+    print(json.dumps({"message": "random.org stand-in listening", "url": server.url}), file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()